@@ -0,0 +1,88 @@
+"""Per-trace extract_latency loop vs batch extraction on synthetic spans.
+
+Compares the per-trace loop over Span objects with extract_latency_batch()
+over the same objects and with extract_latency_table() over the same spans
+stored as columnar segments.
+
+Run from the repo root (N spans, default 1M):
+
+    PYTHONPATH=src python benchmarks/bench_latency_batch.py [N]
+"""
+from __future__ import annotations
+
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from latency.aggregate import aggregate_latency
+from latency.batch import extract_latency_batch, np
+from latency.extract import extract_latency
+from spanrecorder.span import Span
+from storage.segment_store import SegmentTraceStore
+
+_SHAPE = [
+    ("request", {"kind": "request"}),
+    ("retrieval.search", {"kind": "retrieval.search"}),
+    ("rerank", {"component": "retriever", "phase": "rerank"}),
+    ("tool.call", {"kind": "tool.call"}),
+    ("llm.call", {"kind": "llm.call", "phase": "prefill"}),
+    ("llm.call", {"kind": "llm.call", "phase": "decode"}),
+    ("postprocess", {"kind": "postprocess"}),
+    ("response", {"kind": "response"}),
+]
+
+
+def synthetic_spans(n: int) -> List[Span]:
+    rnd = random.Random(7)
+    spans: List[Span] = []
+    t = 0
+    while len(spans) < n:
+        trace_id = "%032x" % rnd.getrandbits(128)
+        root = Span(name="request", trace_id=trace_id, start_ns=t, attributes={"kind": "request"})
+        spans.append(root)
+        cursor = t
+        for name, attrs in _SHAPE[1:]:
+            d = rnd.randint(1_000_000, 50_000_000)
+            spans.append(
+                Span(name=name, trace_id=trace_id, parent_id=root.span_id, start_ns=cursor,
+                     end_ns=cursor + d, attributes=dict(attrs))
+            )
+            cursor += d
+        root.end(end_ns=cursor + 1_000)
+        t += 1_000_000
+    return spans[:n]
+
+
+def per_trace_loop(spans: List[Span]):
+    by_trace: Dict[str, List[Span]] = {}
+    for s in spans:
+        by_trace.setdefault(s.trace_id, []).append(s)
+    return aggregate_latency(extract_latency(ss) for ss in by_trace.values())
+
+
+def _time(label: str, fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {dt:7.2f} s")
+    return dt
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    spans = synthetic_spans(n)
+    base = _time("per-trace loop", lambda: per_trace_loop(spans))
+    py = _time("batch (pure python)", lambda: aggregate_latency(extract_latency_batch(spans, use_numpy=False)))
+    print(f"{'':<28} {base / py:7.1f}x")
+    if np is not None:
+        vec = _time("batch (numpy)", lambda: aggregate_latency(extract_latency_batch(spans, use_numpy=True)))
+        print(f"{'':<28} {base / vec:7.1f}x")
+
+    with tempfile.TemporaryDirectory() as d:
+        store = SegmentTraceStore(d)
+        for i in range(0, n, 100_000):
+            store.write(spans[i : i + 100_000])
+        seg = _time("segments (mapped columns)", lambda: aggregate_latency(store.latency_table()))
+        print(f"{'':<28} {base / seg:7.1f}x")
@@ -0,0 +1,84 @@
+"""Micro-benchmark for the span core: per-span CPU time and retained bytes.
+
+Run from the repo root:
+
+    PYTHONPATH=src python benchmarks/bench_span.py
+"""
+from __future__ import annotations
+
+import gc
+import time
+import tracemalloc
+
+from spanrecorder.recorder import SpanRecorder
+from spanrecorder.span import Span
+
+
+N = 50_000
+
+
+def _bench(label: str, fn, n: int = N) -> None:
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.perf_counter_ns()
+        fn(n)
+        cpu_ns = (time.perf_counter_ns() - t0) / n
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    keep = fn(n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+
+    print(f"{label:<34} {cpu_ns:8.0f} ns/span {current / n:8.0f} B/span")
+
+
+def bare_spans(n: int):
+    out = []
+    for _ in range(n):
+        s = Span(name="llm.call", trace_id="t")
+        s.end()
+        out.append(s)
+    return out
+
+
+def spans_with_attrs(n: int):
+    out = []
+    for _ in range(n):
+        s = Span(name="retrieval.search", trace_id="t")
+        s.set_attribute("kind", "retrieval.search")
+        s.set_attribute("retrieval.top_k", 8)
+        s.end()
+        out.append(s)
+    return out
+
+
+def recorder_nested(n: int):
+    rec = SpanRecorder()
+    for _ in range(n // 4):
+        with rec.start_span("request", attrs={"kind": "request"}):
+            with rec.start_span("retrieval.search"):
+                pass
+            with rec.start_span("llm.call", attrs={"phase": "prefill"}):
+                pass
+            with rec.start_span("llm.call", attrs={"phase": "decode"}):
+                pass
+    return rec.get_spans()
+
+
+def to_dict(n: int):
+    spans = spans_with_attrs(1000)
+    out = []
+    for i in range(n):
+        out.append(spans[i % 1000].to_dict())
+    return out
+
+
+if __name__ == "__main__":
+    _bench("Span() + end()", bare_spans)
+    _bench("Span() + 2 attrs + end()", spans_with_attrs)
+    _bench("recorder, 4 nested spans/trace", recorder_nested)
+    _bench("Span.to_dict()", to_dict)
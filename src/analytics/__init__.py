@@ -0,0 +1,16 @@
+"""Analytics across judge scores and latency (quality vs latency), and trace queries."""
+from .join_index import Correlation, DecileStats, QualityLatencyIndex, TrendPoint
+from .query import Predicate, QueryPlan, QuerySyntaxError, TraceMatch, TraceQuery, TraceQueryEngine
+
+__all__ = [
+    "QualityLatencyIndex",
+    "Correlation",
+    "DecileStats",
+    "TrendPoint",
+    "TraceQuery",
+    "TraceQueryEngine",
+    "Predicate",
+    "QueryPlan",
+    "TraceMatch",
+    "QuerySyntaxError",
+]
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import math
+import time
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from judge.scoring import JudgeResult
+from latency.extract import LatencyFeatures
+
+OVERALL = "overall"
+
+_NAN = float("nan")
+_MISSING = -32768  # no score in an int16 score column
+_HAS_LATENCY = 1
+_HAS_JUDGE = 2
+_COMPLETE = _HAS_LATENCY | _HAS_JUDGE
+
+
+@dataclass(frozen=True, slots=True)
+class Correlation:
+    component: str
+    dimension: str
+    n: int
+    r: float  # Pearson correlation of component ms and score (negative: slower scores lower)
+
+
+@dataclass(frozen=True, slots=True)
+class DecileStats:
+    decile: int  # 1..10, by trace total latency
+    lo_ms: float
+    hi_ms: float
+    n: int
+    mean_score: float
+    histogram: Dict[int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class TrendPoint:
+    deployment: Optional[str]
+    bucket_start: float
+    n: int
+    mean_overall: float
+    mean_scores: Dict[str, float]
+
+
+class _PairStats:
+    """Running sums for a Pearson correlation; supports removing points."""
+
+    __slots__ = ("n", "sx", "sy", "sxx", "syy", "sxy")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def add(self, x: float, y: float, sign: int) -> None:
+        self.n += sign
+        self.sx += sign * x
+        self.sy += sign * y
+        self.sxx += sign * x * x
+        self.syy += sign * y * y
+        self.sxy += sign * x * y
+
+    def r(self) -> float:
+        n = self.n
+        if n < 2:
+            return _NAN
+        vx = n * self.sxx - self.sx * self.sx
+        vy = n * self.syy - self.sy * self.sy
+        if vx <= 0 or vy <= 0:
+            return _NAN
+        return (n * self.sxy - self.sx * self.sy) / math.sqrt(vx * vy)
+
+
+@dataclass
+class _TrendStats:
+    n: int = 0
+    overall_n: int = 0
+    overall_sum: float = 0.0
+    sums: Dict[str, float] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+def _trace_key(trace_id: str) -> Union[int, str]:
+    # 128-bit hex ids are kept as ints: much smaller than the str keys.
+    if len(trace_id) == 32:
+        try:
+            return int(trace_id, 16)
+        except ValueError:
+            pass
+    return trace_id
+
+
+class QualityLatencyIndex:
+    """Join index between judge scores and latency features, keyed by trace_id.
+
+    Either side may arrive first (or be replaced); a trace counts once both
+    are present. Rows live in typed arrays (one per component / score
+    dimension), and every statistic is maintained incrementally as rows
+    complete or change:
+
+    - Pearson correlation of each component's latency with each score
+      dimension (correlations())
+    - score histograms in log-spaced latency bins (``bin_accuracy``), from
+      which latency deciles are cut at query time (score_by_latency_decile())
+    - per-deployment, per-``bucket_s`` score means (deployment_trend())
+
+    Queries only touch these aggregates, never the rows, so they stay fast
+    at millions of traces. ``component_field`` picks the LatencyFeatures
+    breakdown to correlate (e.g. ``"critical_by_component_ms"``).
+    """
+
+    def __init__(
+        self,
+        *,
+        component_field: str = "by_component_ms",
+        bucket_s: float = 3600.0,
+        bin_accuracy: float = 0.02,
+        clock=time.time,
+    ) -> None:
+        self.component_field = component_field
+        self.bucket_s = bucket_s
+        self.clock = clock
+        self._log_gamma = math.log((1 + bin_accuracy) / (1 - bin_accuracy))
+
+        self._rows: Dict[Union[int, str], int] = {}
+        self._flags = array("b")
+        self._total_ms = array("d")
+        self._ts = array("d")
+        self._deployment = array("i")
+        self._components: Dict[str, array] = {}  # component -> array('d'), NaN = absent
+        self._scores: Dict[str, array] = {}  # dimension (incl. "overall") -> array('h')
+        self._deployments: List[Optional[str]] = [None]
+        self._deployment_codes: Dict[Optional[str], int] = {None: 0}
+
+        self._joined = 0
+        self._pairs: Dict[Tuple[str, str], _PairStats] = {}
+        self._bins: Dict[int, Dict[int, int]] = {}  # latency bin -> overall score -> count
+        self._trends: Dict[Tuple[int, int], _TrendStats] = {}  # (deployment code, bucket)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def joined(self) -> int:
+        """Traces with both latency and a judge result."""
+        return self._joined
+
+    # -------------------------
+    # Rows
+    # -------------------------
+
+    def _row(self, trace_id: str) -> int:
+        key = _trace_key(trace_id)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._flags)
+            self._flags.append(0)
+            self._total_ms.append(_NAN)
+            self._ts.append(_NAN)
+            self._deployment.append(0)
+            for col in self._components.values():
+                col.append(_NAN)
+            for col in self._scores.values():
+                col.append(_MISSING)
+        return row
+
+    def _column(self, columns: Dict[str, array], name: str, typecode: str, fill: Any) -> array:
+        col = columns.get(name)
+        if col is None:
+            col = columns[name] = array(typecode, [fill]) * len(self._flags)
+        return col
+
+    def _set_meta(self, row: int, deployment: Optional[str], ts: Optional[float]) -> None:
+        if deployment is not None:
+            code = self._deployment_codes.get(deployment)
+            if code is None:
+                code = self._deployment_codes[deployment] = len(self._deployments)
+                self._deployments.append(deployment)
+            self._deployment[row] = code
+        if ts is not None or math.isnan(self._ts[row]):
+            self._ts[row] = self.clock() if ts is None else ts
+
+    def add_latency(
+        self,
+        features: Union[LatencyFeatures, Dict[str, Any]],
+        *,
+        deployment: Optional[str] = None,
+        ts: Optional[float] = None,
+    ) -> None:
+        """Add or replace a trace's latency (a LatencyFeatures or its to_dict())."""
+        if isinstance(features, LatencyFeatures):
+            trace_id, total_ms = features.trace_id, features.total_ms
+            components = getattr(features, self.component_field)
+        else:
+            trace_id, total_ms = features["trace_id"], features["total_ms"]
+            components = features.get(self.component_field) or {}
+        row = self._row(trace_id)
+        self._contribute(row, -1)
+        for name in components:
+            self._column(self._components, name, "d", _NAN)
+        for name, col in self._components.items():
+            col[row] = float(components.get(name, _NAN))
+        self._total_ms[row] = float(total_ms)
+        self._flags[row] |= _HAS_LATENCY
+        self._set_meta(row, deployment, ts)
+        self._contribute(row, 1)
+
+    def add_judge(
+        self,
+        result: Union[JudgeResult, Dict[str, Any]],
+        *,
+        deployment: Optional[str] = None,
+        ts: Optional[float] = None,
+    ) -> None:
+        """Add or replace a trace's judge result (a JudgeResult or its to_dict())."""
+        if isinstance(result, dict):
+            result = JudgeResult.from_dict(result)
+        row = self._row(result.trace_id)
+        self._contribute(row, -1)
+        scores = dict(result.scores)
+        if result.overall is not None:
+            scores[OVERALL] = result.overall
+        for name in scores:
+            self._column(self._scores, name, "h", _MISSING)
+        for name, col in self._scores.items():
+            col[row] = int(scores.get(name, _MISSING))
+        self._flags[row] |= _HAS_JUDGE
+        self._set_meta(row, deployment, ts)
+        self._contribute(row, 1)
+
+    def add_many(
+        self,
+        rows: Iterable[Tuple[str, Dict[str, Dict[str, Any]]]],
+        *,
+        judge_kind: str = "judge",
+        latency_kind: str = "latency",
+    ) -> None:
+        """Load ``(trace_id, {kind: payload})`` pairs, e.g. from SqliteResultStore.join()."""
+        for _, payloads in rows:
+            if latency_kind in payloads:
+                self.add_latency(payloads[latency_kind])
+            if judge_kind in payloads:
+                self.add_judge(payloads[judge_kind])
+
+    # -------------------------
+    # Incremental aggregates
+    # -------------------------
+
+    def _bin(self, ms: float) -> int:
+        return math.ceil(math.log(ms) / self._log_gamma) if ms > 0 else -(1 << 30)
+
+    def _contribute(self, row: int, sign: int) -> None:
+        if self._flags[row] != _COMPLETE:
+            return
+        self._joined += sign
+        scores = {name: col[row] for name, col in self._scores.items() if col[row] != _MISSING}
+        for comp, col in self._components.items():
+            x = col[row]
+            if x != x:  # NaN
+                continue
+            for dim, y in scores.items():
+                stats = self._pairs.get((comp, dim))
+                if stats is None:
+                    stats = self._pairs[(comp, dim)] = _PairStats()
+                stats.add(x, y, sign)
+
+        overall = scores.get(OVERALL)
+        if overall is not None:
+            hist = self._bins.setdefault(self._bin(self._total_ms[row]), {})
+            hist[overall] = hist.get(overall, 0) + sign
+            if not hist[overall]:
+                del hist[overall]
+
+        key = (self._deployment[row], int(self._ts[row] // self.bucket_s))
+        trend = self._trends.get(key)
+        if trend is None:
+            trend = self._trends[key] = _TrendStats()
+        trend.n += sign
+        for dim, y in scores.items():
+            if dim == OVERALL:
+                trend.overall_n += sign
+                trend.overall_sum += sign * y
+            else:
+                trend.sums[dim] = trend.sums.get(dim, 0.0) + sign * y
+                trend.counts[dim] = trend.counts.get(dim, 0) + sign
+        if not trend.n:
+            del self._trends[key]
+
+    # -------------------------
+    # Queries
+    # -------------------------
+
+    def correlations(self, *, min_n: int = 30) -> List[Correlation]:
+        """Component-latency vs score correlations, strongest (most negative or positive) first."""
+        out = [
+            Correlation(comp, dim, st.n, st.r())
+            for (comp, dim), st in self._pairs.items()
+            if st.n >= min_n and not math.isnan(st.r())
+        ]
+        out.sort(key=lambda c: -abs(c.r))
+        return out
+
+    def score_by_latency_decile(self) -> List[DecileStats]:
+        """Overall-score distribution per total-latency decile.
+
+        Decile edges fall on latency bin boundaries, so they are within
+        ``bin_accuracy`` of the exact ones; a bin is never split, so a bin
+        holding more than a tenth of the traces absorbs several deciles.
+        """
+        bins = sorted((b, hist) for b, hist in self._bins.items() if hist)
+        total = sum(sum(h.values()) for _, h in bins)
+        out: List[DecileStats] = []
+        cum = 0
+        group: List[Tuple[int, Dict[int, int]]] = []
+        for i, (b, hist) in enumerate(bins):
+            cum += sum(hist.values())
+            group.append((b, hist))
+            decile = math.ceil(cum * 10 / total)
+            nxt = math.ceil((cum + sum(bins[i + 1][1].values())) * 10 / total) if i + 1 < len(bins) else None
+            if nxt == decile:
+                continue
+            merged: Dict[int, int] = {}
+            for _, h in group:
+                for score, n in h.items():
+                    merged[score] = merged.get(score, 0) + n
+            n = sum(merged.values())
+            out.append(
+                DecileStats(
+                    decile=decile,
+                    lo_ms=self._bin_lower(group[0][0]),
+                    hi_ms=self._bin_upper(b),
+                    n=n,
+                    mean_score=sum(s * c for s, c in merged.items()) / n,
+                    histogram=dict(sorted(merged.items())),
+                )
+            )
+            group = []
+        return out
+
+    def _bin_lower(self, b: int) -> float:
+        return 0.0 if b == -(1 << 30) else math.exp((b - 1) * self._log_gamma)
+
+    def _bin_upper(self, b: int) -> float:
+        return 0.0 if b == -(1 << 30) else math.exp(b * self._log_gamma)
+
+    def deployment_trend(self, deployment: Optional[str] = None) -> List[TrendPoint]:
+        """Mean scores per time bucket, for one deployment (None: traces without one)."""
+        code = self._deployment_codes.get(deployment)
+        if code is None:
+            return []
+        points = []
+        for (dep, bucket), st in sorted(self._trends.items(), key=lambda kv: kv[0][1]):
+            if dep != code:
+                continue
+            points.append(
+                TrendPoint(
+                    deployment=deployment,
+                    bucket_start=bucket * self.bucket_s,
+                    n=st.n,
+                    mean_overall=st.overall_sum / st.overall_n if st.overall_n else _NAN,
+                    mean_scores={d: st.sums[d] / c for d, c in st.counts.items() if c},
+                )
+            )
+        return points
+
+    def deployments(self) -> List[Optional[str]]:
+        return list(self._deployments)
+
+    def report(self, *, min_n: int = 30) -> Dict[str, Any]:
+        """Everything a dashboard shows, as plain dicts."""
+        return {
+            "traces": len(self),
+            "joined": self.joined,
+            "correlations": [asdict(c) for c in self.correlations(min_n=min_n)],
+            "score_by_latency_decile": [asdict(d) for d in self.score_by_latency_decile()],
+            "deployment_trends": {
+                str(dep): [asdict(p) for p in self.deployment_trend(dep)] for dep in self._deployments
+            },
+        }
@@ -0,0 +1,572 @@
+from __future__ import annotations
+
+import operator
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+from latency.extract import LatencyFeatures, extract_latency
+from latency.taxonomy import _kind_like, classify
+from spanrecorder.span import Span
+
+_MISSING = object()
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+# -------------------------
+# Predicates
+# -------------------------
+
+_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+}
+
+# Duration literals ("300ms", "1.5 s") are converted to milliseconds.
+_UNIT_MS = {"ns": 1e-6, "us": 1e-3, "ms": 1.0, "s": 1000.0, "m": 60_000.0}
+
+_SPAN_FIELDS = ("name", "kind", "status", "duration_ms", "component", "phase")
+_LATENCY_FIELDS = ("total_ms", "critical_path_ms", "span_count")
+_JUDGE_FIELDS = {"overall": "overall", "rubric": "rubric_name", "tier": "tier", "confidence": "confidence"}
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """``field op value``; a missing value never matches (like SQL NULL).
+
+    Fields:
+      - ``trace_id``; ``start_ns`` (span start time, pushed down to storage)
+      - ``span.name|kind|status|duration_ms|component|phase``, ``span.attr.<key>``:
+        all span predicates of a query must hold for the same span
+      - ``latency.total_ms|critical_path_ms|span_count``, ``latency.<component>``
+        (inclusive ms), ``latency.self.<c>``, ``latency.critical.<c>``,
+        ``latency.share.<c>``: LatencyFeatures of the trace
+      - ``judge.overall|rubric|tier|confidence``, ``judge.<dimension>``: the
+        trace's judge result in the ResultStore
+    """
+
+    field: str
+    op: str
+    value: Any
+
+    def __post_init__(self) -> None:
+        if self.op not in _OPS:
+            raise QuerySyntaxError(f"Unknown operator {self.op!r}")
+        scope, _, rest = self.field.partition(".")
+        if self.field in ("trace_id", "start_ns"):
+            pass
+        elif scope == "span" and (rest in _SPAN_FIELDS or (rest.startswith("attr.") and len(rest) > 5)):
+            pass
+        elif scope in ("latency", "judge") and rest:
+            pass
+        else:
+            raise QuerySyntaxError(f"Unknown field {self.field!r}")
+        if self.op == "in" and not isinstance(self.value, (tuple, frozenset)):
+            raise QuerySyntaxError("'in' needs a list of values")
+
+    @property
+    def scope(self) -> str:
+        return self.field.partition(".")[0] if "." in self.field else "trace"
+
+    def test(self, actual: Any) -> bool:
+        if actual is _MISSING or actual is None:
+            return False
+        try:
+            return bool(_OPS[self.op](actual, self.value))
+        except TypeError:
+            return False
+
+    def __str__(self) -> str:
+        value = "(" + ", ".join(map(repr, self.value)) + ")" if self.op == "in" else repr(self.value)
+        return f"{self.field} {self.op} {value}"
+
+
+@dataclass
+class TraceQuery:
+    """Conjunction of predicates with an optional LIMIT.
+
+    Build it directly or with parse()::
+
+        TraceQuery.parse("traces where latency.retriever > 300ms and judge.grounding < 3 limit 50")
+    """
+
+    predicates: List[Predicate] = field(default_factory=list)
+    limit: Optional[int] = None
+
+    def where(self, field: str, op: str, value: Any) -> "TraceQuery":
+        if op == "in":
+            value = tuple(value)
+        self.predicates.append(Predicate(field, op, value))
+        return self
+
+    @classmethod
+    def parse(cls, text: str) -> "TraceQuery":
+        return _Parser(text).parse()
+
+    def __str__(self) -> str:
+        out = " and ".join(map(str, self.predicates))
+        if self.limit is not None:
+            out += f" limit {self.limit}"
+        return out
+
+
+# -------------------------
+# DSL
+# -------------------------
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+      (?P<num>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?:\s*(?P<unit>ns|us|ms|s|m)\b)?
+    | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<op>==|!=|<=|>=|=|<|>|\(|\)|,)
+    | (?P<ident>[A-Za-z_][A-Za-z0-9_.:\-]*)
+    )""",
+    re.X,
+)
+_CONSTANTS = {"true": True, "false": False, "null": None}
+
+
+class _Parser:
+    """query := ["traces"] ["where"] [cond ("and" cond)*] ["limit" INT]
+
+    cond := field op value | field "in" "(" value ("," value)* ")"
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens: List[Tuple[str, Any, Optional[str]]] = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = _TOKEN.match(text, pos)
+            if m is None or m.end() == pos:
+                raise QuerySyntaxError(f"Unexpected input at {pos}: {text[pos:pos + 20]!r}")
+            pos = m.end()
+            if m.group("num") is not None:
+                raw = m.group("num")
+                num: Any = float(raw) if any(c in raw for c in ".eE") else int(raw)
+                unit = m.group("unit")
+                self.tokens.append(("num", num * _UNIT_MS[unit] if unit else num, unit))
+            elif m.group("str") is not None:
+                self.tokens.append(("str", re.sub(r"\\(.)", r"\1", m.group("str")[1:-1]), None))
+            elif m.group("op") is not None:
+                self.tokens.append(("op", "=" if m.group("op") == "==" else m.group("op"), None))
+            else:
+                self.tokens.append(("ident", m.group("ident"), None))
+        self.i = 0
+
+    def _peek(self) -> Optional[Tuple[str, Any, Optional[str]]]:
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def _next(self, what: str) -> Tuple[str, Any, Optional[str]]:
+        tok = self._peek()
+        if tok is None:
+            raise QuerySyntaxError(f"Expected {what} at end of query")
+        self.i += 1
+        return tok
+
+    def _keyword(self, word: str) -> bool:
+        tok = self._peek()
+        if tok is not None and tok[0] == "ident" and tok[1].lower() == word:
+            self.i += 1
+            return True
+        return False
+
+    def _value(self, field_name: str) -> Any:
+        kind, value, unit = self._next("a value")
+        if kind == "num":
+            if unit and not _is_duration_field(field_name):
+                raise QuerySyntaxError(f"{field_name} does not take a duration")
+            return value
+        if kind == "str":
+            return value
+        if kind == "ident" and value.lower() in _CONSTANTS:
+            return _CONSTANTS[value.lower()]
+        raise QuerySyntaxError(f"Expected a value for {field_name}, got {value!r}")
+
+    def parse(self) -> TraceQuery:
+        query = TraceQuery()
+        self._keyword("traces")
+        self._keyword("where")
+        first = True
+        while self._peek() is not None:
+            if self._keyword("limit"):
+                kind, value, _ = self._next("a limit")
+                if kind != "num" or not isinstance(value, int) or value < 0:
+                    raise QuerySyntaxError("limit takes a non-negative integer")
+                query.limit = value
+                if self._peek() is not None:
+                    raise QuerySyntaxError("Nothing may follow limit")
+                break
+            if not first and not self._keyword("and"):
+                raise QuerySyntaxError(f"Expected 'and' or 'limit', got {self._peek()[1]!r}")
+            first = False
+            kind, name, _ = self._next("a field")
+            if kind != "ident":
+                raise QuerySyntaxError(f"Expected a field, got {name!r}")
+            if self._keyword("in"):
+                if self._next("'('")[1] != "(":
+                    raise QuerySyntaxError("Expected '(' after in")
+                values = [self._value(name)]
+                while True:
+                    tok = self._next("')'")
+                    if tok[1] == ")":
+                        break
+                    if tok[1] != ",":
+                        raise QuerySyntaxError("Expected ',' or ')'")
+                    values.append(self._value(name))
+                query.predicates.append(Predicate(name, "in", tuple(values)))
+                continue
+            kind, op, _ = self._next("an operator")
+            if kind != "op" or op not in _OPS:
+                raise QuerySyntaxError(f"Expected an operator after {name}, got {op!r}")
+            query.predicates.append(Predicate(name, op, self._value(name)))
+        return query
+
+
+def _is_duration_field(name: str) -> bool:
+    if name == "span.duration_ms":
+        return True
+    scope, _, rest = name.partition(".")
+    return scope == "latency" and rest != "span_count" and not rest.startswith("share.")
+
+
+# -------------------------
+# Field access
+# -------------------------
+
+
+def _span_getter(path: str) -> Callable[[Span], Any]:
+    if path.startswith("attr."):
+        key = path[5:]
+        return lambda s: (s._attributes or {}).get(key, _MISSING)
+    if path == "name":
+        return lambda s: s.name
+    if path == "kind":
+        return _kind_like
+    if path == "status":
+        return lambda s: s.status.value
+    if path == "duration_ms":
+        return lambda s: s.duration_ns / 1e6 if s.end_ns is not None else _MISSING
+    if path == "component":
+        return lambda s: classify(s).component
+    return lambda s: classify(s).phase
+
+
+def _latency_value(f: LatencyFeatures, path: str) -> Any:
+    """Aggregate for ``path``; a component the trace does not have is missing, not 0."""
+    if path in _LATENCY_FIELDS:
+        return getattr(f, path)
+    group, _, component = path.partition(".")
+    if group == "self" and component:
+        return f.self_by_component_ms.get(component, _MISSING)
+    if group == "critical" and component:
+        return f.critical_by_component_ms.get(component, _MISSING)
+    if group == "share" and component:
+        return f.component_share().get(component, _MISSING)
+    return f.by_component_ms.get(path, _MISSING)
+
+
+def _judge_value(payload: Dict[str, Any], path: str) -> Any:
+    key = _JUDGE_FIELDS.get(path)
+    if key is not None:
+        return payload.get(key, _MISSING)
+    return (payload.get("scores") or {}).get(path, _MISSING)
+
+
+# -------------------------
+# Planning
+# -------------------------
+
+
+@dataclass
+class TraceMatch:
+    trace_id: str
+    spans: List[Span]
+    latency: Optional[LatencyFeatures] = None
+    judge: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class QueryPlan:
+    """How a TraceQuery will run: what is pushed down and what is evaluated per trace."""
+
+    source: str  # "trace_ids", "judge_results" or "scan"
+    start_ns: Optional[int] = None
+    end_ns: Optional[int] = None
+    trace_ids: Optional[FrozenSet[str]] = None
+    rubric: Optional[str] = None
+    span_predicates: List[Predicate] = field(default_factory=list)
+    latency_predicates: List[Predicate] = field(default_factory=list)
+    judge_predicates: List[Predicate] = field(default_factory=list)
+    limit: Optional[int] = None
+
+    def explain(self) -> str:
+        window = f"[{self.start_ns}, {self.end_ns})" if self.start_ns is not None or self.end_ns is not None else "all"
+        if self.source == "trace_ids":
+            lines = [f"lookup {len(self.trace_ids or ())} trace(s) by id, spans in {window}"]
+        elif self.source == "judge_results":
+            rubric = f" rubric={self.rubric!r}" if self.rubric is not None else ""
+            lines = [f"scan judge results{rubric}, fetch matching traces by id, spans in {window}"]
+        else:
+            lines = [f"scan spans in {window}, grouped into traces"]
+        if self.trace_ids is not None and self.source != "trace_ids":
+            lines.append(f"filter trace_id in {len(self.trace_ids)} id(s)")
+        if self.span_predicates:
+            lines.append("filter any span: " + " and ".join(map(str, self.span_predicates)))
+        if self.latency_predicates:
+            lines.append("filter latency: " + " and ".join(map(str, self.latency_predicates)))
+        if self.judge_predicates and self.source != "judge_results":
+            lines.append("join judge results, filter: " + " and ".join(map(str, self.judge_predicates)))
+        elif self.judge_predicates:
+            lines[0] += " (filter: " + " and ".join(map(str, self.judge_predicates)) + ")"
+        if self.limit is not None:
+            lines.append(f"limit {self.limit}")
+        return "\n".join(lines)
+
+
+class TraceQueryEngine:
+    """Runs TraceQuery / DSL queries over a trace store and an optional ResultStore.
+
+    The planner pushes ``start_ns`` ranges into the store's ``iter_spans``
+    (index blocks, partition and segment pruning) and answers ``trace_id``
+    predicates with ``get_trace`` on indexed stores (JsonlTraceStore). When
+    judge predicates are present and the result store can be scanned
+    (SqliteResultStore) and no time window is given, judged traces are the
+    driving side: they are a small sample, so only those traces are fetched.
+    Everything else runs as
+    a streaming pipeline, cheapest filter first (span, then latency, then
+    judge lookups), and stops reading as soon as ``limit`` matches are out.
+
+    Scans group spans into traces as exporters write them, in end order
+    (a trace is complete when its root arrives). Stores that do not read
+    back in end order declare ``span_order = "any"`` (PartitionedTraceStore
+    reads segments by start time, so a root can come before its children);
+    they are grouped over the whole window first. ``span_order`` overrides
+    the store's declaration.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        results: Any = None,
+        *,
+        judge_kind: str = "judge",
+        span_order: Optional[str] = None,
+        max_inflight_traces: int = 10_000,
+        judge_batch_size: int = 256,
+    ) -> None:
+        if span_order is None:
+            span_order = getattr(store, "span_order", "end")
+        if span_order not in ("end", "any"):
+            raise ValueError(f"Unknown span_order: {span_order!r}")
+        self.store = store
+        self.results = results
+        self.judge_kind = judge_kind
+        self.span_order = span_order
+        self.max_inflight_traces = max_inflight_traces
+        self.judge_batch_size = judge_batch_size
+
+    @staticmethod
+    def _query(query: Union[str, TraceQuery]) -> TraceQuery:
+        return TraceQuery.parse(query) if isinstance(query, str) else query
+
+    def _indexed(self) -> bool:
+        return hasattr(self.store, "trace_ids") and hasattr(self.store, "get_trace")
+
+    def plan(self, query: Union[str, TraceQuery]) -> QueryPlan:
+        query = self._query(query)
+        plan = QueryPlan(source="scan", limit=query.limit)
+        lo: Optional[int] = None
+        hi: Optional[int] = None
+        for p in query.predicates:
+            if p.field == "trace_id":
+                ids = frozenset(p.value) if p.op == "in" else frozenset([p.value]) if p.op == "=" else None
+                if ids is None:
+                    raise QuerySyntaxError("trace_id only supports = and in")
+                plan.trace_ids = ids if plan.trace_ids is None else plan.trace_ids & ids
+            elif p.field == "start_ns":
+                if p.op in (">", ">="):
+                    v = p.value + (1 if p.op == ">" else 0)
+                    lo = v if lo is None else max(lo, v)
+                elif p.op in ("<", "<="):
+                    v = p.value + (1 if p.op == "<=" else 0)
+                    hi = v if hi is None else min(hi, v)
+                else:
+                    raise QuerySyntaxError("start_ns only supports <, <=, > and >=")
+            elif p.scope == "span":
+                plan.span_predicates.append(p)
+            elif p.scope == "latency":
+                plan.latency_predicates.append(p)
+            else:
+                plan.judge_predicates.append(p)
+                if p.field == "judge.rubric" and p.op == "=":
+                    plan.rubric = p.value
+        plan.start_ns, plan.end_ns = lo, hi
+
+        if plan.trace_ids is not None and self._indexed():
+            plan.source = "trace_ids"
+        elif (
+            plan.judge_predicates
+            and plan.start_ns is None
+            and plan.end_ns is None
+            and hasattr(self.results, "query")
+            and self._indexed()
+        ):
+            # Judge results are stamped with when they were written, not with
+            # trace time, so a time window is better served by a pruned scan.
+            plan.source = "judge_results"
+        return plan
+
+    def explain(self, query: Union[str, TraceQuery]) -> str:
+        return self.plan(query).explain()
+
+    def run(self, query: Union[str, TraceQuery]) -> Iterator[TraceMatch]:
+        plan = self.plan(query)
+        if plan.limit == 0:
+            return
+        if plan.source == "judge_results":
+            matches = self._judge_driven(plan)
+        else:
+            matches = self._judge_filter(plan, self._filter(plan, self._source(plan)))
+        n = 0
+        for match in matches:
+            yield match
+            n += 1
+            if plan.limit is not None and n >= plan.limit:
+                return
+
+    def count(self, query: Union[str, TraceQuery]) -> int:
+        return sum(1 for _ in self.run(query))
+
+    # -------------------------
+    # Pipeline stages
+    # -------------------------
+
+    def _window(self, plan: QueryPlan, spans: List[Span]) -> List[Span]:
+        lo, hi = plan.start_ns, plan.end_ns
+        if lo is None and hi is None:
+            return spans
+        lo = lo if lo is not None else -(1 << 63)
+        hi = hi if hi is not None else 1 << 63
+        return [s for s in spans if lo <= s.start_ns < hi]
+
+    def _source(self, plan: QueryPlan) -> Iterator[Tuple[str, List[Span], None]]:
+        if plan.source == "trace_ids":
+            for trace_id in sorted(plan.trace_ids or ()):
+                spans = self._window(plan, self.store.get_trace(trace_id))
+                if spans:
+                    yield trace_id, spans, None
+            return
+        spans = self.store.iter_spans(start_ns=plan.start_ns, end_ns=plan.end_ns)
+        if self.span_order == "any":
+            by_trace: Dict[str, List[Span]] = {}
+            for s in spans:
+                by_trace.setdefault(s.trace_id, []).append(s)
+            traces: Iterable[Tuple[str, List[Span]]] = by_trace.items()
+        else:
+            traces = _group_by_root(spans, self.max_inflight_traces)
+        for trace_id, group in traces:
+            yield trace_id, group, None
+
+    def _filter(
+        self, plan: QueryPlan, traces: Iterable[Tuple[str, List[Span], Optional[Dict[str, Any]]]]
+    ) -> Iterator[TraceMatch]:
+        """Span and latency filters over ``(trace_id, spans, judge payload or None)``."""
+        ids = plan.trace_ids
+        span_tests = [(_span_getter(p.field[5:]), p) for p in plan.span_predicates]
+        latency_preds = plan.latency_predicates
+        for trace_id, spans, judge in traces:
+            if ids is not None and trace_id not in ids:
+                continue
+            if span_tests and not any(all(p.test(get(s)) for get, p in span_tests) for s in spans):
+                continue
+            latency = None
+            if latency_preds:
+                latency = extract_latency(spans)
+                if not all(p.test(_latency_value(latency, p.field[8:])) for p in latency_preds):
+                    continue
+            yield TraceMatch(trace_id, spans, latency, judge)
+
+    def _judge_ok(self, plan: QueryPlan, payload: Optional[Dict[str, Any]]) -> bool:
+        if payload is None:
+            return False
+        return all(p.test(_judge_value(payload, p.field[6:])) for p in plan.judge_predicates)
+
+    def _judge_filter(self, plan: QueryPlan, matches: Iterator[TraceMatch]) -> Iterator[TraceMatch]:
+        if not plan.judge_predicates:
+            yield from matches
+            return
+        if self.results is None:
+            raise ValueError("Query has judge predicates but the engine has no result store")
+        batch: List[TraceMatch] = []
+        for m in matches:
+            batch.append(m)
+            if len(batch) >= self.judge_batch_size:
+                yield from self._judge_batch(plan, batch)
+                batch = []
+        yield from self._judge_batch(plan, batch)
+
+    def _judge_batch(self, plan: QueryPlan, batch: List[TraceMatch]) -> Iterator[TraceMatch]:
+        if not batch:
+            return
+        read_many = getattr(self.results, "read_many", None)
+        if read_many is not None:
+            payloads = read_many([m.trace_id for m in batch], self.judge_kind)
+        else:
+            payloads = {}
+            for m in batch:
+                try:
+                    payloads[m.trace_id] = self.results.read(m.trace_id, self.judge_kind)
+                except (KeyError, FileNotFoundError):
+                    pass
+        for m in batch:
+            payload = payloads.get(m.trace_id)
+            if self._judge_ok(plan, payload):
+                m.judge = payload
+                yield m
+
+    def _judge_driven(self, plan: QueryPlan) -> Iterator[TraceMatch]:
+        def traces() -> Iterator[Tuple[str, List[Span], Dict[str, Any]]]:
+            for row in self.results.query(kind=self.judge_kind, rubric=plan.rubric):
+                if not self._judge_ok(plan, row.payload):
+                    continue
+                spans = self._window(plan, self.store.get_trace(row.trace_id))
+                if spans:
+                    yield row.trace_id, spans, row.payload
+
+        return self._filter(plan, traces())
+
+
+def _group_by_root(spans: Iterable[Span], max_inflight: int) -> Iterator[Tuple[str, List[Span]]]:
+    """Traces from spans in end order: a trace is complete when its root arrives."""
+    inflight: "OrderedDict[str, List[Span]]" = OrderedDict()
+    done: "OrderedDict[str, None]" = OrderedDict()
+    for s in spans:
+        trace_id = s.trace_id
+        group = inflight.get(trace_id)
+        if group is None:
+            if trace_id in done:
+                continue
+            group = inflight[trace_id] = []
+            if len(inflight) > max_inflight:
+                oldest = next(iter(inflight))
+                done[oldest] = None
+                yield oldest, inflight.pop(oldest)
+        group.append(s)
+        if s.parent_id is None:
+            del inflight[trace_id]
+            done[trace_id] = None
+            if len(done) > max_inflight:
+                done.popitem(last=False)
+            yield trace_id, group
+    yield from inflight.items()
@@ -4,18 +4,26 @@ from spanrecorder.recorder import SpanRecorder
 
 
 def instrumented_rag_example(rec: SpanRecorder, query: str) -> str:
-    with rec.span("request", kind="request", attributes={"user.query": query, "component": "app"}):
-        with rec.span("retrieval.search", kind="retrieval.search", attributes={"retrieval.top_k": 3}):
+    """Toy RAG request with the spans and attributes the judge and latency code read.
+
+    Passages and the answer can be large: export through an
+    OffloadingExporter so they are stored once in a blob store rather than
+    inline in every trace.
+    """
+    with rec.start_span("request", attrs={"kind": "request", "user.query": query, "component": "app"}):
+        with rec.start_span("retrieval.search", attrs={"kind": "retrieval.search", "retrieval.top_k": 3}):
             passages = [
                 {"id": "doc1", "text": "Example passage one."},
                 {"id": "doc2", "text": "Example passage two."},
             ]
-        rec.add_event_span("retrieval.result", kind="retrieval.result", attributes={"retrieval.passages": passages})
+        with rec.start_span("retrieval.result", attrs={"kind": "retrieval.result", "retrieval.passages": passages}):
+            pass
 
-        with rec.span("llm.call", kind="llm.call", attributes={"component": "llm", "phase": "prefill"}):
+        with rec.start_span("llm.call", attrs={"kind": "llm.call", "component": "llm", "phase": "prefill"}):
             pass
-        with rec.span("llm.call", kind="llm.call", attributes={"component": "llm", "phase": "decode"}):
+        with rec.start_span("llm.call", attrs={"kind": "llm.call", "component": "llm", "phase": "decode"}):
             answer = "This is a placeholder answer."
 
-        rec.add_event_span("response", kind="response", attributes={"assistant.answer": answer})
+        with rec.start_span("response", attrs={"kind": "response", "assistant.answer": answer}):
+            pass
         return answer
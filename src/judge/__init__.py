@@ -1,6 +1,67 @@
 """AI-as-judge evaluation: rubrics, prompt templates, extraction, and scoring."""
 from .runner import JudgeClient, run_judge
-from .extract import build_judge_request, JudgeRequest
+from .extract import build_judge_request, build_judge_requests, JudgeRequest, SpanExtractor
 from .scoring import JudgeResult
+from .async_runner import (
+    AsyncJudgeClient,
+    JudgeBatchConfig,
+    ThreadPoolJudgeClient,
+    TransientJudgeError,
+    arun_judge,
+    arun_judge_many,
+    run_judge_batch,
+)
+from .batching import arun_judge_batched, plan_batches, run_judge_batched, split_batch_output
+from .cache import JudgeCache, JudgeCacheStats, judge_cache_key, run_judge_cached
+from .sampling import JudgeSamplingPlanner, SampledTrace, Stratum, weighted_mean
+from .parsing import JudgeJsonScanner, extract_judge_json
+from .streaming import (
+    AsyncEarlyStopJudgeClient,
+    AsyncStreamingJudgeClient,
+    EarlyStopJudgeClient,
+    StreamingJudgeClient,
+    arun_judge_streaming,
+    run_judge_streaming,
+)
+from .cascade import CascadeConfig, JudgeTier, arun_judge_cascade, run_judge_cascade
 
-__all__ = ["JudgeClient", "run_judge", "build_judge_request", "JudgeRequest", "JudgeResult"]
+__all__ = [
+    "JudgeClient",
+    "run_judge",
+    "build_judge_request",
+    "build_judge_requests",
+    "SpanExtractor",
+    "JudgeRequest",
+    "JudgeResult",
+    "AsyncJudgeClient",
+    "JudgeBatchConfig",
+    "ThreadPoolJudgeClient",
+    "TransientJudgeError",
+    "arun_judge",
+    "arun_judge_many",
+    "run_judge_batch",
+    "JudgeCache",
+    "JudgeCacheStats",
+    "judge_cache_key",
+    "run_judge_cached",
+    "plan_batches",
+    "run_judge_batched",
+    "arun_judge_batched",
+    "split_batch_output",
+    "CascadeConfig",
+    "JudgeTier",
+    "run_judge_cascade",
+    "arun_judge_cascade",
+    "JudgeSamplingPlanner",
+    "SampledTrace",
+    "Stratum",
+    "weighted_mean",
+    "JudgeJsonScanner",
+    "extract_judge_json",
+    "StreamingJudgeClient",
+    "AsyncStreamingJudgeClient",
+    "EarlyStopJudgeClient",
+    "AsyncEarlyStopJudgeClient",
+    "run_judge_streaming",
+    "arun_judge_streaming",
+]
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+from judge.extract import JudgeRequest
+from judge.runner import JudgeClient, parse_judge_output
+from judge.scoring import JudgeResult
+from judge.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from judge.cache import JudgeCache
+
+
+class AsyncJudgeClient(Protocol):
+    async def acomplete(self, prompt: str) -> str:
+        ...
+
+
+class TransientJudgeError(Exception):
+    """Raised by clients for failures worth retrying (429s, 5xx, dropped connections)."""
+
+
+class ThreadPoolJudgeClient:
+    """Runs a blocking JudgeClient on a thread pool so it can be awaited.
+
+    A timed-out call keeps its worker thread until the blocking call returns.
+    """
+
+    def __init__(self, client: JudgeClient, max_workers: int = 8) -> None:
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="evaltrace-judge")
+
+    async def acomplete(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.client.complete, prompt)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class TokenBucket:
+    """Reservation-style token bucket: callers queue by going into debt.
+
+    ``acquire(n)`` takes ``n`` tokens immediately and sleeps until the
+    bucket would have refilled them, so waiters are served in arrival order
+    and a request larger than ``capacity`` still goes through (after a wait).
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._last = clock()
+
+    def reserve(self, n: float = 1.0) -> float:
+        """Take ``n`` tokens; returns how long to wait before using them."""
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        self._tokens -= n
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    async def acquire(self, n: float = 1.0) -> None:
+        wait = self.reserve(n)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+@dataclass(frozen=True)
+class JudgeBatchConfig:
+    max_concurrency: int = 8
+    requests_per_s: Optional[float] = None
+    tokens_per_min: Optional[float] = None
+    timeout_s: Optional[float] = 60.0
+    max_retries: int = 3
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 30.0
+    retry_on: Tuple[Type[BaseException], ...] = (TransientJudgeError, ConnectionError, TimeoutError)
+
+
+class _Limiter:
+    def __init__(self, config: JudgeBatchConfig) -> None:
+        self.requests = (
+            TokenBucket(config.requests_per_s, max(1.0, config.requests_per_s)) if config.requests_per_s else None
+        )
+        self.tokens = (
+            TokenBucket(config.tokens_per_min / 60.0, config.tokens_per_min) if config.tokens_per_min else None
+        )
+
+    async def acquire(self, prompt: str) -> None:
+        if self.requests is not None:
+            await self.requests.acquire()
+        if self.tokens is not None:
+            await self.tokens.acquire(estimate_tokens(prompt))
+
+
+def _failed(req: JudgeRequest, error: BaseException, attempts: int) -> JudgeResult:
+    return JudgeResult(
+        trace_id=req.trace_id,
+        rubric_name=req.rubric_name,
+        scores={},
+        rationale=f"Judge call failed: {type(error).__name__}: {error}",
+        raw={"error": type(error).__name__, "message": str(error), "attempts": attempts},
+    )
+
+
+class JudgeCallError(Exception):
+    """A judge call that failed for good; ``error`` is the last underlying exception."""
+
+    def __init__(self, error: BaseException, attempts: int) -> None:
+        super().__init__(f"{type(error).__name__}: {error}")
+        self.error = error
+        self.attempts = attempts
+
+
+async def acomplete_with_retries(
+    prompt: str,
+    client: AsyncJudgeClient,
+    config: JudgeBatchConfig = JudgeBatchConfig(),
+    *,
+    _limiter: Optional[_Limiter] = None,
+    _rng: Optional[random.Random] = None,
+) -> str:
+    """One rate-limited completion with a timeout and jittered retries.
+
+    Transient failures (``config.retry_on``, timeouts) are retried with full
+    jitter exponential backoff; anything else, or running out of retries,
+    raises JudgeCallError.
+    """
+    limiter = _limiter or _Limiter(config)
+    rng = _rng or random
+    attempt = 0
+    while True:
+        attempt += 1
+        await limiter.acquire(prompt)
+        try:
+            if config.timeout_s is None:
+                return await client.acomplete(prompt)
+            return await asyncio.wait_for(client.acomplete(prompt), config.timeout_s)
+        except (asyncio.TimeoutError, *config.retry_on) as e:
+            if attempt > config.max_retries:
+                raise JudgeCallError(e, attempt) from e
+            cap = min(config.backoff_max_s, config.backoff_base_s * 2 ** (attempt - 1))
+            await asyncio.sleep(rng.uniform(0, cap))
+        except Exception as e:
+            raise JudgeCallError(e, attempt) from e
+
+
+async def arun_judge(
+    req: JudgeRequest,
+    client: AsyncJudgeClient,
+    config: JudgeBatchConfig = JudgeBatchConfig(),
+    *,
+    cache: Optional["JudgeCache"] = None,
+    _limiter: Optional[_Limiter] = None,
+    _rng: Optional[random.Random] = None,
+) -> JudgeResult:
+    """Async run_judge() on top of acomplete_with_retries().
+
+    When the call fails for good, the result carries the error in ``raw``
+    instead of raising, so one bad trace cannot sink a batch. With a
+    ``cache``, hits skip the rate limiter and the call entirely.
+    """
+    if cache is not None:
+        return await cache.arun(req, lambda r: arun_judge(r, client, config, _limiter=_limiter, _rng=_rng))
+    try:
+        raw_text = await acomplete_with_retries(req.prompt, client, config, _limiter=_limiter, _rng=_rng)
+    except JudgeCallError as e:
+        return _failed(req, e.error, e.attempts)
+    return parse_judge_output(req, raw_text)
+
+
+def _as_async(client: Union[JudgeClient, AsyncJudgeClient], max_workers: int) -> Tuple[AsyncJudgeClient, bool]:
+    if hasattr(client, "acomplete"):
+        return client, False
+    return ThreadPoolJudgeClient(client, max_workers=max_workers), True
+
+
+async def arun_judge_many(
+    requests: Union[Iterable[JudgeRequest], AsyncIterable[JudgeRequest]],
+    client: Union[JudgeClient, AsyncJudgeClient],
+    config: JudgeBatchConfig = JudgeBatchConfig(),
+    *,
+    cache: Optional["JudgeCache"] = None,
+) -> AsyncIterator[JudgeResult]:
+    """Judge ``requests`` concurrently, yielding results as they complete.
+
+    At most ``config.max_concurrency`` calls are in flight and requests are
+    pulled from the input lazily, so the input may be a generator over a
+    large run. Sync clients are wrapped in a ThreadPoolJudgeClient.
+    """
+    async for _, res in _arun_indexed(requests, client, config, cache):
+        yield res
+
+
+async def _arun_indexed(
+    requests: Union[Iterable[JudgeRequest], AsyncIterable[JudgeRequest]],
+    client: Union[JudgeClient, AsyncJudgeClient],
+    config: JudgeBatchConfig,
+    cache: Optional["JudgeCache"] = None,
+) -> AsyncIterator[Tuple[int, JudgeResult]]:
+    aclient, owned = _as_async(client, config.max_concurrency)
+    limiter = _Limiter(config)
+    rng = random.Random()
+    pending: Set[asyncio.Task] = set()
+
+    if hasattr(requests, "__aiter__"):
+        source = requests.__aiter__()
+
+        async def next_request() -> Optional[JudgeRequest]:
+            try:
+                return await source.__anext__()
+            except StopAsyncIteration:
+                return None
+    else:
+        it = iter(requests)
+
+        async def next_request() -> Optional[JudgeRequest]:
+            return next(it, None)
+
+    async def judge(i: int, req: JudgeRequest) -> Tuple[int, JudgeResult]:
+        return i, await arun_judge(req, aclient, config, cache=cache, _limiter=limiter, _rng=rng)
+
+    try:
+        exhausted = False
+        index = 0
+        while True:
+            while not exhausted and len(pending) < config.max_concurrency:
+                req = await next_request()
+                if req is None:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(judge(index, req)))
+                index += 1
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if owned:
+            aclient.close()
+
+
+def run_judge_batch(
+    requests: Iterable[JudgeRequest],
+    client: Union[JudgeClient, AsyncJudgeClient],
+    config: JudgeBatchConfig = JudgeBatchConfig(),
+    *,
+    cache: Optional["JudgeCache"] = None,
+) -> List[JudgeResult]:
+    """Blocking wrapper around arun_judge_many(); results come back in input order."""
+    reqs = list(requests)
+
+    async def collect() -> List[JudgeResult]:
+        out: List[Optional[JudgeResult]] = [None] * len(reqs)
+        async for i, res in _arun_indexed(reqs, client, config, cache):
+            out[i] = res
+        return out
+
+    return asyncio.run(collect())
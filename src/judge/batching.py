@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from judge.async_runner import (
+    AsyncJudgeClient,
+    JudgeBatchConfig,
+    JudgeCallError,
+    _as_async,
+    _Limiter,
+    acomplete_with_retries,
+    arun_judge,
+)
+from judge.extract import JudgeRequest
+from judge.prompts.templates import compile_prompt
+from judge.rubrics.base import Rubric
+from judge.runner import JudgeClient, run_judge
+from judge.scoring import JudgeResult, normalize_judge_output
+from judge.tokens import estimate_tokens
+
+
+def plan_batches(
+    requests: Sequence[JudgeRequest],
+    rubric: Rubric,
+    *,
+    token_budget: int = 8000,
+    max_batch_size: int = 16,
+    output_tokens_per_item: int = 150,
+) -> List[List[int]]:
+    """Group request indices into batches that fit ``token_budget``.
+
+    Each item costs its serialized payload plus ``output_tokens_per_item``
+    for its share of the answer, so batches shrink automatically for long
+    traces. A trace id appears at most once per batch; a request too large
+    for any batch ends up alone (and is judged with its own prompt).
+    """
+    compiled = compile_prompt(rubric)
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_ids = set()
+    used = compiled.batch_fixed_tokens
+    for i, req in enumerate(requests):
+        cost = estimate_tokens(compiled.batch_item(req.trace_id, req.payload)) + output_tokens_per_item
+        if cur and (len(cur) >= max_batch_size or used + cost > token_budget or req.trace_id in cur_ids):
+            batches.append(cur)
+            cur, cur_ids, used = [], set(), compiled.batch_fixed_tokens
+        cur.append(i)
+        cur_ids.add(req.trace_id)
+        used += cost
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def build_batch_prompt(requests: Sequence[JudgeRequest], rubric: Rubric) -> str:
+    compiled = compile_prompt(rubric)
+    return compiled.render_batch([compiled.batch_item(r.trace_id, r.payload) for r in requests])
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text
+
+
+def _entries(parsed: Any) -> List[Any]:
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        for key in ("results", "items", "evaluations"):
+            if isinstance(parsed.get(key), list):
+                return parsed[key]
+        # {"<trace_id>": {...}, ...}
+        return [{"trace_id": k, **v} for k, v in parsed.items() if isinstance(v, dict)]
+    return []
+
+
+def split_batch_output(raw_text: str, requests: Sequence[JudgeRequest], rubric: Rubric) -> Dict[str, JudgeResult]:
+    """Per-trace results from a batched answer; missing or malformed entries are left out.
+
+    An entry is kept when its trace_id belongs to the batch and its scores
+    cover every rubric dimension.
+    """
+    try:
+        parsed = json.loads(_strip_fences(raw_text))
+    except ValueError:
+        return {}
+    wanted = {r.trace_id for r in requests}
+    dims = [d.key for d in getattr(rubric, "dimensions", ())]
+    out: Dict[str, JudgeResult] = {}
+    for entry in _entries(parsed):
+        if not isinstance(entry, dict):
+            continue
+        trace_id = str(entry.get("trace_id"))
+        if trace_id not in wanted or trace_id in out:
+            continue
+        res = normalize_judge_output(trace_id, rubric.name, entry)
+        if res.scores and all(d in res.scores for d in dims):
+            out[trace_id] = res
+    return out
+
+
+def run_judge_batched(
+    requests: Iterable[JudgeRequest],
+    client: JudgeClient,
+    rubric: Rubric,
+    *,
+    token_budget: int = 8000,
+    max_batch_size: int = 16,
+) -> List[JudgeResult]:
+    """Judge several traces per call; results come back in input order.
+
+    Requests are packed by plan_batches() under one shared rubric header and
+    the judge answers with a JSON array keyed by trace_id. Entries that are
+    missing or malformed (or a batch call that fails outright) fall back to
+    one run_judge() call per trace.
+    """
+    reqs = list(requests)
+    results: List[Optional[JudgeResult]] = [None] * len(reqs)
+    for batch in plan_batches(reqs, rubric, token_budget=token_budget, max_batch_size=max_batch_size):
+        members = [reqs[i] for i in batch]
+        parsed: Dict[str, JudgeResult] = {}
+        if len(batch) > 1:
+            try:
+                parsed = split_batch_output(client.complete(build_batch_prompt(members, rubric)), members, rubric)
+            except Exception:
+                parsed = {}
+        for i, req in zip(batch, members):
+            results[i] = parsed.get(req.trace_id) or run_judge(req, client)
+    return results
+
+
+async def arun_judge_batched(
+    requests: Iterable[JudgeRequest],
+    client: Union[JudgeClient, AsyncJudgeClient],
+    rubric: Rubric,
+    config: JudgeBatchConfig = JudgeBatchConfig(),
+    *,
+    token_budget: int = 8000,
+    max_batch_size: int = 16,
+) -> List[JudgeResult]:
+    """Async run_judge_batched(): batches run concurrently under ``config`` limits."""
+    reqs = list(requests)
+    aclient, owned = _as_async(client, config.max_concurrency)
+    limiter, rng = _Limiter(config), random.Random()
+    gate = asyncio.Semaphore(config.max_concurrency)
+    results: List[Optional[JudgeResult]] = [None] * len(reqs)
+
+    async def judge_batch(batch: List[int]) -> None:
+        members = [reqs[i] for i in batch]
+        parsed: Dict[str, JudgeResult] = {}
+        if len(batch) > 1:
+            prompt = build_batch_prompt(members, rubric)
+            async with gate:
+                try:
+                    raw = await acomplete_with_retries(prompt, aclient, config, _limiter=limiter, _rng=rng)
+                    parsed = split_batch_output(raw, members, rubric)
+                except JudgeCallError:
+                    parsed = {}
+        for i, req in zip(batch, members):
+            res = parsed.get(req.trace_id)
+            if res is None:
+                async with gate:
+                    res = await arun_judge(req, aclient, config, _limiter=limiter, _rng=rng)
+            results[i] = res
+
+    try:
+        batches = plan_batches(reqs, rubric, token_budget=token_budget, max_batch_size=max_batch_size)
+        await asyncio.gather(*(judge_batch(b) for b in batches))
+    finally:
+        if owned:
+            aclient.close()
+    return results
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from judge.extract import JudgeRequest
+from judge.runner import JudgeClient, run_judge
+from judge.scoring import JudgeResult
+
+
+def judge_cache_key(rubric_name: str, rubric_version: Optional[str], prompt: str, model_id: str) -> str:
+    """Stable content address of one judge call."""
+    h = hashlib.sha256()
+    for part in (rubric_name, rubric_version or "", model_id, prompt):
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+@dataclass
+class JudgeCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # callers that waited on an identical in-flight request
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _DiskTier:
+    """One JSON file per key, sharded by key prefix, with size and age eviction.
+
+    The byte counter and eviction are guarded by a lock of their own, so
+    file reads and writes from many threads do not serialize on it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age_s: Optional[float]) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        out = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    out.append((st.st_mtime, path, st.st_size))
+        return out
+
+    def _remove(self, path: str, size: int) -> None:
+        # Caller holds self._lock.
+        try:
+            os.remove(path)
+            self._bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+            if self.max_age_s is not None and time.time() - st.st_mtime > self.max_age_s:
+                with self._lock:
+                    self._remove(path, st.st_size)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, value: Dict) -> int:
+        """Store ``value``; returns how many entries were evicted to make room."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                old = os.path.getsize(path)
+            except FileNotFoundError:
+                old = 0
+            os.replace(tmp, path)
+            self._bytes += len(data) - old
+            return self._evict() if self._bytes > self.max_bytes else 0
+
+    def _evict(self) -> int:
+        # Caller holds self._lock. Trim to 90% so eviction scans stay rare;
+        # oldest (and expired) first.
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, path, size in sorted(self._scan()):
+            if self._bytes <= target:
+                break
+            self._remove(path, size)
+            evicted += 1
+        return evicted
+
+
+class JudgeCache:
+    """Two-tier cache of judge results for one judge model.
+
+    Keys are judge_cache_key(rubric name, rubric version, prompt, model_id),
+    so a result is reused for any trace whose prompt is identical. The
+    memory tier is an LRU of ``max_entries``; the optional disk tier
+    (``directory``) survives restarts and is bounded by ``max_bytes`` and
+    ``max_age_s``. Concurrent identical requests are coalesced into one call
+    (single-flight). Only results with scores are cached, so failures and
+    non-JSON answers are retried next time.
+    """
+
+    def __init__(
+        self,
+        *,
+        model_id: str = "",
+        max_entries: int = 10_000,
+        directory: Optional[str] = None,
+        max_bytes: int = 256 << 20,
+        max_age_s: Optional[float] = None,
+    ) -> None:
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.stats = JudgeCacheStats()
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._disk = _DiskTier(directory, max_bytes, max_age_s) if directory else None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[str, "asyncio.Future[JudgeResult]"] = {}
+
+    def key(self, req: JudgeRequest) -> str:
+        return judge_cache_key(req.rubric_name, req.rubric_version, req.prompt, self.model_id)
+
+    # -------------------------
+    # Tiers
+    # -------------------------
+
+    def get(self, req: JudgeRequest) -> Optional[JudgeResult]:
+        hit = self._lookup(self.key(req))
+        return _restamp(hit, req) if hit is not None else None
+
+    def put(self, req: JudgeRequest, result: JudgeResult) -> None:
+        if result.scores:
+            self._store(self.key(req), result.to_dict())
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return value
+        value = self._disk.get(key) if self._disk is not None else None
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self.stats.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def _store(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._remember(key, value)
+        if self._disk is not None:
+            evicted = self._disk.put(key, value)
+            with self._lock:
+                self.stats.evictions += evicted
+
+    def _remember(self, key: str, value: Dict) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    # -------------------------
+    # Single-flight
+    # -------------------------
+
+    def run(self, req: JudgeRequest, call: Callable[[JudgeRequest], JudgeResult]) -> JudgeResult:
+        """Cached ``call(req)``; threads asking for the same key share one call."""
+        key = self.key(req)
+        hit = self._lookup(key)
+        if hit is not None:
+            return _restamp(hit, req)
+        with self._lock:
+            # A leader may have stored the result and left _inflight since
+            # the lookup above; check again before becoming a new leader.
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats.coalesced += 1
+                return _restamp(value, req)
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+            else:
+                self.stats.coalesced += 1
+        if not leader:
+            return _restamp(fut.result().to_dict(), req)
+        try:
+            result = call(req)
+            if result.scores:
+                self._store(key, result.to_dict())
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def arun(self, req: JudgeRequest, call: Callable[[JudgeRequest], Awaitable[JudgeResult]]) -> JudgeResult:
+        """Async run(): coroutines on one event loop share one call per key."""
+        key = self.key(req)
+        hit = self._lookup(key)
+        if hit is not None:
+            return _restamp(hit, req)
+        fut = self._ainflight.get(key)
+        if fut is not None:
+            self.stats.coalesced += 1
+            return _restamp((await asyncio.shield(fut)).to_dict(), req)
+        fut = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await call(req)
+            if result.scores:
+                self._store(key, result.to_dict())
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._ainflight[key]
+
+
+def _restamp(value: Dict, req: JudgeRequest) -> JudgeResult:
+    res = JudgeResult.from_dict(value)
+    res.trace_id = req.trace_id
+    return res
+
+
+def run_judge_cached(req: JudgeRequest, client: JudgeClient, cache: JudgeCache) -> JudgeResult:
+    return cache.run(req, lambda r: run_judge(r, client))
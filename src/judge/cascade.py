@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple, Union
+
+from judge.async_runner import AsyncJudgeClient, JudgeBatchConfig, _as_async, _Limiter, arun_judge
+from judge.extract import JudgeRequest
+from judge.rubrics.base import Rubric
+from judge.runner import JudgeClient, run_judge
+from judge.scoring import JudgeResult
+
+
+@dataclass(frozen=True)
+class JudgeTier:
+    """One judge in a cascade; ``samples`` > 1 asks it several times to measure agreement."""
+
+    name: str
+    client: Union[JudgeClient, AsyncJudgeClient]
+    samples: int = 1
+
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    """When a tier's answer counts as uncertain (and the next tier is asked).
+
+    - non-JSON output or scores missing a rubric dimension
+    - ``overall`` in ``borderline_overall`` (e.g. the pass/fail boundary)
+    - samples disagreeing: confidence below ``min_confidence``
+    """
+
+    borderline_overall: Tuple[int, ...] = (3,)
+    min_confidence: float = 0.75
+
+
+@dataclass
+class _Assessment:
+    result: JudgeResult
+    reasons: List[str] = field(default_factory=list)
+
+
+def _median_low(values: List[int]) -> int:
+    values = sorted(values)
+    return values[(len(values) - 1) // 2]
+
+
+def _agreement(samples: List[JudgeResult], keys: Sequence[str]) -> float:
+    """Lowest share of samples agreeing with the modal score, over dimensions and overall."""
+    shares = []
+    for key in keys:
+        votes = [s.scores[key] for s in samples if key in s.scores]
+        if votes:
+            shares.append(Counter(votes).most_common(1)[0][1] / len(samples))
+    overall = [s.overall for s in samples if s.overall is not None]
+    if overall:
+        shares.append(Counter(overall).most_common(1)[0][1] / len(samples))
+    return min(shares) if shares else 0.0
+
+
+def assess_samples(
+    samples: List[JudgeResult], rubric: Rubric, tier: str, config: CascadeConfig = CascadeConfig()
+) -> _Assessment:
+    """Consensus of one tier's samples plus the reasons (if any) to escalate.
+
+    The consensus takes the low median per dimension and for ``overall``; its
+    confidence is the agreement between samples (None for a single sample).
+    """
+    dims = [d.key for d in getattr(rubric, "dimensions", ())]
+    valid = [s for s in samples if s.scores]
+    reasons: List[str] = []
+    if len(valid) < len(samples):
+        reasons.append("non_json")
+    if not valid:
+        base = samples[0]
+        return _Assessment(
+            JudgeResult(base.trace_id, base.rubric_name, {}, None, base.rationale, base.raw, tier=tier, confidence=0.0),
+            reasons,
+        )
+
+    keys = dims or sorted({k for s in valid for k in s.scores})
+    scores = {}
+    for k in keys:
+        votes = [s.scores[k] for s in valid if k in s.scores]
+        if votes:
+            scores[k] = _median_low(votes)
+    overalls = [s.overall for s in valid if s.overall is not None]
+    overall = _median_low(overalls) if overalls else None
+    confidence = _agreement(samples, keys) if len(samples) > 1 else None
+
+    if any(d not in scores for d in dims):
+        reasons.append("missing_dimensions")
+    if overall in config.borderline_overall:
+        reasons.append("borderline")
+    if confidence is not None and confidence < config.min_confidence:
+        reasons.append("disagreement")
+
+    # Keep the rationale of the sample closest to the consensus.
+    closest = min(valid, key=lambda s: sum(abs(s.scores.get(k, 0) - v) for k, v in scores.items()))
+    result = JudgeResult(
+        trace_id=closest.trace_id,
+        rubric_name=closest.rubric_name,
+        scores=scores,
+        overall=overall,
+        rationale=closest.rationale,
+        raw=closest.raw,
+        tier=tier,
+        confidence=confidence,
+    )
+    return _Assessment(result, reasons)
+
+
+def _finish(assessment: _Assessment, escalations: List[Dict]) -> JudgeResult:
+    res = assessment.result
+    if escalations:
+        res.raw = {**(res.raw or {}), "cascade": escalations}
+    return res
+
+
+def run_judge_cascade(
+    req: JudgeRequest, tiers: Sequence[JudgeTier], rubric: Rubric, config: CascadeConfig = CascadeConfig()
+) -> JudgeResult:
+    """Judge with the first (cheapest) tier and escalate while the answer is uncertain.
+
+    The last tier's answer is final. Each escalation is recorded in
+    ``raw["cascade"]`` as ``{"tier", "reasons"}``.
+    """
+    if not tiers:
+        raise ValueError("No judge tiers")
+    escalations: List[Dict] = []
+    for i, tier in enumerate(tiers):
+        samples = [run_judge(req, tier.client) for _ in range(max(1, tier.samples))]
+        assessment = assess_samples(samples, rubric, tier.name, config)
+        if not assessment.reasons or i == len(tiers) - 1:
+            return _finish(assessment, escalations)
+        escalations.append({"tier": tier.name, "reasons": assessment.reasons})
+    raise AssertionError("unreachable")
+
+
+async def arun_judge_cascade(
+    requests: Sequence[JudgeRequest],
+    tiers: Sequence[JudgeTier],
+    rubric: Rubric,
+    config: CascadeConfig = CascadeConfig(),
+    batch_config: JudgeBatchConfig = JudgeBatchConfig(),
+) -> List[JudgeResult]:
+    """run_judge_cascade() for many requests; each tier has its own concurrency and rate limits."""
+    if not tiers:
+        raise ValueError("No judge tiers")
+    clients = [_as_async(t.client, batch_config.max_concurrency) for t in tiers]
+    limiters = [_Limiter(batch_config) for _ in tiers]
+    gates = [asyncio.Semaphore(batch_config.max_concurrency) for _ in tiers]
+    rng = random.Random()
+
+    async def sample(i: int, req: JudgeRequest) -> JudgeResult:
+        async with gates[i]:
+            return await arun_judge(req, clients[i][0], batch_config, _limiter=limiters[i], _rng=rng)
+
+    async def judge(req: JudgeRequest) -> JudgeResult:
+        escalations: List[Dict] = []
+        for i, tier in enumerate(tiers):
+            samples = await asyncio.gather(*(sample(i, req) for _ in range(max(1, tier.samples))))
+            assessment = assess_samples(list(samples), rubric, tier.name, config)
+            if not assessment.reasons or i == len(tiers) - 1:
+                return _finish(assessment, escalations)
+            escalations.append({"tier": tier.name, "reasons": assessment.reasons})
+        raise AssertionError("unreachable")
+
+    try:
+        return list(await asyncio.gather(*(judge(r) for r in requests)))
+    finally:
+        for aclient, owned in clients:
+            if owned:
+                aclient.close()
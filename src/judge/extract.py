@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import heapq
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple, Union
 
+from spanrecorder.blobs import BlobResolver, BlobStore
 from spanrecorder.span import Span
 from judge.rubrics.base import Rubric
-from judge.prompts.templates import build_judge_prompt
+from judge.prompts.templates import compile_prompt
 
 
 @dataclass
@@ -14,13 +17,7 @@ class JudgeRequest:
     rubric_name: str
     prompt: str
     payload: Dict[str, Any]
-
-
-def _first_attr(spans: List[Span], key: str) -> Optional[Any]:
-    for s in spans:
-        if key in (s.attributes or {}):
-            return s.attributes[key]
-    return None
+    rubric_version: Optional[str] = None
 
 
 def _kind_like(span: Span) -> str:
@@ -28,40 +25,235 @@ def _kind_like(span: Span) -> str:
     return str(attrs.get("kind") or span.name or "").lower()
 
 
-def build_judge_request(spans: Iterable[Span], rubric: Rubric) -> JudgeRequest:
-    spans_list = list(spans)
-    if not spans_list:
-        raise ValueError("No spans")
+class SpanExtractor(Protocol):
+    """Fills one payload field from a trace's spans in a single pass.
+
+    ``update`` sees every span once (with its lowercased kind) and returns
+    the new state; ``finish`` turns the state into the payload value. States
+    should hold only what the payload needs, not spans, so in-flight traces
+    stay small.
+    """
+
+    key: str
+
+    def init(self) -> Any: ...
+    def update(self, state: Any, span: Span, kind: str) -> Any: ...
+    def finish(self, state: Any) -> Any: ...
+
+
+@dataclass(frozen=True)
+class FirstAttr:
+    """First value of the first of ``attrs`` (in priority order) set on any span."""
+
+    key: str
+    attrs: Tuple[str, ...]
+
+    def init(self) -> Dict[str, Any]:
+        return {}
 
-    trace_id = spans_list[0].trace_id
+    def update(self, state: Dict[str, Any], span: Span, kind: str) -> Dict[str, Any]:
+        attrs = span.attributes
+        for a in self.attrs:
+            if a in attrs and a not in state:
+                state[a] = attrs[a]
+        return state
 
-    user_query = _first_attr(spans_list, "user.query") or _first_attr(spans_list, "request.query")
-    final_answer = _first_attr(spans_list, "assistant.answer") or _first_attr(spans_list, "response.text")
+    def finish(self, state: Dict[str, Any]) -> Any:
+        value = None
+        for a in self.attrs:
+            value = value or state.get(a)
+        return value
 
-    retrieved = []
-    for s in spans_list:
-        if _kind_like(s).startswith("retrieval"):
-            passages = s.attributes.get("retrieval.passages") or s.attributes.get("passages")
+
+@dataclass(frozen=True)
+class RetrievedPassages:
+    key: str = "retrieved_context"
+
+    def init(self) -> List[Any]:
+        return []
+
+    def update(self, state: List[Any], span: Span, kind: str) -> List[Any]:
+        if kind.startswith("retrieval"):
+            passages = span.attributes.get("retrieval.passages") or span.attributes.get("passages")
             if passages:
-                retrieved.append(passages)
+                state.append(passages)
+        return state
+
+    def finish(self, state: List[Any]) -> List[Any]:
+        return state
+
 
-    tools = []
-    for s in spans_list:
-        if _kind_like(s).startswith("tool"):
-            tools.append(
+@dataclass(frozen=True)
+class ToolCalls:
+    key: str = "tool_calls"
+
+    def init(self) -> List[Dict[str, Any]]:
+        return []
+
+    def update(self, state: List[Dict[str, Any]], span: Span, kind: str) -> List[Dict[str, Any]]:
+        if kind.startswith("tool"):
+            attrs = span.attributes
+            state.append(
                 {
-                    "name": s.attributes.get("tool.name") or s.attributes.get("name"),
-                    "input": s.attributes.get("tool.input"),
-                    "output": s.attributes.get("tool.output"),
+                    "name": attrs.get("tool.name") or attrs.get("name"),
+                    "input": attrs.get("tool.input"),
+                    "output": attrs.get("tool.output"),
                 }
             )
+        return state
+
+    def finish(self, state: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return state
+
+
+# Payload fields in prompt order; pass a different sequence to add or replace fields.
+DEFAULT_EXTRACTORS: Tuple[SpanExtractor, ...] = (
+    FirstAttr("user_query", ("user.query", "request.query")),
+    FirstAttr("final_answer", ("assistant.answer", "response.text")),
+    RetrievedPassages(),
+    ToolCalls(),
+)
+
+
+class _PartialTrace:
+    __slots__ = ("trace_id", "states")
+
+    def __init__(self, trace_id: str, extractors: Sequence[SpanExtractor]) -> None:
+        self.trace_id = trace_id
+        self.states = [e.init() for e in extractors]
+
+    def add(self, span: Span, extractors: Sequence[SpanExtractor]) -> None:
+        kind = _kind_like(span)
+        states = self.states
+        for i, e in enumerate(extractors):
+            states[i] = e.update(states[i], span, kind)
+
+    def payload(self, extractors: Sequence[SpanExtractor]) -> Dict[str, Any]:
+        payload = {e.key: e.finish(st) for e, st in zip(extractors, self.states)}
+        payload["trace_metadata"] = {"trace_id": self.trace_id}
+        return payload
+
+
+def _resolver(blobs: Union[BlobStore, BlobResolver, None]) -> Optional[BlobResolver]:
+    if blobs is None or isinstance(blobs, BlobResolver):
+        return blobs
+    return BlobResolver(blobs)
+
+
+def _request(
+    payload: Dict[str, Any],
+    trace_id: str,
+    rubric: Rubric,
+    token_budget: Optional[int],
+    resolver: Optional[BlobResolver] = None,
+) -> JudgeRequest:
+    if resolver is not None:
+        # Extractors carry blob references; content is only loaded here, per prompt.
+        payload = resolver.resolve(payload)
+    compiled = compile_prompt(rubric)
+    if token_budget is not None:
+        payload, _ = compiled.fit(payload, token_budget)
+    return JudgeRequest(
+        trace_id=trace_id,
+        rubric_name=rubric.name,
+        prompt=compiled.render(payload),
+        payload=payload,
+        rubric_version=getattr(rubric, "version", None),
+    )
+
+
+def build_judge_request(
+    spans: Iterable[Span],
+    rubric: Rubric,
+    *,
+    token_budget: Optional[int] = None,
+    extractors: Sequence[SpanExtractor] = DEFAULT_EXTRACTORS,
+    blobs: Union[BlobStore, BlobResolver, None] = None,
+) -> JudgeRequest:
+    """Judge request for one trace.
+
+    With ``token_budget``, passages and tool outputs are trimmed to fit (see
+    CompiledPrompt.fit) and ``payload["prompt_budget"]`` reports what was dropped.
+    Attributes offloaded to a blob store (see spanrecorder.blobs) are resolved
+    from ``blobs`` while building the prompt.
+    """
+    it = iter(spans)
+    first = next(it, None)
+    if first is None:
+        raise ValueError("No spans")
+
+    partial = _PartialTrace(first.trace_id, extractors)
+    partial.add(first, extractors)
+    for s in it:
+        partial.add(s, extractors)
+    return _request(partial.payload(extractors), partial.trace_id, rubric, token_budget, _resolver(blobs))
+
+
+def build_judge_requests(
+    spans: Iterable[Span],
+    rubric: Rubric,
+    *,
+    token_budget: Optional[int] = None,
+    max_inflight_traces: int = 10_000,
+    stream_order: str = "end",
+    extractors: Sequence[SpanExtractor] = DEFAULT_EXTRACTORS,
+    blobs: Union[BlobStore, BlobResolver, None] = None,
+) -> Iterator[JudgeRequest]:
+    """Judge requests from an interleaved span stream, one per trace.
+
+    Spans are grouped by trace_id as they arrive and each is looked at once.
+    With ``stream_order="end"`` (spans in the order they ended, as exporters
+    write them) a trace is emitted as soon as its root span (no parent) has
+    ended. With ``"start"`` (e.g. SpanRecorder.get_spans() output) it is
+    emitted once a span starting after the root's end arrives.
+
+    Only extracted fields are kept per trace; when more than
+    ``max_inflight_traces`` are open, the oldest is emitted early. Traces
+    still open at the end of the stream are emitted too. Traces emitted
+    without their root are marked ``trace_metadata["complete"] = False``;
+    spans arriving after their trace was emitted are ignored. Blob references
+    are resolved from ``blobs`` per emitted request, through one shared cache.
+    """
+    if stream_order not in ("end", "start"):
+        raise ValueError(f"Unknown stream_order: {stream_order!r}")
+    inflight: "OrderedDict[str, _PartialTrace]" = OrderedDict()
+    done: "OrderedDict[str, None]" = OrderedDict()  # recently emitted, to drop late spans
+    ready: List[Tuple[int, str]] = []  # ("start" order) heap of (root end_ns, trace_id)
+    complete = set()
+    resolver = _resolver(blobs)
+
+    def emit(trace_id: str) -> JudgeRequest:
+        partial = inflight.pop(trace_id)
+        done[trace_id] = None
+        if len(done) > max_inflight_traces:
+            done.popitem(last=False)
+        payload = partial.payload(extractors)
+        if trace_id in complete:
+            complete.discard(trace_id)
+        else:
+            payload["trace_metadata"]["complete"] = False
+        return _request(payload, trace_id, rubric, token_budget, resolver)
+
+    for span in spans:
+        while ready and ready[0][0] < span.start_ns:
+            trace_id = heapq.heappop(ready)[1]
+            if trace_id in inflight:
+                yield emit(trace_id)
+        trace_id = span.trace_id
+        partial = inflight.get(trace_id)
+        if partial is None:
+            if trace_id in done:
+                continue
+            partial = inflight[trace_id] = _PartialTrace(trace_id, extractors)
+            if len(inflight) > max_inflight_traces:
+                yield emit(next(iter(inflight)))
+        partial.add(span, extractors)
+        if span.parent_id is None and span.end_ns is not None:
+            complete.add(trace_id)
+            if stream_order == "end":
+                yield emit(trace_id)
+            else:
+                heapq.heappush(ready, (span.end_ns, trace_id))
 
-    payload: Dict[str, Any] = {
-        "user_query": user_query,
-        "final_answer": final_answer,
-        "retrieved_context": retrieved,
-        "tool_calls": tools,
-        "trace_metadata": {"trace_id": trace_id},
-    }
-    prompt = build_judge_prompt(payload, rubric)
-    return JudgeRequest(trace_id=trace_id, rubric_name=rubric.name, prompt=prompt, payload=payload)
+    while inflight:
+        yield emit(next(iter(inflight)))
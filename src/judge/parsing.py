@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+_decoder = json.JSONDecoder()
+
+
+def _is_judge_object(obj: Any) -> bool:
+    return isinstance(obj, dict) and isinstance(obj.get("scores"), dict)
+
+
+class JudgeJsonScanner:
+    """Finds the judge's ``{"scores": ..., ...}`` object in text fed piece by piece.
+
+    Braces are matched as text arrives (string-aware once inside an
+    object), and every object that closes is tried, so the result is known
+    the moment the judge object ends, whatever comes before it (preamble,
+    code fences, stray braces in prose) or after it. Each character is
+    scanned once.
+    """
+
+    def __init__(self) -> None:
+        self._buf: List[str] = []
+        self._text = ""
+        self._pos = 0
+        self._starts: List[int] = []  # offsets of the currently open "{"
+        self._in_string = False
+        self._escape = False
+        self.result: Optional[Dict[str, Any]] = None
+
+    @property
+    def text(self) -> str:
+        if self._buf:
+            self._text += "".join(self._buf)
+            self._buf = []
+        return self._text
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add text; returns the judge object once it has closed (and on every later call)."""
+        if self.result is not None or not chunk:
+            return self.result
+        self._buf.append(chunk)
+        text = self.text
+        starts = self._starts
+        i = self._pos
+        n = len(text)
+        while i < n:
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == "{":
+                starts.append(i)
+            elif not starts:
+                pass  # prose outside any object: quotes there mean nothing
+            elif c == '"':
+                self._in_string = True
+            elif c == "}":
+                start = starts.pop()
+                candidate = text[start : i + 1]
+                if '"scores"' in candidate:
+                    try:
+                        obj = json.loads(candidate)
+                    except ValueError:
+                        obj = None
+                    if _is_judge_object(obj):
+                        self.result = obj
+                        self._pos = i + 1
+                        return obj
+            i += 1
+        self._pos = n
+        return None
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Result after the stream ended (falls back to extract_judge_json() on the whole text)."""
+        if self.result is None:
+            self.result = extract_judge_json(self.text)
+        return self.result
+
+
+def extract_judge_json(text: str) -> Optional[Dict[str, Any]]:
+    """The judge object in ``text``: the whole text if it is one, else the first embedded one.
+
+    Handles preamble and trailing prose, code fences and objects wrapped in
+    another (``{"result": {"scores": ...}}``).
+    """
+    try:
+        obj = json.loads(text)
+    except ValueError:
+        obj = None
+    else:
+        if _is_judge_object(obj):
+            return obj
+    if isinstance(obj, dict):
+        for v in obj.values():
+            if _is_judge_object(v):
+                return v
+    pos = text.find("{")
+    while pos != -1:
+        try:
+            obj, _ = _decoder.raw_decode(text, pos)
+        except ValueError:
+            obj = None
+        if _is_judge_object(obj):
+            return obj
+        if isinstance(obj, dict):
+            for v in obj.values():
+                if _is_judge_object(v):
+                    return v
+        pos = text.find("{", pos + 1)
+    return None
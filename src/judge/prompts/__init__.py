@@ -1 +1 @@
-from .templates import build_judge_prompt
+from .templates import BudgetReport, CompiledPrompt, build_judge_prompt, compile_prompt
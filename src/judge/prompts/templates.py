@@ -1,25 +1,226 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
 
 from judge.rubrics.base import Rubric
+from judge.tokens import estimate_tokens
 
+# Payload keys kept for bookkeeping but never shown to the judge. Trace
+# metadata is left out so prompts with the same content are identical across
+# traces (see judge.cache).
+META_KEYS = ("trace_metadata", "prompt_budget")
 
-def build_judge_prompt(payload: Dict[str, Any], rubric: Rubric) -> str:
+OUTPUT_SCHEMA = (
+    "OUTPUT_JSON_SCHEMA:\n"
+    "{\n"
+    "  \"scores\": { \"<dimension_key>\": <int> },\n"
+    "  \"overall\": <int>,\n"
+    "  \"rationale\": \"<short reasoning>\"\n"
+    "}\n"
+)
+
+BATCH_OUTPUT_SCHEMA = (
+    "OUTPUT_JSON_SCHEMA:\n"
+    "[\n"
+    "  {\n"
+    "    \"trace_id\": \"<trace_id of the item>\",\n"
+    "    \"scores\": { \"<dimension_key>\": <int> },\n"
+    "    \"overall\": <int>,\n"
+    "    \"rationale\": \"<short reasoning>\"\n"
+    "  }\n"
+    "]\n"
+)
+
+_WORD = re.compile(r"\w+")
+_MIN_TRUNCATED_TOKENS = 64
+_ELLIPSIS = " [...]"
+
+
+def _compact(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def rubric_header(rubric: Rubric) -> str:
+    """SYSTEM and RUBRIC sections, which only depend on the rubric."""
     rubric_obj = rubric.as_dict() if hasattr(rubric, "as_dict") else {"name": rubric.name}
     return (
         "SYSTEM:\n"
         "You are an impartial evaluator. Follow the rubric strictly. "
         "Return ONLY valid JSON.\n\n"
         "RUBRIC:\n"
-        f"{json.dumps(rubric_obj, ensure_ascii=False, indent=2)}\n\n"
-        "EVALUATION_INPUT:\n"
-        f"{json.dumps(payload, ensure_ascii=False, indent=2)}\n\n"
-        "OUTPUT_JSON_SCHEMA:\n"
-        "{\n"
-        "  \"scores\": { \"<dimension_key>\": <int> },\n"
-        "  \"overall\": <int>,\n"
-        "  \"rationale\": \"<short reasoning>\"\n"
-        "}\n"
+        f"{_compact(rubric_obj)}\n\n"
     )
+
+
+@dataclass
+class BudgetReport:
+    """What fitting a payload to a token budget removed (stored in payload["prompt_budget"])."""
+
+    token_budget: int
+    estimated_tokens: int = 0
+    passages_total: int = 0
+    passages_kept: int = 0
+    duplicates_removed: int = 0
+    dropped_passages: List[Any] = field(default_factory=list)  # ids, or positions for id-less passages
+    truncated_passages: List[Any] = field(default_factory=list)
+    truncated_tool_outputs: List[int] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "estimated_tokens": self.estimated_tokens,
+            "passages_total": self.passages_total,
+            "passages_kept": self.passages_kept,
+            "duplicates_removed": self.duplicates_removed,
+            "dropped_passages": list(self.dropped_passages),
+            "truncated_passages": list(self.truncated_passages),
+            "truncated_tool_outputs": list(self.truncated_tool_outputs),
+        }
+
+
+def _passage_text(p: Any) -> str:
+    if isinstance(p, dict):
+        return str(p.get("text") or p.get("content") or "")
+    return p if isinstance(p, str) else _compact(p)
+
+
+def _passage_ref(p: Any, group: int, pos: int) -> Any:
+    if isinstance(p, dict) and p.get("id") is not None:
+        return p["id"]
+    return [group, pos]
+
+
+def _truncate_passage(p: Any, max_tokens: int) -> Any:
+    chars = max(0, max_tokens * 4 - len(_ELLIPSIS))
+    if isinstance(p, dict):
+        key = "text" if "text" in p else "content"
+        return {**p, key: _passage_text(p)[:chars] + _ELLIPSIS}
+    return _passage_text(p)[:chars] + _ELLIPSIS
+
+
+class CompiledPrompt:
+    """Judge prompt template for one rubric.
+
+    The rubric header is rendered once; render() only serializes the
+    payload (compact JSON, without META_KEYS). fit() trims a payload to a
+    token budget: repeated passages are deduplicated across retrieval spans,
+    long tool outputs are cut, and passages are kept in order of word overlap
+    with the query and answer until the budget is spent (the last one may be
+    truncated). Token counts are estimates (judge.tokens.estimate_tokens).
+    """
+
+    def __init__(self, rubric: Rubric) -> None:
+        self.rubric_name = rubric.name
+        self.header = rubric_header(rubric)
+        self.footer = "\n\n" + OUTPUT_SCHEMA
+        self.batch_footer = "\n\n" + BATCH_OUTPUT_SCHEMA
+        # Batch prompt cost before any item (the item count adds a few tokens).
+        self.batch_fixed_tokens = estimate_tokens(self._batch_preamble(100) + self.batch_footer)
+
+    def render(self, payload: Dict[str, Any]) -> str:
+        body = _compact({k: v for k, v in payload.items() if k not in META_KEYS})
+        return f"{self.header}EVALUATION_INPUT:\n{body}{self.footer}"
+
+    @staticmethod
+    def batch_item(trace_id: str, payload: Dict[str, Any]) -> str:
+        return _compact({"trace_id": trace_id, **{k: v for k, v in payload.items() if k not in META_KEYS}})
+
+    def _batch_preamble(self, n: int) -> str:
+        return (
+            f"{self.header}Evaluate each of the {n} items below independently. "
+            "Return ONLY a JSON array with one object per item, keyed by its trace_id.\n\n"
+            "EVALUATION_INPUTS:\n"
+        )
+
+    def render_batch(self, items: List[str]) -> str:
+        """Several batch_item() strings under one rubric header."""
+        return f"{self._batch_preamble(len(items))}[{','.join(items)}]{self.batch_footer}"
+
+    def fit(
+        self, payload: Dict[str, Any], token_budget: int, *, max_tool_output_tokens: int = 512
+    ) -> Tuple[Dict[str, Any], BudgetReport]:
+        report = BudgetReport(token_budget=token_budget)
+        payload = dict(payload)
+
+        tools = []
+        for i, call in enumerate(payload.get("tool_calls") or []):
+            out = call.get("output") if isinstance(call, dict) else None
+            if isinstance(out, str) and estimate_tokens(out) > max_tool_output_tokens:
+                call = {**call, "output": out[: max_tool_output_tokens * 4] + _ELLIPSIS}
+                report.truncated_tool_outputs.append(i)
+            tools.append(call)
+        if "tool_calls" in payload:
+            payload["tool_calls"] = tools
+
+        # Flatten and dedupe passages: (group, pos, passage).
+        seen = set()
+        flat: List[Tuple[int, int, Any]] = []
+        groups = payload.get("retrieved_context") or []
+        for g, group in enumerate(groups):
+            for pos, p in enumerate(group if isinstance(group, list) else [group]):
+                report.passages_total += 1
+                if isinstance(p, dict) and p.get("id") is not None:
+                    key = ("id", p["id"])
+                else:
+                    key = ("text", _passage_text(p))
+                if key in seen:
+                    report.duplicates_removed += 1
+                    continue
+                seen.add(key)
+                flat.append((g, pos, p))
+
+        without = dict(payload, retrieved_context=[])
+        remaining = token_budget - estimate_tokens(self.render(without))
+
+        query_words = set(
+            _WORD.findall(f"{payload.get('user_query') or ''} {payload.get('final_answer') or ''}".lower())
+        )
+
+        def relevance(item: Tuple[int, int, Any]) -> int:
+            return len(query_words.intersection(_WORD.findall(_passage_text(item[2]).lower())))
+
+        kept: Dict[Tuple[int, int], Any] = {}
+        for item in sorted(flat, key=relevance, reverse=True):  # stable: ties keep retrieval order
+            g, pos, p = item
+            cost = estimate_tokens(_compact(p)) + 1
+            if cost <= remaining:
+                kept[(g, pos)] = p
+                remaining -= cost
+            elif remaining >= _MIN_TRUNCATED_TOKENS and _passage_text(p):
+                overhead = cost - estimate_tokens(_passage_text(p))
+                kept[(g, pos)] = _truncate_passage(p, remaining - overhead - 1)
+                report.truncated_passages.append(_passage_ref(p, g, pos))
+                remaining = 0
+            else:
+                report.dropped_passages.append(_passage_ref(p, g, pos))
+
+        by_group: Dict[int, List[Any]] = {}
+        for g, pos, _ in flat:
+            if (g, pos) in kept:
+                by_group.setdefault(g, []).append(kept[(g, pos)])
+        payload["retrieved_context"] = list(by_group.values())
+        report.passages_kept = len(kept)
+        report.estimated_tokens = estimate_tokens(self.render(payload))
+        payload["prompt_budget"] = report.to_dict()
+        return payload, report
+
+
+_COMPILED: Dict[Any, CompiledPrompt] = {}
+
+
+def compile_prompt(rubric: Rubric) -> CompiledPrompt:
+    """CompiledPrompt for ``rubric``, cached per (hashable) rubric."""
+    try:
+        compiled = _COMPILED.get(rubric)
+    except TypeError:  # unhashable rubric: compile every time
+        return CompiledPrompt(rubric)
+    if compiled is None:
+        compiled = _COMPILED[rubric] = CompiledPrompt(rubric)
+    return compiled
+
+
+def build_judge_prompt(payload: Dict[str, Any], rubric: Rubric) -> str:
+    return compile_prompt(rubric).render(payload)
@@ -14,6 +14,7 @@ class RubricScore:
 
 class Rubric(Protocol):
     name: str
+    version: str
     instructions: str
     dimensions: List[RubricScore]
 
@@ -9,6 +9,7 @@ from .base import RubricScore
 @dataclass(frozen=True, slots=True)
 class RagAnswerQualityRubric:
     name: str = "rag_answer_quality"
+    version: str = "1"
     instructions: str = (
         "You are grading a RAG system answer. Score each dimension on the provided scale. "
         "Prefer evidence-based, grounded answers. Penalize hallucinations and unsupported claims."
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, Protocol
+from typing import Any, Protocol
 
 from judge.extract import JudgeRequest
+from judge.parsing import extract_judge_json
 from judge.scoring import JudgeResult, normalize_judge_output
 
 
@@ -12,11 +13,26 @@ class JudgeClient(Protocol):
         ...
 
 
-def run_judge(req: JudgeRequest, client: JudgeClient) -> JudgeResult:
-    raw_text = client.complete(req.prompt)
+def parse_judge_output(req: JudgeRequest, raw_text: str) -> JudgeResult:
+    """Judge result from the model's text, recovering JSON wrapped in prose or code fences."""
     try:
-        parsed: Dict[str, Any] = json.loads(raw_text)
+        parsed: Any = json.loads(raw_text)
     except Exception:
-        parsed = {"scores": {}, "rationale": "Non-JSON output from judge model", "raw_text": raw_text}
+        parsed = None
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("scores"), dict):
+        # Prose, code fences, or valid JSON wrapping the judge object.
+        extracted = extract_judge_json(raw_text)
+        if extracted is not None:
+            parsed = extracted
+        elif not isinstance(parsed, dict):
+            parsed = {
+                "scores": {},
+                "rationale": "Non-JSON output from judge model",
+                "raw_text": raw_text,
+            }
 
     return normalize_judge_output(req.trace_id, req.rubric_name, parsed)
+
+
+def run_judge(req: JudgeRequest, client: JudgeClient) -> JudgeResult:
+    return parse_judge_output(req, client.complete(req.prompt))
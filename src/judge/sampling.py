@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from latency.extract import LatencyFeatures
+from latency.sketch import DDSketch
+
+OTHER_DEPLOYMENT = "__other__"
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass(frozen=True, slots=True)
+class Stratum:
+    latency: str  # "fast" (< p50), "mid" or "tail" (>= p95), per deployment
+    error: bool
+    deployment: Optional[str]
+    novel: bool  # query not seen among the last ``novelty_memory`` queries
+
+
+@dataclass(frozen=True, slots=True)
+class SampledTrace:
+    """A trace picked for judging; ``weight`` = traces it stands for in its stratum."""
+
+    trace_id: str
+    item: Any
+    stratum: Stratum
+    weight: float
+    window_start: float
+
+
+def default_priority(stratum: Stratum) -> float:
+    """Relative share of the judge budget per trace in ``stratum``."""
+    p = {"fast": 0.5, "mid": 1.0, "tail": 4.0}.get(stratum.latency, 1.0)
+    if stratum.error:
+        p *= 8.0
+    if stratum.novel:
+        p *= 2.0
+    return p
+
+
+def allocate_budget(
+    seen: Dict[Any, int],
+    priority: Dict[Any, float],
+    budget: int,
+    min_per_stratum: int = 1,
+    available: Optional[Dict[Any, int]] = None,
+) -> Dict[Any, int]:
+    """Split ``budget`` calls across strata in proportion to ``priority * seen``.
+
+    Every non-empty stratum gets at least ``min_per_stratum`` calls (budget
+    permitting) and never more than it has traces (or ``available[k]``, e.g.
+    what its reservoir holds); what a small stratum cannot use is
+    redistributed to the others (water-filling).
+    """
+    cap = seen if available is None else {k: min(n, available.get(k, n)) for k, n in seen.items()}
+    alloc = {k: 0 for k in seen}
+    active = {k for k, n in cap.items() if n > 0}
+    floor = min(min_per_stratum, budget // max(1, len(active)))
+    for k in active:
+        alloc[k] = min(cap[k], floor)
+    left = budget - sum(alloc.values())
+    open_ = {k for k in active if alloc[k] < cap[k]}
+    while left > 0 and open_:
+        total = sum(priority[k] * seen[k] for k in open_)
+        if total > 0:
+            shares = {k: left * priority[k] * seen[k] / total for k in open_}
+        else:
+            shares = {k: left / len(open_) for k in open_}
+        given = 0
+        for k in sorted(open_, key=lambda k: shares[k], reverse=True):
+            extra = min(cap[k] - alloc[k], max(1, int(shares[k])), left - given)
+            alloc[k] += extra
+            given += extra
+            if given >= left:
+                break
+        left -= given
+        open_ = {k for k in open_ if alloc[k] < cap[k]}
+    return alloc
+
+
+class _Reservoir:
+    """Uniform sample of up to ``capacity`` items (Algorithm R)."""
+
+    __slots__ = ("capacity", "seen", "items")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.seen = 0
+        self.items: List[Tuple[str, Any]] = []
+
+    def offer(self, entry: Tuple[str, Any], rng: random.Random) -> None:
+        self.seen += 1
+        if len(self.items) < self.capacity:
+            self.items.append(entry)
+        else:
+            j = rng.randrange(self.seen)
+            if j < self.capacity:
+                self.items[j] = entry
+
+    def shrink(self, capacity: int, rng: random.Random) -> None:
+        # A uniform subsample of a uniform sample is uniform, and Algorithm R
+        # carries on from it with the smaller capacity.
+        self.capacity = capacity
+        if len(self.items) > capacity:
+            self.items = rng.sample(self.items, capacity)
+
+
+class _RecentQueries:
+    """Fingerprints of the last ``size`` queries (ring buffer + counts)."""
+
+    __slots__ = ("ring", "counts", "pos")
+
+    def __init__(self, size: int) -> None:
+        self.ring: List[Optional[int]] = [None] * size
+        self.counts: Dict[int, int] = {}
+        self.pos = 0
+
+    def seen_before(self, query: str) -> bool:
+        words = " ".join(sorted(set(_WORD.findall(query.lower()))))
+        fp = int.from_bytes(hashlib.blake2b(words.encode("utf-8"), digest_size=8).digest(), "little")
+        seen = fp in self.counts
+        old = self.ring[self.pos]
+        if old is not None:
+            n = self.counts[old] - 1
+            if n:
+                self.counts[old] = n
+            else:
+                del self.counts[old]
+        self.ring[self.pos] = fp
+        self.counts[fp] = self.counts.get(fp, 0) + 1
+        self.pos = (self.pos + 1) % len(self.ring)
+        return seen
+
+
+class _LatencyThresholds:
+    """Per-deployment p50/p95 from a DDSketch, recomputed every ``refresh`` traces."""
+
+    __slots__ = ("sketch", "cuts", "pending", "refresh")
+
+    def __init__(self, refresh: int) -> None:
+        self.sketch = DDSketch()
+        self.cuts: Optional[List[float]] = None
+        self.pending = 0
+        self.refresh = refresh
+
+    def bucket(self, total_ms: float, quantiles: Sequence[float], warmup: int) -> str:
+        cuts = self.cuts
+        self.sketch.add(total_ms)
+        self.pending += 1
+        if self.pending >= self.refresh or (cuts is None and len(self.sketch) >= warmup):
+            self.cuts = self.sketch.quantiles(quantiles)
+            self.pending = 0
+        if cuts is None:
+            return "mid"
+        if total_ms >= cuts[1]:
+            return "tail"
+        return "fast" if total_ms < cuts[0] else "mid"
+
+
+class JudgeSamplingPlanner:
+    """Pick which traces to judge under a fixed judge-call budget per window.
+
+    Each offered trace is put in a Stratum (latency bucket against its
+    deployment's running p50/p95, error status, deployment, query novelty)
+    and into that stratum's reservoir. When a window (``window_s``, default
+    one hour) closes, ``budget_per_window`` calls are split across strata by
+    allocate_budget() and each stratum's pick is a uniform sample of its
+    traces, weighted ``seen / picked`` so weighted means over the samples
+    estimate the whole traffic without bias (see weighted_mean()).
+
+    Reservoirs share about ``reservoir_headroom * budget_per_window`` items:
+    each holds up to that many divided by the number of strata seen in the
+    window (at least ``min_per_stratum``), and they shrink as new strata
+    appear. A stratum allocated more calls than it holds is judged in full
+    and the rest of its share goes to the other strata.
+
+    Work per trace is O(1) (amortized for the latency thresholds and the
+    rare reservoir shrink); memory is bounded by the reservoirs above,
+    ``max_deployments`` and ``novelty_memory``. Not thread-safe: call it
+    from one ingestion thread.
+    """
+
+    def __init__(
+        self,
+        budget_per_window: int = 1000,
+        *,
+        window_s: float = 3600.0,
+        latency_quantiles: Tuple[float, float] = (0.5, 0.95),
+        priority: Callable[[Stratum], float] = default_priority,
+        min_per_stratum: int = 1,
+        novelty_memory: int = 100_000,
+        max_deployments: int = 64,
+        reservoir_headroom: float = 4.0,
+        warmup: int = 100,
+        refresh: int = 1024,
+        seed: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if budget_per_window <= 0:
+            raise ValueError("budget_per_window must be positive")
+        self.budget_per_window = budget_per_window
+        self.window_s = window_s
+        self.latency_quantiles = tuple(latency_quantiles)
+        self.priority = priority
+        self.min_per_stratum = min_per_stratum
+        self.max_deployments = max_deployments
+        self.reservoir_headroom = reservoir_headroom
+        self.warmup = warmup
+        self.refresh = refresh
+        self.clock = clock
+        self._rng = random.Random(seed)
+        self._queries = _RecentQueries(novelty_memory)
+        self._thresholds: Dict[Optional[str], _LatencyThresholds] = {}
+        self._reservoirs: Dict[Stratum, _Reservoir] = {}
+        self._window: Optional[int] = None
+
+    def stratum(
+        self,
+        features: LatencyFeatures,
+        *,
+        error: bool = False,
+        deployment: Optional[str] = None,
+        query: Optional[str] = None,
+    ) -> Stratum:
+        """Classify one trace (updates the latency and novelty state)."""
+        th = self._thresholds.get(deployment)
+        if th is None:
+            if len(self._thresholds) >= self.max_deployments:
+                deployment = OTHER_DEPLOYMENT
+                th = self._thresholds.get(deployment)
+            if th is None:
+                th = self._thresholds[deployment] = _LatencyThresholds(self.refresh)
+        latency = th.bucket(features.total_ms, self.latency_quantiles, self.warmup)
+        novel = query is not None and not self._queries.seen_before(query)
+        return Stratum(latency=latency, error=error, deployment=deployment, novel=novel)
+
+    def offer(
+        self,
+        features: LatencyFeatures,
+        item: Any = None,
+        *,
+        error: bool = False,
+        deployment: Optional[str] = None,
+        query: Optional[str] = None,
+        ts: Optional[float] = None,
+    ) -> List[SampledTrace]:
+        """Add one trace; returns the samples of the previous window if this one closed it.
+
+        ``item`` is what comes back in SampledTrace.item (e.g. the spans or
+        a JudgeRequest); it defaults to ``features``.
+        """
+        window = int((self.clock() if ts is None else ts) // self.window_s)
+        out: List[SampledTrace] = []
+        if self._window is not None and window != self._window:
+            out = self.flush()
+        self._window = window
+        stratum = self.stratum(features, error=error, deployment=deployment, query=query)
+        res = self._reservoirs.get(stratum)
+        if res is None:
+            res = self._reservoirs[stratum] = _Reservoir(self.budget_per_window)
+            capacity = self._reservoir_capacity()
+            for r in self._reservoirs.values():
+                if r.capacity > capacity:
+                    r.shrink(capacity, self._rng)
+        res.offer((features.trace_id, features if item is None else item), self._rng)
+        return out
+
+    def _reservoir_capacity(self) -> int:
+        share = math.ceil(self.reservoir_headroom * self.budget_per_window / len(self._reservoirs))
+        return min(self.budget_per_window, max(1, self.min_per_stratum, share))
+
+    def flush(self) -> List[SampledTrace]:
+        """Close the current window and return its samples."""
+        if self._window is None or not self._reservoirs:
+            self._reservoirs = {}
+            return []
+        reservoirs, self._reservoirs = self._reservoirs, {}
+        start = self._window * self.window_s
+        seen = {s: r.seen for s, r in reservoirs.items()}
+        alloc = allocate_budget(
+            seen,
+            {s: self.priority(s) for s in seen},
+            self.budget_per_window,
+            self.min_per_stratum,
+            available={s: len(r.items) for s, r in reservoirs.items()},
+        )
+        out: List[SampledTrace] = []
+        for stratum, res in reservoirs.items():
+            k = alloc[stratum]
+            if k <= 0:
+                continue
+            picked = res.items if k >= len(res.items) else self._rng.sample(res.items, k)
+            weight = res.seen / len(picked)
+            out.extend(SampledTrace(tid, item, stratum, weight, start) for tid, item in picked)
+        return out
+
+
+def weighted_mean(samples: Iterable[Tuple[SampledTrace, float]]) -> float:
+    """Estimate of the mean over all traces from ``(sample, value)`` pairs (e.g. overall scores)."""
+    num = den = 0.0
+    for sample, value in samples:
+        num += sample.weight * value
+        den += sample.weight
+    return num / den if den else math.nan
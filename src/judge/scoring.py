@@ -6,12 +6,21 @@ from typing import Any, Dict, Optional
 
 @dataclass
 class JudgeResult:
+    """Normalized judge output.
+
+    ``tier`` names the judge that produced it in a cascade, and
+    ``confidence`` (0..1) is the agreement among that judge's samples; both
+    are None for plain single-judge runs.
+    """
+
     trace_id: str
     rubric_name: str
     scores: Dict[str, int]
     overall: Optional[int] = None
     rationale: Optional[str] = None
     raw: Optional[Dict[str, Any]] = None
+    tier: Optional[str] = None
+    confidence: Optional[float] = None
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -21,8 +30,23 @@ class JudgeResult:
             "overall": self.overall,
             "rationale": self.rationale,
             "raw": self.raw,
+            "tier": self.tier,
+            "confidence": self.confidence,
         }
 
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "JudgeResult":
+        return cls(
+            trace_id=d["trace_id"],
+            rubric_name=d["rubric_name"],
+            scores=dict(d.get("scores") or {}),
+            overall=d.get("overall"),
+            rationale=d.get("rationale"),
+            raw=d.get("raw"),
+            tier=d.get("tier"),
+            confidence=d.get("confidence"),
+        )
+
 
 def normalize_judge_output(trace_id: str, rubric_name: str, output: Dict[str, Any]) -> JudgeResult:
     scores = output.get("scores") or {}
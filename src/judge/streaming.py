@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Protocol
+
+from judge.async_runner import JudgeBatchConfig, arun_judge
+from judge.extract import JudgeRequest
+from judge.parsing import JudgeJsonScanner
+from judge.runner import run_judge
+from judge.scoring import JudgeResult
+
+
+class StreamingJudgeClient(Protocol):
+    def stream(self, prompt: str) -> Iterator[str]:
+        ...
+
+
+class AsyncStreamingJudgeClient(Protocol):
+    def astream(self, prompt: str) -> AsyncIterator[str]:
+        ...
+
+
+def collect_judge_stream(chunks: Iterable[str]) -> str:
+    """Read ``chunks`` until the judge JSON object closes, then stop the stream.
+
+    Returns the text read so far (prose and fences included; parse_judge_output
+    recovers the object from it). Closing the iterator is how generation is
+    cancelled: generator-based clients should abort their request in
+    ``finally``.
+    """
+    scanner = JudgeJsonScanner()
+    it = iter(chunks)
+    try:
+        for chunk in it:
+            if scanner.feed(chunk) is not None:
+                break
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+    return scanner.text
+
+
+async def acollect_judge_stream(chunks: AsyncIterable[str]) -> str:
+    """Async collect_judge_stream(); the stream is stopped with ``aclose()``."""
+    scanner = JudgeJsonScanner()
+    it = chunks.__aiter__()
+    try:
+        async for chunk in it:
+            if scanner.feed(chunk) is not None:
+                break
+    finally:
+        aclose = getattr(it, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return scanner.text
+
+
+class EarlyStopJudgeClient:
+    """JudgeClient over a StreamingJudgeClient that stops once the judge JSON is complete.
+
+    Works with everything that takes a JudgeClient (run_judge, batching,
+    caching, cascades).
+    """
+
+    def __init__(self, client: StreamingJudgeClient) -> None:
+        self.client = client
+
+    def complete(self, prompt: str) -> str:
+        return collect_judge_stream(self.client.stream(prompt))
+
+
+class AsyncEarlyStopJudgeClient:
+    """AsyncJudgeClient over an AsyncStreamingJudgeClient (see EarlyStopJudgeClient)."""
+
+    def __init__(self, client: AsyncStreamingJudgeClient) -> None:
+        self.client = client
+
+    async def acomplete(self, prompt: str) -> str:
+        return await acollect_judge_stream(self.client.astream(prompt))
+
+
+def run_judge_streaming(req: JudgeRequest, client: StreamingJudgeClient) -> JudgeResult:
+    return run_judge(req, EarlyStopJudgeClient(client))
+
+
+async def arun_judge_streaming(
+    req: JudgeRequest, client: AsyncStreamingJudgeClient, config: Optional[JudgeBatchConfig] = None
+) -> JudgeResult:
+    """arun_judge() (timeouts, retries) over a streaming client with early stop."""
+    return await arun_judge(req, AsyncEarlyStopJudgeClient(client), config or JudgeBatchConfig())
@@ -0,0 +1,6 @@
+from __future__ import annotations
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (~4 characters per token for English/JSON)."""
+    return max(1, (len(text) + 3) // 4)
@@ -1,14 +1,31 @@
 """Latency metrics derived from traces."""
 from .extract import extract_latency, LatencyFeatures
-from .aggregate import aggregate_latency, LatencyReport
-from .slo import LatencySLO, SLOResult, evaluate_latency_slo
+from .aggregate import aggregate_latency, LatencyAggregator, LatencyReport
+from .batch import extract_latency_batch, LatencyTable
+from .compare import MetricComparison, QuantileShift, RunComparison, compare_runs
+from .sketch import DDSketch
+from .tree import attribute_trace
+from .slo import BurnRateRule, LatencySLO, SLOAlert, SLOEngine, SLOResult, WindowStats, evaluate_latency_slo
 
 __all__ = [
     "extract_latency",
     "LatencyFeatures",
+    "extract_latency_batch",
+    "LatencyTable",
+    "attribute_trace",
     "aggregate_latency",
     "LatencyReport",
+    "LatencyAggregator",
+    "DDSketch",
+    "compare_runs",
+    "RunComparison",
+    "MetricComparison",
+    "QuantileShift",
     "LatencySLO",
     "SLOResult",
     "evaluate_latency_slo",
+    "SLOEngine",
+    "BurnRateRule",
+    "SLOAlert",
+    "WindowStats",
 ]
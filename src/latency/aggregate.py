@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import struct
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Sequence, Union
 
+from .batch import LatencyTable
 from .extract import LatencyFeatures
+from .sketch import DDSketch, _read_varint, _write_varint
 
+QUANTILES = (0.50, 0.95, 0.99)
+QuantileMap = Dict[str, Dict[str, float]]
 
-def _percentile(xs: List[float], p: float) -> float:
+
+def _percentile(xs: Sequence[float], p: float) -> float:
+    """Linear-interpolated percentile of an already sorted sequence."""
     if not xs:
         return 0.0
-    xs = sorted(xs)
     k = (len(xs) - 1) * p
     f = int(k)
     c = min(f + 1, len(xs) - 1)
@@ -18,14 +24,35 @@ def _percentile(xs: List[float], p: float) -> float:
     return xs[f] + (xs[c] - xs[f]) * (k - f)
 
 
+def _quantile_dict(values: Sequence[float]) -> Dict[str, float]:
+    return {f"p{round(q * 100)}": v for q, v in zip(QUANTILES, values)}
+
+
+def _exact_quantiles(groups: Dict[str, List[float]]) -> QuantileMap:
+    out: QuantileMap = {}
+    for key, xs in groups.items():
+        xs.sort()
+        out[key] = _quantile_dict([_percentile(xs, q) for q in QUANTILES])
+    return out
+
+
 @dataclass
 class LatencyReport:
+    """Trace-level latency summary.
+
+    ``component_quantiles_ms`` / ``component_phase_quantiles_ms`` map a
+    component (or ``"component:phase"``) to ``{"p50", "p95", "p99"}`` over the
+    traces that contain it.
+    """
+
     n: int
     p50_ms: float
     p95_ms: float
     p99_ms: float
     avg_ms: float
     component_avg_ms: Dict[str, float] = field(default_factory=dict)
+    component_quantiles_ms: QuantileMap = field(default_factory=dict)
+    component_phase_quantiles_ms: QuantileMap = field(default_factory=dict)
 
     def to_dict(self) -> Dict:
         return {
@@ -35,22 +62,33 @@ class LatencyReport:
             "p99_ms": self.p99_ms,
             "avg_ms": self.avg_ms,
             "component_avg_ms": dict(self.component_avg_ms),
+            "component_quantiles_ms": {k: dict(v) for k, v in self.component_quantiles_ms.items()},
+            "component_phase_quantiles_ms": {k: dict(v) for k, v in self.component_phase_quantiles_ms.items()},
         }
 
 
-def aggregate_latency(features: Iterable[LatencyFeatures]) -> LatencyReport:
+def aggregate_latency(features: Union[LatencyTable, Iterable[LatencyFeatures]]) -> LatencyReport:
+    """Exact report; needs every trace in memory (see LatencyAggregator for streams)."""
+    if isinstance(features, LatencyTable):
+        return _aggregate_table(features)
+
     feats = list(features)
     if not feats:
         raise ValueError("No latency features")
 
-    totals = [f.total_ms for f in feats]
+    totals = sorted(f.total_ms for f in feats)
     n = len(totals)
     avg = sum(totals) / n
 
     comp_sums: Dict[str, float] = {}
+    comp_values: Dict[str, List[float]] = {}
+    cp_values: Dict[str, List[float]] = {}
     for f in feats:
         for comp, ms in f.by_component_ms.items():
             comp_sums[comp] = comp_sums.get(comp, 0.0) + ms
+            comp_values.setdefault(comp, []).append(ms)
+        for (comp, phase), ms in f.by_component_phase_ms.items():
+            cp_values.setdefault(f"{comp}:{phase}", []).append(ms)
     comp_avg = {k: v / n for k, v in comp_sums.items()}
 
     return LatencyReport(
@@ -60,4 +98,182 @@ def aggregate_latency(features: Iterable[LatencyFeatures]) -> LatencyReport:
         p99_ms=_percentile(totals, 0.99),
         avg_ms=avg,
         component_avg_ms=comp_avg,
+        component_quantiles_ms=_exact_quantiles(comp_values),
+        component_phase_quantiles_ms=_exact_quantiles(cp_values),
     )
+
+
+def _aggregate_table(table: LatencyTable) -> LatencyReport:
+    n = len(table)
+    if not n:
+        raise ValueError("No latency features")
+    col = table.total_ms
+    if hasattr(col, "tolist"):
+        # NumPy column: its default (linear) percentile matches _percentile().
+        import numpy as np
+
+        p50, p95, p99 = (float(v) for v in np.percentile(col, [50, 95, 99]))
+        avg = float(col.mean())
+    else:
+        totals = sorted(col)
+        p50, p95, p99 = (_percentile(totals, p) for p in QUANTILES)
+        avg = sum(totals) / n
+    return LatencyReport(
+        n=n,
+        p50_ms=p50,
+        p95_ms=p95,
+        p99_ms=p99,
+        avg_ms=avg,
+        component_avg_ms={k: v / n for k, v in table.component_totals().items()},
+        component_quantiles_ms=_exact_quantiles(
+            _present(table.components, table.component_ms, table.component_counts, n)
+        ),
+        component_phase_quantiles_ms=_exact_quantiles(
+            _present(
+                [f"{c}:{p}" for c, p in table.component_phases],
+                table.component_phase_ms,
+                table.component_phase_counts,
+                n,
+            )
+        ),
+    )
+
+
+def _present(names: List[str], ms: Sequence[float], counts: Sequence[int], n: int) -> Dict[str, List[float]]:
+    """Per-name values over the traces where the cell is present."""
+    k = len(names)
+    if hasattr(ms, "tolist"):
+        ms, counts = ms.tolist(), counts.tolist()
+    out: Dict[str, List[float]] = {}
+    for j, name in enumerate(names):
+        xs = [v for v, c in zip(ms[j::k], counts[j::k]) if c]
+        if xs:
+            out[name] = xs
+    return out
+
+
+_AGG_MAGIC = b"LAG1"
+_SUM = struct.Struct("<d")
+
+
+class LatencyAggregator:
+    """Streaming, mergeable counterpart of aggregate_latency().
+
+    Keeps one DDSketch for trace totals and one per component and per
+    ``"component:phase"``, so memory is bounded by the number of distinct
+    components rather than traces. Aggregators built per worker or per hour
+    can be merged, or shipped with to_bytes() and combined later. Quantiles
+    are within ``relative_accuracy`` of an observed value; averages are exact.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.total = self._sketch()
+        self.components: Dict[str, DDSketch] = {}
+        self.component_phases: Dict[str, DDSketch] = {}
+        self.component_sums: Dict[str, float] = {}
+
+    def _sketch(self) -> DDSketch:
+        return DDSketch(self.relative_accuracy, self.max_bins)
+
+    def __len__(self) -> int:
+        return self.total.count
+
+    def add(self, features: LatencyFeatures) -> None:
+        self.total.add(features.total_ms)
+        for comp, ms in features.by_component_ms.items():
+            sk = self.components.get(comp)
+            if sk is None:
+                sk = self.components[comp] = self._sketch()
+            sk.add(ms)
+            self.component_sums[comp] = self.component_sums.get(comp, 0.0) + ms
+        for (comp, phase), ms in features.by_component_phase_ms.items():
+            key = f"{comp}:{phase}"
+            sk = self.component_phases.get(key)
+            if sk is None:
+                sk = self.component_phases[key] = self._sketch()
+            sk.add(ms)
+
+    def extend(self, features: Union[LatencyTable, Iterable[LatencyFeatures]]) -> None:
+        for f in features:
+            self.add(f)
+
+    def merge(self, other: "LatencyAggregator") -> None:
+        self.total.merge(other.total)
+        for mine, theirs in ((self.components, other.components), (self.component_phases, other.component_phases)):
+            for key, sk in theirs.items():
+                if key in mine:
+                    mine[key].merge(sk)
+                else:
+                    mine[key] = sk.copy()
+        for comp, ms in other.component_sums.items():
+            self.component_sums[comp] = self.component_sums.get(comp, 0.0) + ms
+
+    def report(self) -> LatencyReport:
+        n = self.total.count
+        if not n:
+            raise ValueError("No latency features")
+        p50, p95, p99 = self.total.quantiles(QUANTILES)
+        return LatencyReport(
+            n=n,
+            p50_ms=p50,
+            p95_ms=p95,
+            p99_ms=p99,
+            avg_ms=self.total.avg,
+            component_avg_ms={k: v / n for k, v in self.component_sums.items()},
+            component_quantiles_ms={k: _quantile_dict(sk.quantiles(QUANTILES)) for k, sk in self.components.items()},
+            component_phase_quantiles_ms={
+                k: _quantile_dict(sk.quantiles(QUANTILES)) for k, sk in self.component_phases.items()
+            },
+        )
+
+    # -------------------------
+    # Serialization
+    # -------------------------
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(_AGG_MAGIC)
+
+        def put(raw: bytes) -> None:
+            _write_varint(out, len(raw))
+            out.extend(raw)
+
+        put(self.total.to_bytes())
+        _write_varint(out, len(self.components))
+        for comp, sk in self.components.items():
+            put(comp.encode("utf-8"))
+            out.extend(_SUM.pack(self.component_sums.get(comp, 0.0)))
+            put(sk.to_bytes())
+        _write_varint(out, len(self.component_phases))
+        for key, sk in self.component_phases.items():
+            put(key.encode("utf-8"))
+            put(sk.to_bytes())
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LatencyAggregator":
+        if data[:4] != _AGG_MAGIC:
+            raise ValueError("Not a LatencyAggregator payload")
+        pos = 4
+
+        def take() -> bytes:
+            nonlocal pos
+            size, pos = _read_varint(data, pos)
+            pos += size
+            return data[pos - size : pos]
+
+        total = DDSketch.from_bytes(take())
+        agg = cls(total.relative_accuracy, total.max_bins)
+        agg.total = total
+        ncomp, pos = _read_varint(data, pos)
+        for _ in range(ncomp):
+            comp = take().decode("utf-8")
+            (agg.component_sums[comp],) = _SUM.unpack_from(data, pos)
+            pos += _SUM.size
+            agg.components[comp] = DDSketch.from_bytes(take())
+        nphase, pos = _read_varint(data, pos)
+        for _ in range(nphase):
+            key = take().decode("utf-8")
+            agg.component_phases[key] = DDSketch.from_bytes(take())
+        return agg
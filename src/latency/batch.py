@@ -0,0 +1,553 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from spanrecorder.span import Span
+from .columnar import NULL, NULL_NS, SpanColumns, extract_latency_columns
+from .extract import LatencyFeatures
+from .taxonomy import Phase, classify, classify_fields
+from .tree import attribute_trace
+
+try:  # optional: vectorized grouped reductions
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is absent
+    np = None
+
+
+_MISSING = object()
+
+
+@dataclass
+class LatencyTable:
+    """LatencyFeatures for many traces, stored column-wise.
+
+    Per-component and per-(component, phase) values are flat row-major
+    sequences of length ``len(table) * len(components)`` (resp. phases):
+    the value for trace ``t`` and component ``c`` is at ``t * len(components) + c``.
+    ``*_counts`` are non-zero where spans fed the cell, so a component that
+    is absent from a trace can be told apart from one that took 0 ms.
+    Columns are NumPy arrays when NumPy is available, lists otherwise.
+
+    The ``self_*`` / ``critical_*`` columns (exclusive and critical-path time,
+    same layout) are None when the table was built with ``attribution=False``.
+    """
+
+    trace_ids: List[str]
+    total_ms: Sequence[float]
+    span_count: Sequence[int]
+    root_span_ids: List[Optional[str]]
+    components: List[str]
+    component_ms: Sequence[float]
+    component_counts: Sequence[int]
+    component_phases: List[Tuple[str, str]]
+    component_phase_ms: Sequence[float]
+    component_phase_counts: Sequence[int]
+    self_component_ms: Optional[Sequence[float]] = None
+    self_component_phase_ms: Optional[Sequence[float]] = None
+    critical_component_ms: Optional[Sequence[float]] = None
+    critical_component_counts: Optional[Sequence[int]] = None
+    critical_component_phase_ms: Optional[Sequence[float]] = None
+    critical_component_phase_counts: Optional[Sequence[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.trace_ids)
+
+    def __iter__(self) -> Iterator[LatencyFeatures]:
+        for i in range(len(self.trace_ids)):
+            yield self.row(i)
+
+    def component_column(self, component: str) -> List[float]:
+        """Per-trace ms for one component (0.0 where absent)."""
+        nc = len(self.components)
+        c = self.components.index(component)
+        return [float(self.component_ms[t * nc + c]) for t in range(len(self))]
+
+    def component_totals(self) -> Dict[str, float]:
+        nc = len(self.components)
+        return {
+            name: float(sum(self.component_ms[c::nc])) for c, name in enumerate(self.components)
+        }
+
+    def row(self, i: int) -> LatencyFeatures:
+        nc, ncp = len(self.components), len(self.component_phases)
+        by_comp = {
+            name: float(self.component_ms[i * nc + c])
+            for c, name in enumerate(self.components)
+            if self.component_counts[i * nc + c]
+        }
+        by_comp_phase = {
+            key: float(self.component_phase_ms[i * ncp + k])
+            for k, key in enumerate(self.component_phases)
+            if self.component_phase_counts[i * ncp + k]
+        }
+        f = LatencyFeatures(
+            trace_id=self.trace_ids[i],
+            total_ms=float(self.total_ms[i]),
+            by_component_ms=by_comp,
+            by_component_phase_ms=by_comp_phase,
+            root_span_id=self.root_span_ids[i],
+            span_count=int(self.span_count[i]),
+        )
+        if self.self_component_ms is not None:
+            f.self_by_component_ms = {
+                name: float(self.self_component_ms[i * nc + c]) for c, name in enumerate(self.components)
+                if self.component_counts[i * nc + c]
+            }
+            f.self_by_component_phase_ms = {
+                key: float(self.self_component_phase_ms[i * ncp + k])
+                for k, key in enumerate(self.component_phases)
+                if self.component_phase_counts[i * ncp + k]
+            }
+            # The critical path always spans the root (or longest span) end to end.
+            f.critical_path_ms = f.total_ms
+            f.critical_by_component_ms = {
+                name: float(self.critical_component_ms[i * nc + c]) for c, name in enumerate(self.components)
+                if self.critical_component_counts[i * nc + c]
+            }
+            f.critical_by_component_phase_ms = {
+                key: float(self.critical_component_phase_ms[i * ncp + k])
+                for k, key in enumerate(self.component_phases)
+                if self.critical_component_phase_counts[i * ncp + k]
+            }
+        return f
+
+
+class _Ingest:
+    """One pass over spans into flat per-span columns plus code dictionaries.
+
+    Each span gets a class code (one per distinct name/kind/component/phase
+    tuple); ``classes[code]`` holds its (component code, component-phase code).
+    """
+
+    def __init__(self, attribution: bool = False) -> None:
+        self.attribution = attribution
+        self.trace_codes: Dict[str, int] = {}
+        self.trace_ids: List[str] = []
+        self.components: Dict[str, int] = {}
+        self.component_phases: Dict[Tuple[str, str], int] = {}
+        self.classes: List[Tuple[int, int]] = []
+        self._class_codes: Dict[Any, int] = {}
+
+        self.trace = array("q")
+        self.start = array("q")
+        self.dur = array("q")
+        self.cls = array("q")
+        self.roots: Dict[int, str] = {}  # row -> span_id, for spans without a parent
+        # Only filled with attribution=True.
+        self.span_ids: List[str] = []
+        self.parent_ids: List[Optional[str]] = []
+        self.end = array("q")
+
+    def class_code(self, p: Phase) -> int:
+        c = self.components.setdefault(p.component, len(self.components))
+        cp = -1
+        if p.phase:
+            key = (p.component, p.phase)
+            cp = self.component_phases.setdefault(key, len(self.component_phases))
+        self.classes.append((c, cp))
+        return len(self.classes) - 1
+
+    def add_all(self, spans: Iterable[Span]) -> None:
+        trace_codes, trace_ids, class_codes = self.trace_codes, self.trace_ids, self._class_codes
+        trace, start, dur, cls = self.trace.append, self.start.append, self.dur.append, self.cls.append
+        roots = self.roots
+        attribution = self.attribution
+        span_ids, parent_ids, end = self.span_ids.append, self.parent_ids.append, self.end.append
+        row = len(self.trace)
+
+        for s in spans:
+            tid = s.trace_id
+            t = trace_codes.get(tid)
+            if t is None:
+                t = trace_codes[tid] = len(trace_ids)
+                trace_ids.append(tid)
+
+            attrs = s.attributes
+            key = (s.name, attrs.get("kind"), attrs.get("component", _MISSING), attrs.get("phase"))
+            try:
+                k = class_codes.get(key)
+                if k is None:
+                    k = class_codes[key] = self.class_code(classify(s))
+            except TypeError:  # unhashable attribute value
+                k = self.class_code(classify(s))
+
+            trace(t)
+            s0, e = s.start_ns, s.end_ns
+            start(s0)
+            dur(e - s0 if e is not None else 0)
+            cls(k)
+            if s.parent_id is None:
+                roots[row] = s.span_id
+            if attribution:
+                span_ids(s.span_id)
+                parent_ids(s.parent_id)
+                end(e if e is not None else s0)
+            row += 1
+
+    def attribute(self) -> Tuple[List[int], List[int]]:
+        return _attribute_rows(len(self.trace_ids), self.trace, self.span_ids, self.parent_ids, self.start, self.end)
+
+
+def _attribute_rows(
+    nt: int,
+    trace: Sequence[int],
+    span_ids: Sequence[Any],
+    parent_ids: Sequence[Any],
+    start: Sequence[int],
+    end: Sequence[int],
+) -> Tuple[List[int], List[int]]:
+    """Per-row (self ns, critical-path ns), running attribute_trace() once per trace.
+
+    ``end`` must already substitute the start for unfinished spans. The
+    critical path hangs off the same span extract_latency() uses: the
+    earliest parentless span, else the longest one.
+    """
+    rows_by_trace: List[List[int]] = [[] for _ in range(nt)]
+    for r, t in enumerate(trace):
+        rows_by_trace[t].append(r)
+
+    self_ns = [0] * len(trace)
+    crit_ns = [0] * len(trace)
+    for rows in rows_by_trace:
+        top, top_key = 0, None
+        for j, r in enumerate(rows):
+            # Parentless spans win (earliest start first), then the longest span.
+            key = (0, start[r]) if parent_ids[r] is None else (1, start[r] - end[r])
+            if top_key is None or key < top_key:
+                top, top_key = j, key
+        sn, cn = attribute_trace(
+            [span_ids[r] for r in rows],
+            [parent_ids[r] for r in rows],
+            [start[r] for r in rows],
+            [end[r] for r in rows],
+            top,
+        )
+        for j, r in enumerate(rows):
+            self_ns[r] = sn[j]
+            crit_ns[r] = cn[j]
+    return self_ns, crit_ns
+
+
+def _table_numpy(
+    trace_ids: List[str],
+    components: List[str],
+    component_phases: List[Tuple[str, str]],
+    trace: "np.ndarray",
+    start: "np.ndarray",
+    dur_ns: "np.ndarray",
+    comp: "np.ndarray",
+    comp_phase: "np.ndarray",
+    root_rows: "np.ndarray",
+    root_span_id: Callable[[int], str],
+    self_ns: Optional[Sequence[int]] = None,
+    crit_ns: Optional[Sequence[int]] = None,
+) -> LatencyTable:
+    """Grouped reductions over flat per-span arrays (one row per span)."""
+    nt, nc, ncp = len(trace_ids), len(components), len(component_phases)
+    dur = dur_ns.astype(np.float64) / 1_000_000.0
+
+    cell = trace * nc + comp
+    comp_ms = np.bincount(cell, weights=dur, minlength=nt * nc)
+    comp_counts = np.bincount(cell, minlength=nt * nc)
+
+    has_phase = comp_phase >= 0
+    cell = trace[has_phase] * ncp + comp_phase[has_phase]
+    cp_ms = np.bincount(cell, weights=dur[has_phase], minlength=nt * ncp)
+    cp_counts = np.bincount(cell, minlength=nt * ncp)
+
+    span_count = np.bincount(trace, minlength=nt)
+
+    # Traces without a root report their longest span.
+    total = np.zeros(nt)
+    np.maximum.at(total, trace, dur)
+
+    # Root: earliest-starting parentless span per trace (ties -> first row, like sorted()).
+    root_of = np.full(nt, -1, dtype=np.int64)
+    if len(root_rows):
+        root_rows = root_rows[np.lexsort((root_rows, start[root_rows], trace[root_rows]))]
+        traces_with_root, first = np.unique(trace[root_rows], return_index=True)
+        root_of[traces_with_root] = root_rows[first]
+        total[traces_with_root] = dur[root_rows[first]]
+
+    table = LatencyTable(
+        trace_ids=trace_ids,
+        total_ms=total,
+        span_count=span_count,
+        root_span_ids=[root_span_id(r) if r >= 0 else None for r in root_of.tolist()],
+        components=components,
+        component_ms=comp_ms,
+        component_counts=comp_counts,
+        component_phases=component_phases,
+        component_phase_ms=cp_ms,
+        component_phase_counts=cp_counts,
+    )
+    if self_ns is not None:
+        self_ms = np.asarray(self_ns, dtype=np.int64).astype(np.float64) / 1_000_000.0
+        crit = np.asarray(crit_ns, dtype=np.int64)
+        crit_ms = crit.astype(np.float64) / 1_000_000.0
+        on_path = crit > 0
+
+        cell = trace * nc + comp
+        table.self_component_ms = np.bincount(cell, weights=self_ms, minlength=nt * nc)
+        table.critical_component_ms = np.bincount(cell, weights=crit_ms, minlength=nt * nc)
+        table.critical_component_counts = np.bincount(cell[on_path], minlength=nt * nc)
+
+        cell = trace[has_phase] * ncp + comp_phase[has_phase]
+        table.self_component_phase_ms = np.bincount(cell, weights=self_ms[has_phase], minlength=nt * ncp)
+        table.critical_component_phase_ms = np.bincount(cell, weights=crit_ms[has_phase], minlength=nt * ncp)
+        table.critical_component_phase_counts = np.bincount(cell[on_path[has_phase]], minlength=nt * ncp)
+    return table
+
+
+def _reduce_numpy(ing: _Ingest) -> LatencyTable:
+    self_ns, crit_ns = ing.attribute() if ing.attribution else (None, None)
+    classes = np.array(ing.classes, dtype=np.int64).reshape(-1, 2)
+    cls = np.frombuffer(ing.cls, dtype=np.int64)
+    return _table_numpy(
+        ing.trace_ids,
+        list(ing.components),
+        list(ing.component_phases),
+        trace=np.frombuffer(ing.trace, dtype=np.int64),
+        start=np.frombuffer(ing.start, dtype=np.int64),
+        dur_ns=np.frombuffer(ing.dur, dtype=np.int64),
+        comp=classes[cls, 0],
+        comp_phase=classes[cls, 1],
+        root_rows=np.fromiter(ing.roots, dtype=np.int64, count=len(ing.roots)),
+        root_span_id=ing.roots.__getitem__,
+        self_ns=self_ns,
+        crit_ns=crit_ns,
+    )
+
+
+def _reduce_python(ing: _Ingest) -> LatencyTable:
+    nt, nc, ncp = len(ing.trace_ids), len(ing.components), len(ing.component_phases)
+    comp_ms = [0.0] * (nt * nc)
+    comp_counts = [0] * (nt * nc)
+    cp_ms = [0.0] * (nt * ncp)
+    cp_counts = [0] * (nt * ncp)
+    span_count = [0] * nt
+    longest = [0.0] * nt
+    classes = ing.classes
+
+    for t, d, k in zip(ing.trace, ing.dur, ing.cls):
+        c, cp = classes[k]
+        ms = d / 1_000_000.0
+        cell = t * nc + c
+        comp_ms[cell] += ms
+        comp_counts[cell] += 1
+        if cp >= 0:
+            cell = t * ncp + cp
+            cp_ms[cell] += ms
+            cp_counts[cell] += 1
+        span_count[t] += 1
+        if ms > longest[t]:
+            longest[t] = ms
+
+    root_of = [-1] * nt
+    for r in ing.roots:
+        t = ing.trace[r]
+        cur = root_of[t]
+        if cur < 0 or ing.start[r] < ing.start[cur]:
+            root_of[t] = r
+    total = [ing.dur[r] / 1_000_000.0 if r >= 0 else longest[t] for t, r in enumerate(root_of)]
+
+    table = LatencyTable(
+        trace_ids=ing.trace_ids,
+        total_ms=total,
+        span_count=span_count,
+        root_span_ids=[ing.roots[r] if r >= 0 else None for r in root_of],
+        components=list(ing.components),
+        component_ms=comp_ms,
+        component_counts=comp_counts,
+        component_phases=list(ing.component_phases),
+        component_phase_ms=cp_ms,
+        component_phase_counts=cp_counts,
+    )
+    if ing.attribution:
+        self_comp, crit_comp, crit_counts = [0.0] * (nt * nc), [0.0] * (nt * nc), [0] * (nt * nc)
+        self_cp, crit_cp, crit_cp_counts = [0.0] * (nt * ncp), [0.0] * (nt * ncp), [0] * (nt * ncp)
+        self_ns, crit_ns = ing.attribute()
+        for t, k, sn, cn in zip(ing.trace, ing.cls, self_ns, crit_ns):
+            c, cp = classes[k]
+            cell = t * nc + c
+            self_comp[cell] += sn / 1_000_000.0
+            crit_comp[cell] += cn / 1_000_000.0
+            crit_counts[cell] += cn > 0
+            if cp >= 0:
+                cell = t * ncp + cp
+                self_cp[cell] += sn / 1_000_000.0
+                crit_cp[cell] += cn / 1_000_000.0
+                crit_cp_counts[cell] += cn > 0
+        table.self_component_ms, table.self_component_phase_ms = self_comp, self_cp
+        table.critical_component_ms, table.critical_component_counts = crit_comp, crit_counts
+        table.critical_component_phase_ms, table.critical_component_phase_counts = crit_cp, crit_cp_counts
+    return table
+
+
+def _resolve_numpy(use_numpy: Optional[bool]) -> bool:
+    if use_numpy is None:
+        return np is not None
+    if use_numpy and np is None:
+        raise RuntimeError("NumPy is not installed")
+    return use_numpy
+
+
+def extract_latency_batch(
+    spans: Iterable[Span], *, use_numpy: Optional[bool] = None, attribution: bool = False
+) -> LatencyTable:
+    """extract_latency() for every trace in an arbitrarily interleaved span stream.
+
+    Spans are grouped by trace_id in a single pass; classification runs once
+    per distinct (name, kind, component, phase) tuple. Grouped sums use NumPy
+    when available (``use_numpy=None``), pure Python otherwise.
+    ``attribution=True`` also fills the self-time and critical-path columns;
+    that needs a per-trace span-tree walk in Python, so it is off by default.
+    """
+    ing = _Ingest(attribution)
+    ing.add_all(spans)
+    if not ing.trace_ids:
+        raise ValueError("No spans")
+    return _reduce_numpy(ing) if _resolve_numpy(use_numpy) else _reduce_python(ing)
+
+
+def extract_latency_table(
+    *batches: SpanColumns, use_numpy: Optional[bool] = None, attribution: bool = False
+) -> LatencyTable:
+    """extract_latency_batch() over column batches (e.g. mapped segments).
+
+    With NumPy the columns are viewed without copying and every step is
+    vectorized; Python work is proportional to distinct traces and span
+    classes, not to spans. Without NumPy this falls back to
+    extract_latency_columns().
+    """
+    if not any(len(b) for b in batches):
+        raise ValueError("No spans")
+    if not _resolve_numpy(use_numpy):
+        return _table_from_features(extract_latency_columns(*batches, attribution=attribution), attribution)
+
+    trace_codes: Dict[str, int] = {}
+    components: Dict[str, int] = {}
+    component_phases: Dict[Tuple[str, str], int] = {}
+    parts: List[Tuple["np.ndarray", ...]] = []
+    root_ids: Dict[int, str] = {}
+    span_ids: List[str] = []
+    parent_ids: List[Optional[str]] = []
+    offset = 0
+
+    for cols in batches:
+        n = len(cols)
+        if not n:
+            continue
+        local_trace = np.asarray(cols.trace, dtype=np.int64)
+        uniq, inverse = np.unique(local_trace, return_inverse=True)
+        global_code = np.array(
+            [trace_codes.setdefault(cols.ids[int(u)], len(trace_codes)) for u in uniq], dtype=np.int64
+        )
+        trace = global_code[inverse]
+
+        # One int64 key per (name, kind, component, phase) code tuple; codes are
+        # shifted by one so NULL (-1) becomes 0.
+        base = len(cols.labels) + 1
+        if base**4 >= 1 << 63:
+            raise ValueError("Too many distinct labels in one batch")
+        packed = np.zeros(n, dtype=np.int64)
+        for c in (cols.name, cols.kind, cols.component, cols.phase):
+            packed = packed * base + (np.asarray(c, dtype=np.int64) + 1)
+        keys, key_inverse = np.unique(packed, return_inverse=True)
+
+        key_comp = np.empty(len(keys), dtype=np.int64)
+        key_cp = np.empty(len(keys), dtype=np.int64)
+        for j, key in enumerate(keys.tolist()):
+            codes = []
+            for _ in range(4):
+                key, c = divmod(key, base)
+                codes.append(cols.labels[c - 1] if c else None)
+            p = classify_fields(*reversed(codes))
+            key_comp[j] = components.setdefault(p.component, len(components))
+            key_cp[j] = (
+                component_phases.setdefault((p.component, p.phase), len(component_phases)) if p.phase else -1
+            )
+
+        start = np.asarray(cols.start_ns, dtype=np.int64)
+        end = np.asarray(cols.end_ns, dtype=np.int64)
+        dur = np.where(end == NULL_NS, 0, end - start)
+
+        local_roots = np.flatnonzero(np.asarray(cols.parent, dtype=np.int64) == NULL)
+        span_col = cols.span
+        for r in local_roots.tolist():
+            root_ids[offset + r] = cols.ids[span_col[r]]
+        if attribution:
+            ids = cols.ids
+            span_ids.extend(ids[c] for c in span_col)
+            parent_ids.extend(None if c == NULL else ids[c] for c in cols.parent)
+            end = np.where(end == NULL_NS, start, end)
+
+        parts.append((trace, start, dur, end, key_comp[key_inverse], key_cp[key_inverse], local_roots + offset))
+        offset += n
+
+    trace, start, dur, end, comp, comp_phase, root_rows = (np.concatenate(col) for col in zip(*parts))
+    self_ns = crit_ns = None
+    if attribution:
+        self_ns, crit_ns = _attribute_rows(
+            len(trace_codes), trace.tolist(), span_ids, parent_ids, start.tolist(), end.tolist()
+        )
+    return _table_numpy(
+        list(trace_codes),
+        list(components),
+        list(component_phases),
+        trace=trace,
+        start=start,
+        dur_ns=dur,
+        comp=comp,
+        comp_phase=comp_phase,
+        root_rows=root_rows,
+        root_span_id=root_ids.__getitem__,
+        self_ns=self_ns,
+        crit_ns=crit_ns,
+    )
+
+
+def _table_from_features(feats: List[LatencyFeatures], attribution: bool) -> LatencyTable:
+    components: Dict[str, int] = {}
+    component_phases: Dict[Tuple[str, str], int] = {}
+    for f in feats:
+        for c in f.by_component_ms:
+            components.setdefault(c, len(components))
+        for k in f.by_component_phase_ms:
+            component_phases.setdefault(k, len(component_phases))
+    nt, nc, ncp = len(feats), len(components), len(component_phases)
+
+    def fill(per_trace: Callable[[LatencyFeatures], Dict], index: Dict, n: int) -> Tuple[List[float], List[int]]:
+        ms, counts = [0.0] * (nt * n), [0] * (nt * n)
+        for t, f in enumerate(feats):
+            for key, v in per_trace(f).items():
+                ms[t * n + index[key]] = v
+                counts[t * n + index[key]] = 1
+        return ms, counts
+
+    comp_ms, comp_counts = fill(lambda f: f.by_component_ms, components, nc)
+    cp_ms, cp_counts = fill(lambda f: f.by_component_phase_ms, component_phases, ncp)
+    table = LatencyTable(
+        trace_ids=[f.trace_id for f in feats],
+        total_ms=[f.total_ms for f in feats],
+        span_count=[f.span_count for f in feats],
+        root_span_ids=[f.root_span_id for f in feats],
+        components=list(components),
+        component_ms=comp_ms,
+        component_counts=comp_counts,
+        component_phases=list(component_phases),
+        component_phase_ms=cp_ms,
+        component_phase_counts=cp_counts,
+    )
+    if attribution:
+        table.self_component_ms, _ = fill(lambda f: f.self_by_component_ms, components, nc)
+        table.self_component_phase_ms, _ = fill(lambda f: f.self_by_component_phase_ms, component_phases, ncp)
+        table.critical_component_ms, table.critical_component_counts = fill(
+            lambda f: f.critical_by_component_ms, components, nc
+        )
+        table.critical_component_phase_ms, table.critical_component_phase_counts = fill(
+            lambda f: f.critical_by_component_phase_ms, component_phases, ncp
+        )
+    return table
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .extract import LatencyFeatures
+from .taxonomy import Phase, classify_fields
+from .tree import attribute_trace
+
+
+NULL = -1  # code for "absent" in the id / label columns
+NULL_NS = -(1 << 63)  # end_ns of an unfinished span
+
+
+@dataclass
+class SpanColumns:
+    """Column view of a batch of spans (no Span objects).
+
+    Integer columns hold codes into ``ids`` (trace/span/parent ids) or
+    ``labels`` (names and the kind/component/phase attribute values);
+    ``NULL`` marks a missing value. ``end_ns`` uses ``NULL_NS`` for
+    unfinished spans. Any indexable sequences work: lists, arrays, or
+    memoryviews over a memory-mapped segment.
+    """
+
+    trace: Sequence[int]
+    span: Sequence[int]
+    parent: Sequence[int]
+    start_ns: Sequence[int]
+    end_ns: Sequence[int]
+    name: Sequence[int]
+    kind: Sequence[int]
+    component: Sequence[int]
+    phase: Sequence[int]
+    ids: Sequence[str]
+    labels: Sequence[str]
+
+    def __len__(self) -> int:
+        return len(self.start_ns)
+
+
+def _label(labels: Sequence[str], code: int) -> Optional[str]:
+    return None if code == NULL else labels[code]
+
+
+def classify_codes(cols: SpanColumns) -> List[Phase]:
+    """Classify every row, calling classify_fields once per distinct code tuple."""
+    cache: Dict[Tuple[int, int, int, int], Phase] = {}
+    labels = cols.labels
+    out: List[Phase] = []
+    for key in zip(cols.name, cols.kind, cols.component, cols.phase):
+        p = cache.get(key)
+        if p is None:
+            name, kind, comp, phase = key
+            p = cache[key] = classify_fields(
+                _label(labels, name), _label(labels, kind), _label(labels, comp), _label(labels, phase)
+            )
+        out.append(p)
+    return out
+
+
+def _add(d: Dict, key, ms: float) -> None:
+    d[key] = d.get(key, 0.0) + ms
+
+
+def extract_latency_columns(*batches: SpanColumns, attribution: bool = False) -> List[LatencyFeatures]:
+    """extract_latency() for every trace in ``batches``, in order of first appearance.
+
+    Traces may straddle batches (e.g. segments written by different flushes);
+    rows are grouped by the decoded trace id. The self-time and critical-path
+    fields are only filled with ``attribution=True``.
+    """
+    phases = [classify_codes(cols) for cols in batches]
+
+    trace_index: Dict[str, int] = {}
+    rows_by_trace: List[List[Tuple[int, int]]] = []
+    for b, cols in enumerate(batches):
+        local: Dict[int, int] = {}
+        for i, code in enumerate(cols.trace):
+            t = local.get(code)
+            if t is None:
+                tid = cols.ids[code]
+                t = trace_index.get(tid)
+                if t is None:
+                    t = trace_index[tid] = len(rows_by_trace)
+                    rows_by_trace.append([])
+                local[code] = t
+            rows_by_trace[t].append((b, i))
+
+    out: List[LatencyFeatures] = []
+    for tid, rows in zip(trace_index, rows_by_trace):
+        root: Optional[int] = None
+        root_start = 0
+        by_comp: Dict[str, float] = {}
+        by_comp_phase: Dict[Tuple[str, str], float] = {}
+        longest, longest_row = 0.0, 0
+        root_ms = 0.0
+        starts: List[int] = []
+        ends: List[int] = []
+        for j, (b, i) in enumerate(rows):
+            cols = batches[b]
+            start, end = cols.start_ns[i], cols.end_ns[i]
+            if end == NULL_NS:
+                end = start
+            starts.append(start)
+            ends.append(end)
+            ms = (end - start) / 1_000_000.0
+            if ms > longest:
+                longest, longest_row = ms, j
+            if cols.parent[i] == NULL and (root is None or start < root_start):
+                root, root_start, root_ms = j, start, ms
+            p = phases[b][i]
+            _add(by_comp, p.component, ms)
+            if p.phase:
+                _add(by_comp_phase, (p.component, p.phase), ms)
+
+        f = LatencyFeatures(
+            trace_id=tid,
+            total_ms=root_ms if root is not None else longest,
+            by_component_ms=by_comp,
+            by_component_phase_ms=by_comp_phase,
+            root_span_id=_span_id(batches, rows[root]) if root is not None else None,
+            span_count=len(rows),
+        )
+        if attribution:
+            _attribute(f, batches, phases, rows, starts, ends, root if root is not None else longest_row)
+        out.append(f)
+    return out
+
+
+def _span_id(batches: Sequence[SpanColumns], row: Tuple[int, int]) -> str:
+    cols = batches[row[0]]
+    return cols.ids[cols.span[row[1]]]
+
+
+def _attribute(
+    f: LatencyFeatures,
+    batches: Sequence[SpanColumns],
+    phases: List[List[Phase]],
+    rows: List[Tuple[int, int]],
+    starts: List[int],
+    ends: List[int],
+    top: int,
+) -> None:
+    parents: List[Optional[str]] = []
+    for b, i in rows:
+        cols = batches[b]
+        code = cols.parent[i]
+        parents.append(None if code == NULL else cols.ids[code])
+    self_ns, crit_ns = attribute_trace([_span_id(batches, r) for r in rows], parents, starts, ends, top)
+
+    for (b, i), sn, cn in zip(rows, self_ns, crit_ns):
+        p = phases[b][i]
+        self_ms, crit_ms = sn / 1_000_000.0, cn / 1_000_000.0
+        _add(f.self_by_component_ms, p.component, self_ms)
+        if crit_ms:
+            _add(f.critical_by_component_ms, p.component, crit_ms)
+        if p.phase:
+            key = (p.component, p.phase)
+            _add(f.self_by_component_phase_ms, key, self_ms)
+            if crit_ms:
+                _add(f.critical_by_component_phase_ms, key, crit_ms)
+    f.critical_path_ms = sum(crit_ns) / 1_000_000.0
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .aggregate import _percentile
+from .batch import LatencyTable, np
+from .extract import LatencyFeatures
+
+Features = Union[LatencyTable, Iterable[LatencyFeatures]]
+
+TOTAL = "total"
+
+
+@dataclass(frozen=True, slots=True)
+class QuantileShift:
+    """Change of one quantile between runs, with a bootstrap confidence interval."""
+
+    quantile: float
+    baseline_ms: float
+    candidate_ms: float
+    ci_low_ms: float
+    ci_high_ms: float
+
+    @property
+    def delta_ms(self) -> float:
+        return self.candidate_ms - self.baseline_ms
+
+    @property
+    def rel_change(self) -> float:
+        return self.delta_ms / self.baseline_ms if self.baseline_ms else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "quantile": self.quantile,
+            "baseline_ms": self.baseline_ms,
+            "candidate_ms": self.candidate_ms,
+            "delta_ms": self.delta_ms,
+            "ci_low_ms": self.ci_low_ms,
+            "ci_high_ms": self.ci_high_ms,
+        }
+
+
+@dataclass
+class MetricComparison:
+    """Shifts of one metric: ``"total"``, a component, or ``"component:phase"``.
+
+    ``tail_delta_ms`` is the change in the metric's mean contribution to the
+    slowest traces (at or above each run's p95), which is what ranks
+    components by how much of the total p95 shift they explain.
+    """
+
+    metric: str
+    n_baseline: int
+    n_candidate: int
+    shifts: Dict[str, QuantileShift] = field(default_factory=dict)
+    regression: bool = False
+    improvement: bool = False
+    mean_delta_ms: float = 0.0
+    tail_delta_ms: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "metric": self.metric,
+            "n_baseline": self.n_baseline,
+            "n_candidate": self.n_candidate,
+            "shifts": {k: v.to_dict() for k, v in self.shifts.items()},
+            "regression": self.regression,
+            "improvement": self.improvement,
+            "mean_delta_ms": self.mean_delta_ms,
+            "tail_delta_ms": self.tail_delta_ms,
+        }
+
+
+@dataclass
+class RunComparison:
+    total: MetricComparison
+    components: List[MetricComparison] = field(default_factory=list)  # ranked, biggest contributor first
+    phases: List[MetricComparison] = field(default_factory=list)  # ranked likewise
+
+    @property
+    def regressed(self) -> bool:
+        return self.total.regression or any(m.regression for m in self.components + self.phases)
+
+    def regressions(self) -> List[MetricComparison]:
+        return [m for m in [self.total, *self.components, *self.phases] if m.regression]
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total.to_dict(),
+            "components": [m.to_dict() for m in self.components],
+            "phases": [m.to_dict() for m in self.phases],
+            "regressed": self.regressed,
+        }
+
+
+def _contributions(f: LatencyFeatures) -> Tuple[Dict[str, float], Dict[Tuple[str, str], float]]:
+    """Critical-path time when the features carry it, else self time, else inclusive sums."""
+    if f.critical_path_ms > 0:
+        return f.critical_by_component_ms, f.critical_by_component_phase_ms
+    if f.self_by_component_ms:
+        return f.self_by_component_ms, f.self_by_component_phase_ms
+    return f.by_component_ms, f.by_component_phase_ms
+
+
+class _Run:
+    """Sorted per-metric samples plus mean/tail contributions for one run."""
+
+    def __init__(self, features: Features) -> None:
+        feats = list(features)
+        if not feats:
+            raise ValueError("No latency features")
+        self.n = len(feats)
+        self.samples: Dict[str, List[float]] = {TOTAL: [f.total_ms for f in feats]}
+        for f in feats:
+            for comp, ms in f.by_component_ms.items():
+                self.samples.setdefault(comp, []).append(ms)
+            for (comp, phase), ms in f.by_component_phase_ms.items():
+                self.samples.setdefault(f"{comp}:{phase}", []).append(ms)
+        for xs in self.samples.values():
+            xs.sort()
+
+        tail_cut = _percentile(self.samples[TOTAL], 0.95)
+        self.mean: Dict[str, float] = {}
+        self.tail: Dict[str, float] = {}
+        n_tail = 0
+        for f in feats:
+            in_tail = f.total_ms >= tail_cut
+            n_tail += in_tail
+            comps, phases = _contributions(f)
+            items = [(TOTAL, f.total_ms), *comps.items()]
+            items += [(f"{c}:{p}", ms) for (c, p), ms in phases.items()]
+            for key, ms in items:
+                self.mean[key] = self.mean.get(key, 0.0) + ms
+                if in_tail:
+                    self.tail[key] = self.tail.get(key, 0.0) + ms
+        self.mean = {k: v / self.n for k, v in self.mean.items()}
+        self.tail = {k: v / n_tail for k, v in self.tail.items()}
+
+
+class _Resampler:
+    """Bootstrap quantiles without materializing resamples.
+
+    The k-th order statistic of a size-n resample of sorted ``x`` is
+    ``x[floor(n * U)]`` with ``U ~ Beta(k, n + 1 - k)``, so each iteration
+    costs one Beta draw regardless of n.
+    """
+
+    def __init__(self, seed: int, use_numpy: bool) -> None:
+        self.use_numpy = use_numpy
+        self._rng = np.random.default_rng(seed) if use_numpy else random.Random(seed)
+
+    def quantile(self, xs: Sequence[float], q: float, iterations: int):
+        n = len(xs)
+        k = int(q * (n - 1)) + 1
+        if self.use_numpy:
+            u = self._rng.beta(k, n + 1 - k, size=iterations)
+            idx = np.minimum((u * n).astype(np.int64), n - 1)
+            return np.fromiter((xs[i] for i in idx.tolist()), dtype=np.float64, count=iterations)
+        beta = self._rng.betavariate
+        return [xs[min(int(beta(k, n + 1 - k) * n), n - 1)] for _ in range(iterations)]
+
+    def interval(self, base, cand, alpha: float) -> Tuple[float, float]:
+        if self.use_numpy:
+            lo, hi = np.quantile(cand - base, [alpha / 2, 1 - alpha / 2])
+            return float(lo), float(hi)
+        deltas = sorted(c - b for b, c in zip(base, cand))
+        return _percentile(deltas, alpha / 2), _percentile(deltas, 1 - alpha / 2)
+
+
+def compare_runs(
+    baseline: Features,
+    candidate: Features,
+    *,
+    quantiles: Sequence[float] = (0.50, 0.95),
+    iterations: int = 2000,
+    confidence: float = 0.95,
+    min_rel_change: float = 0.02,
+    seed: int = 0,
+    use_numpy: Optional[bool] = None,
+) -> RunComparison:
+    """Compare latency between two runs or deployments.
+
+    For the total and every component / component phase present in both runs,
+    each quantile's shift gets a bootstrap CI (``iterations`` resamples,
+    deterministic for a given ``seed``); ``confidence`` is family-wise, so
+    intervals widen with the number of metrics compared. A metric regresses when some
+    quantile's CI lies entirely above 0 and the shift is at least
+    ``min_rel_change`` of the baseline; improvements are the mirror image.
+    Components and phases are ranked by how much of the total's tail shift
+    they explain (critical-path contributions when the features carry them).
+    Metrics seen in only one of the runs are not compared.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        raise RuntimeError("NumPy is not installed")
+    base, cand = _Run(baseline), _Run(candidate)
+    resampler = _Resampler(seed, use_numpy)
+    shared = [k for k in base.samples if k != TOTAL and k in cand.samples]
+    # Bonferroni: ``confidence`` holds across all metrics and quantiles at once.
+    alpha = (1.0 - confidence) / ((1 + len(shared)) * len(quantiles))
+
+    def compare(metric: str) -> MetricComparison:
+        xb, xc = base.samples[metric], cand.samples[metric]
+        m = MetricComparison(
+            metric=metric,
+            n_baseline=len(xb),
+            n_candidate=len(xc),
+            mean_delta_ms=cand.mean.get(metric, 0.0) - base.mean.get(metric, 0.0),
+            tail_delta_ms=cand.tail.get(metric, 0.0) - base.tail.get(metric, 0.0),
+        )
+        for q in quantiles:
+            lo, hi = resampler.interval(
+                resampler.quantile(xb, q, iterations), resampler.quantile(xc, q, iterations), alpha
+            )
+            shift = QuantileShift(
+                quantile=q,
+                baseline_ms=_percentile(xb, q),
+                candidate_ms=_percentile(xc, q),
+                ci_low_ms=lo,
+                ci_high_ms=hi,
+            )
+            m.shifts[f"p{round(q * 100)}"] = shift
+            big = abs(shift.rel_change) >= min_rel_change
+            m.regression |= big and lo > 0
+            m.improvement |= big and hi < 0
+        return m
+
+    total = compare(TOTAL)
+    sign = 1.0 if total.tail_delta_ms >= 0 else -1.0
+
+    ranked = sorted((compare(k) for k in shared), key=lambda m: -sign * m.tail_delta_ms)
+    return RunComparison(
+        total=total,
+        components=[m for m in ranked if ":" not in m.metric],
+        phases=[m for m in ranked if ":" in m.metric],
+    )
@@ -5,25 +5,55 @@ from typing import Dict, Iterable, List, Optional, Tuple
 
 from spanrecorder.span import Span
 from .taxonomy import classify
+from .tree import attribute_trace
 
 
 @dataclass
 class LatencyFeatures:
+    """Per-trace latency breakdown.
+
+    - ``by_component_ms`` / ``by_component_phase_ms``: summed span durations
+      (inclusive; nested and concurrent spans add up)
+    - ``self_*``: exclusive time (duration minus the union of children)
+    - ``critical_*``: time on the root's critical path; these sum to
+      ``critical_path_ms`` (the root's wall clock), so shares add up to 1
+    """
+
     trace_id: str
     total_ms: float
     by_component_ms: Dict[str, float] = field(default_factory=dict)
     by_component_phase_ms: Dict[Tuple[str, str], float] = field(default_factory=dict)
     root_span_id: Optional[str] = None
     span_count: int = 0
+    self_by_component_ms: Dict[str, float] = field(default_factory=dict)
+    self_by_component_phase_ms: Dict[Tuple[str, str], float] = field(default_factory=dict)
+    critical_path_ms: float = 0.0
+    critical_by_component_ms: Dict[str, float] = field(default_factory=dict)
+    critical_by_component_phase_ms: Dict[Tuple[str, str], float] = field(default_factory=dict)
+
+    def component_share(self) -> Dict[str, float]:
+        """Fraction of the critical path (wall clock) spent in each component."""
+        if self.critical_path_ms <= 0:
+            return {}
+        return {k: v / self.critical_path_ms for k, v in self.critical_by_component_ms.items()}
 
     def to_dict(self) -> Dict:
+        def cp(d: Dict[Tuple[str, str], float]) -> Dict[str, float]:
+            return {f"{k[0]}:{k[1]}": v for k, v in d.items()}
+
         return {
             "trace_id": self.trace_id,
             "total_ms": self.total_ms,
             "by_component_ms": dict(self.by_component_ms),
-            "by_component_phase_ms": {f"{k[0]}:{k[1]}": v for k, v in self.by_component_phase_ms.items()},
+            "by_component_phase_ms": cp(self.by_component_phase_ms),
             "root_span_id": self.root_span_id,
             "span_count": self.span_count,
+            "self_by_component_ms": dict(self.self_by_component_ms),
+            "self_by_component_phase_ms": cp(self.self_by_component_phase_ms),
+            "critical_path_ms": self.critical_path_ms,
+            "critical_by_component_ms": dict(self.critical_by_component_ms),
+            "critical_by_component_phase_ms": cp(self.critical_by_component_phase_ms),
+            "component_share": self.component_share(),
         }
 
 
@@ -42,6 +72,10 @@ def _duration_ms(span: Span) -> float:
     return float(dn) / 1_000_000.0
 
 
+def _add(d: Dict, key, ms: float) -> None:
+    d[key] = d.get(key, 0.0) + ms
+
+
 def extract_latency(spans: Iterable[Span]) -> LatencyFeatures:
     spans_list = list(spans)
     if not spans_list:
@@ -51,16 +85,40 @@ def extract_latency(spans: Iterable[Span]) -> LatencyFeatures:
     root = _find_root(spans_list)
     total_ms = _duration_ms(root) if root else max(_duration_ms(s) for s in spans_list)
 
+    # Without a root, attribute the critical path below the longest span.
+    top = root if root is not None else max(spans_list, key=_duration_ms)
+    starts = [s.start_ns for s in spans_list]
+    ends = [s.end_ns if s.end_ns is not None else s.start_ns for s in spans_list]
+    self_ns, crit_ns = attribute_trace(
+        [s.span_id for s in spans_list],
+        [s.parent_id for s in spans_list],
+        starts,
+        ends,
+        next(i for i, s in enumerate(spans_list) if s is top),
+    )
+
     by_comp: Dict[str, float] = {}
     by_comp_phase: Dict[Tuple[str, str], float] = {}
+    self_comp: Dict[str, float] = {}
+    self_comp_phase: Dict[Tuple[str, str], float] = {}
+    crit_comp: Dict[str, float] = {}
+    crit_comp_phase: Dict[Tuple[str, str], float] = {}
 
-    for s in spans_list:
+    for i, s in enumerate(spans_list):
         ms = _duration_ms(s)
+        self_ms = self_ns[i] / 1_000_000.0
+        crit_ms = crit_ns[i] / 1_000_000.0
         p = classify(s)
-        by_comp[p.component] = by_comp.get(p.component, 0.0) + ms
+        _add(by_comp, p.component, ms)
+        _add(self_comp, p.component, self_ms)
+        if crit_ms:
+            _add(crit_comp, p.component, crit_ms)
         if p.phase:
             key = (p.component, p.phase)
-            by_comp_phase[key] = by_comp_phase.get(key, 0.0) + ms
+            _add(by_comp_phase, key, ms)
+            _add(self_comp_phase, key, self_ms)
+            if crit_ms:
+                _add(crit_comp_phase, key, crit_ms)
 
     return LatencyFeatures(
         trace_id=trace_id,
@@ -69,4 +127,9 @@ def extract_latency(spans: Iterable[Span]) -> LatencyFeatures:
         by_component_phase_ms=by_comp_phase,
         root_span_id=root.span_id if root else None,
         span_count=len(spans_list),
+        self_by_component_ms=self_comp,
+        self_by_component_phase_ms=self_comp_phase,
+        critical_path_ms=sum(crit_ns) / 1_000_000.0,
+        critical_by_component_ms=crit_comp,
+        critical_by_component_phase_ms=crit_comp_phase,
     )
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import math
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+_MAGIC = b"DDS1"
+_HEADER = struct.Struct("<4sdqqdddI")  # magic, accuracy, count, zero_count, sum, min, max, max_bins
+
+# Values below this are counted in the zero bucket (durations are >= 0).
+MIN_INDEXABLE = 1e-9
+
+
+def _write_varint(out: bytearray, v: int) -> None:
+    while v >= 0x80:
+        out.append((v & 0x7F) | 0x80)
+        v >>= 7
+    out.append(v)
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    shift = v = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            return v, pos
+        shift += 7
+
+
+def _zigzag(v: int) -> int:
+    return (v << 1) ^ (v >> 63)
+
+
+def _unzigzag(v: int) -> int:
+    return (v >> 1) ^ -(v & 1)
+
+
+class DDSketch:
+    """Mergeable quantile sketch with a relative-error guarantee (DDSketch).
+
+    Values fall into logarithmic buckets ``ceil(log_gamma(x))`` with
+    ``gamma = (1 + a) / (1 - a)``, so any quantile is returned within a
+    relative error ``a`` of an actual sample, whatever the distribution.
+    Memory is bounded by ``max_bins``; past it the lowest buckets are
+    collapsed, which keeps the upper quantiles (p95/p99) exact to ``a``.
+    Sketches with the same accuracy merge losslessly.
+    """
+
+    __slots__ = ("relative_accuracy", "max_bins", "_gamma", "_log_gamma", "bins",
+                 "count", "zero_count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        if max_bins < 1:
+            raise ValueError("max_bins must be positive")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+        self.zero_count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f"DDSketch(count={self.count}, bins={len(self.bins)}, relative_accuracy={self.relative_accuracy})"
+
+    # -------------------------
+    # Updates
+    # -------------------------
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value < 0:
+            raise ValueError("DDSketch only accepts non-negative values")
+        if weight <= 0:
+            return
+        if value < MIN_INDEXABLE:
+            self.zero_count += weight
+        else:
+            k = math.ceil(math.log(value) / self._log_gamma)
+            bins = self.bins
+            bins[k] = bins.get(k, 0) + weight
+            if len(bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def update(self, values: Iterable[float]) -> None:
+        for v in values:
+            self.add(v)
+
+    def merge(self, other: "DDSketch") -> None:
+        """Fold ``other`` into this sketch (both must use the same accuracy)."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative_accuracy")
+        if not other.count:
+            return
+        bins = self.bins
+        for k, c in other.bins.items():
+            bins[k] = bins.get(k, 0) + c
+        if len(bins) > self.max_bins:
+            self._collapse()
+        self.count += other.count
+        self.zero_count += other.zero_count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def copy(self) -> "DDSketch":
+        out = DDSketch(self.relative_accuracy, self.max_bins)
+        out.merge(self)
+        return out
+
+    def _collapse(self) -> None:
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        bins = self.bins
+        floor = keys[excess]
+        for k in keys[:excess]:
+            bins[floor] += bins.pop(k)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+
+    @property
+    def avg(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile ``q`` in [0, 1] (0.0 for an empty sketch)."""
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Several quantiles with a single pass over the sorted buckets."""
+        qs = list(qs)
+        if any(not 0 <= q <= 1 for q in qs):
+            raise ValueError("Quantiles must be in [0, 1]")
+        if not self.count:
+            return [0.0] * len(qs)
+
+        order = sorted(range(len(qs)), key=qs.__getitem__)
+        out = [0.0] * len(qs)
+        buckets = self._cumulative()
+        acc, value = next(buckets)
+        for j in order:
+            rank = qs[j] * (self.count - 1)
+            while acc <= rank:
+                acc, value = next(buckets)
+            out[j] = min(max(value, self.min), self.max)
+        return out
+
+    def _cumulative(self) -> Iterator[Tuple[int, float]]:
+        """(cumulative count, representative value) per non-empty bucket, ascending."""
+        acc = self.zero_count
+        if acc:
+            yield acc, 0.0
+        gamma = self._gamma
+        for k in sorted(self.bins):
+            acc += self.bins[k]
+            # Midpoint (in relative terms) of (gamma^(k-1), gamma^k].
+            yield acc, 2.0 * gamma**k / (gamma + 1.0)
+
+    # -------------------------
+    # Serialization
+    # -------------------------
+
+    def to_bytes(self) -> bytes:
+        """Compact binary form: fixed header, then zigzag-varint key deltas and counts."""
+        out = bytearray(
+            _HEADER.pack(
+                _MAGIC, self.relative_accuracy, self.count, self.zero_count, self.sum,
+                self.min if self.count else 0.0, self.max if self.count else 0.0, self.max_bins,
+            )
+        )
+        _write_varint(out, len(self.bins))
+        prev = 0
+        for k in sorted(self.bins):
+            _write_varint(out, _zigzag(k - prev))
+            _write_varint(out, self.bins[k])
+            prev = k
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        magic, accuracy, count, zero_count, total, lo, hi, max_bins = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a DDSketch payload")
+        sk = cls(accuracy, max_bins)
+        nbins, pos = _read_varint(data, _HEADER.size)
+        k = 0
+        for _ in range(nbins):
+            delta, pos = _read_varint(data, pos)
+            c, pos = _read_varint(data, pos)
+            k += _unzigzag(delta)
+            sk.bins[k] = c
+        sk.count, sk.zero_count, sk.sum = count, zero_count, total
+        if count:
+            sk.min, sk.max = lo, hi
+        return sk
+
+
+def merge_sketches(sketches: Iterable[DDSketch]) -> Optional[DDSketch]:
+    """Merge many sketches into a new one (None if there are none)."""
+    out: Optional[DDSketch] = None
+    for sk in sketches:
+        if out is None:
+            out = sk.copy()
+        else:
+            out.merge(sk)
+    return out
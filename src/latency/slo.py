@@ -1,14 +1,36 @@
 from __future__ import annotations
 
+import time
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from .aggregate import LatencyReport
+from .extract import LatencyFeatures
 
 
 @dataclass(frozen=True, slots=True)
 class LatencySLO:
+    """``objective`` of traces must finish within ``p95_ms_max``.
+
+    ``component`` targets one component (``"retriever"``) or component phase
+    (``"llm:decode"``) instead of the trace total; traces without it are not
+    counted against the SLO.
+    """
+
     name: str
     p95_ms_max: float
+    component: Optional[str] = None
+    objective: float = 0.95
+
+    def value(self, features: LatencyFeatures) -> Optional[float]:
+        if self.component is None:
+            return features.total_ms
+        comp, _, phase = self.component.partition(":")
+        if phase:
+            return features.by_component_phase_ms.get((comp, phase))
+        return features.by_component_ms.get(comp)
 
 
 @dataclass(frozen=True, slots=True)
@@ -20,9 +42,214 @@ class SLOResult:
 
 
 def evaluate_latency_slo(report: LatencyReport, slo: LatencySLO) -> SLOResult:
+    if slo.component is None:
+        observed = report.p95_ms
+    else:
+        quantiles = report.component_phase_quantiles_ms if ":" in slo.component else report.component_quantiles_ms
+        observed = quantiles.get(slo.component, {}).get("p95", 0.0)
     return SLOResult(
         slo_name=slo.name,
-        passed=report.p95_ms <= slo.p95_ms_max,
-        observed_p95_ms=report.p95_ms,
+        passed=observed <= slo.p95_ms_max,
+        observed_p95_ms=observed,
         budget_ms=slo.p95_ms_max,
     )
+
+
+# -------------------------
+# Online evaluation
+# -------------------------
+
+
+@dataclass(frozen=True, slots=True)
+class BurnRateRule:
+    """Alert when both windows burn error budget at least ``burn_rate`` times too fast."""
+
+    severity: str
+    long_window_s: int
+    short_window_s: int
+    burn_rate: float
+
+
+# Multi-window, multi-burn-rate defaults: 2% of a 30-day budget in 1h, 5% in 6h.
+DEFAULT_BURN_RULES: Tuple[BurnRateRule, ...] = (
+    BurnRateRule("page", long_window_s=3600, short_window_s=300, burn_rate=14.4),
+    BurnRateRule("ticket", long_window_s=21600, short_window_s=1800, burn_rate=6.0),
+)
+DEFAULT_WINDOWS_S: Tuple[int, ...] = (60, 300, 1800, 3600, 21600)
+
+
+@dataclass(frozen=True, slots=True)
+class WindowStats:
+    window_s: int
+    total: int
+    bad: int
+    burn_rate: float
+
+    @property
+    def bad_fraction(self) -> float:
+        return self.bad / self.total if self.total else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class SLOAlert:
+    slo_name: str
+    deployment: Optional[str]
+    severity: str
+    long_burn_rate: float
+    short_burn_rate: float
+    long_window_s: int
+    short_window_s: int
+
+
+class _RollingCounts:
+    """Ring of per-bucket (total, bad) counts with running sums per window.
+
+    Advancing by one bucket expires one bucket from each window, so updates
+    are O(windows) per elapsed bucket and O(1) per event; memory is fixed by
+    the longest window.
+    """
+
+    __slots__ = ("windows", "size", "head", "total", "bad", "sums")
+
+    def __init__(self, windows: Sequence[int], head: int) -> None:
+        self.windows = windows  # in buckets, ascending
+        self.size = windows[-1]
+        self.head = head
+        self.total = array("q", [0]) * self.size
+        self.bad = array("q", [0]) * self.size
+        self.sums = [[0, 0] for _ in windows]
+
+    def advance(self, bucket: int) -> None:
+        if bucket <= self.head:
+            return
+        if bucket - self.head >= self.size:
+            for i in range(self.size):
+                self.total[i] = self.bad[i] = 0
+            for s in self.sums:
+                s[0] = s[1] = 0
+            self.head = bucket
+            return
+        size, total, bad = self.size, self.total, self.bad
+        for step in range(self.head + 1, bucket + 1):
+            for w, s in zip(self.windows, self.sums):
+                old = (step - w) % size
+                s[0] -= total[old]
+                s[1] -= bad[old]
+            slot = step % size
+            total[slot] = bad[slot] = 0
+        self.head = bucket
+
+    def add(self, bucket: int, is_bad: bool) -> None:
+        self.advance(bucket)
+        age = self.head - bucket
+        if age >= self.size:
+            return  # older than the longest window
+        slot = bucket % self.size
+        self.total[slot] += 1
+        self.bad[slot] += is_bad
+        for w, s in zip(self.windows, self.sums):
+            if age < w:
+                s[0] += 1
+                s[1] += is_bad
+
+
+class SLOEngine:
+    """Online SLO evaluation over finished traces.
+
+    Each (SLO, deployment) series keeps per-``bucket_s`` good/bad counts for
+    the configured windows (1m/5m/30m/1h/6h by default) and reports the
+    error-budget burn rate per window: ``bad_fraction / (1 - objective)``.
+    Alerts follow the multi-window rules in ``rules``. At most
+    ``max_series`` series are kept; the least recently updated is evicted.
+    """
+
+    def __init__(
+        self,
+        slos: Iterable[LatencySLO],
+        *,
+        windows_s: Sequence[int] = DEFAULT_WINDOWS_S,
+        rules: Sequence[BurnRateRule] = DEFAULT_BURN_RULES,
+        bucket_s: int = 60,
+        max_series: int = 1024,
+        min_events: int = 10,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.slos: Dict[str, LatencySLO] = {s.name: s for s in slos}
+        windows_s = sorted(set(windows_s) | {w for r in rules for w in (r.long_window_s, r.short_window_s)})
+        if any(w % bucket_s for w in windows_s):
+            raise ValueError("Windows must be multiples of bucket_s")
+        self.windows_s = tuple(windows_s)
+        self._windows = tuple(w // bucket_s for w in windows_s)
+        self.rules = tuple(rules)
+        self.bucket_s = bucket_s
+        self.max_series = max_series
+        self.min_events = min_events
+        self.clock = clock
+        self._series: "OrderedDict[Tuple[str, Optional[str]], _RollingCounts]" = OrderedDict()
+
+    def observe(
+        self, features: LatencyFeatures, *, deployment: Optional[str] = None, ts: Optional[float] = None
+    ) -> None:
+        """Count one finished trace (``ts`` defaults to now) against every SLO."""
+        bucket = int((self.clock() if ts is None else ts) // self.bucket_s)
+        for slo in self.slos.values():
+            v = slo.value(features)
+            if v is None:
+                continue
+            self._get_series(slo.name, deployment, bucket).add(bucket, v > slo.p95_ms_max)
+
+    def _get_series(self, slo_name: str, deployment: Optional[str], bucket: int) -> _RollingCounts:
+        key = (slo_name, deployment)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _RollingCounts(self._windows, bucket)
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        return series
+
+    def series(self) -> List[Tuple[str, Optional[str]]]:
+        return list(self._series)
+
+    def window_stats(
+        self, slo_name: str, deployment: Optional[str] = None, *, now: Optional[float] = None
+    ) -> Dict[int, WindowStats]:
+        """Per-window counts and burn rate for one series, keyed by window seconds."""
+        slo = self.slos[slo_name]
+        series = self._series.get((slo_name, deployment))
+        if series is not None:
+            series.advance(int((self.clock() if now is None else now) // self.bucket_s))
+        budget = 1.0 - slo.objective
+        out: Dict[int, WindowStats] = {}
+        for j, w in enumerate(self.windows_s):
+            total, bad = series.sums[j] if series is not None else (0, 0)
+            burn = (bad / total) / budget if total and budget > 0 else 0.0
+            out[w] = WindowStats(window_s=w, total=total, bad=bad, burn_rate=burn)
+        return out
+
+    def alerts(self, *, now: Optional[float] = None) -> List[SLOAlert]:
+        """Rules firing for any series; both windows must burn fast and hold ``min_events``."""
+        now = self.clock() if now is None else now
+        out: List[SLOAlert] = []
+        for slo_name, deployment in list(self._series):
+            stats = self.window_stats(slo_name, deployment, now=now)
+            for rule in self.rules:
+                long, short = stats[rule.long_window_s], stats[rule.short_window_s]
+                if (
+                    long.total >= self.min_events
+                    and long.burn_rate >= rule.burn_rate
+                    and short.burn_rate >= rule.burn_rate
+                ):
+                    out.append(
+                        SLOAlert(
+                            slo_name=slo_name,
+                            deployment=deployment,
+                            severity=rule.severity,
+                            long_burn_rate=long.burn_rate,
+                            short_burn_rate=short.burn_rate,
+                            long_window_s=rule.long_window_s,
+                            short_window_s=rule.short_window_s,
+                        )
+                    )
+        return out
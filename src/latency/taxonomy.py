@@ -31,14 +31,29 @@ def classify(span: Span) -> Phase:
     if "component" in attrs:
         return Phase(component=str(attrs["component"]), phase=attrs.get("phase"))
 
-    kind = _kind_like(span)
+    return classify_fields(span.name, attrs.get("kind"), None, attrs.get("phase"))
+
+
+def classify_fields(
+    name: Optional[str],
+    kind: Optional[Any] = None,
+    component: Optional[Any] = None,
+    phase: Optional[Any] = None,
+) -> Phase:
+    """Same mapping as classify(), from the raw name/kind/component/phase values.
+
+    Used by columnar readers that never build Span objects.
+    """
+    if component is not None:
+        return Phase(component=str(component), phase=phase)
+
+    kind = str(kind or name or "").lower()
 
     if kind.startswith("retrieval"):
         return Phase(component="retriever")
     if kind.startswith("tool"):
         return Phase(component="tool")
     if kind.startswith("llm"):
-        phase = attrs.get("phase")
         if phase in ("prefill", "decode"):
             return Phase(component="llm", phase=str(phase))
         return Phase(component="llm")
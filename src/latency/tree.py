@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def span_tree(span_ids: Sequence[Hashable], parent_ids: Sequence[Optional[Hashable]]) -> Tuple[List[List[int]], List[int]]:
+    """Children lists (by row) and top-level rows for one trace.
+
+    Spans whose parent is missing from the trace are treated as top-level.
+    """
+    index: Dict[Hashable, int] = {sid: i for i, sid in enumerate(span_ids)}
+    children: List[List[int]] = [[] for _ in span_ids]
+    tops: List[int] = []
+    for i, p in enumerate(parent_ids):
+        j = index.get(p) if p is not None else None
+        if j is None or j == i:
+            tops.append(i)
+        else:
+            children[j].append(i)
+    return children, tops
+
+
+def exclusive_times(
+    children: List[List[int]], starts: Sequence[int], ends: Sequence[int]
+) -> List[int]:
+    """Self time per span: its duration minus the union of its children's intervals.
+
+    Children are clipped to the parent's interval, and concurrent children are
+    merged, so parallel fan-out is not subtracted twice.
+    """
+    out = [0] * len(children)
+    for i, kids in enumerate(children):
+        s, e = starts[i], ends[i]
+        if not kids:
+            out[i] = max(0, e - s)
+            continue
+        covered = 0
+        cur_s = cur_e = None
+        for k in sorted(kids, key=starts.__getitem__):
+            ks, ke = max(starts[k], s), min(ends[k], e)
+            if ke <= ks:
+                continue
+            if cur_e is None or ks > cur_e:
+                if cur_e is not None:
+                    covered += cur_e - cur_s
+                cur_s, cur_e = ks, ke
+            elif ke > cur_e:
+                cur_e = ke
+        if cur_e is not None:
+            covered += cur_e - cur_s
+        out[i] = max(0, e - s - covered)
+    return out
+
+
+def critical_path(
+    children: List[List[int]], starts: Sequence[int], ends: Sequence[int], root: int
+) -> List[int]:
+    """Time each span contributes to the critical path below ``root``.
+
+    Walks backwards from the root's end: repeatedly descends into the child
+    that finishes last before the cursor (clipped to the cursor), then moves
+    the cursor to that child's start. Gaps between chosen children count
+    for the parent. Contributions sum to the root's duration.
+    """
+    out = [0] * len(children)
+    stack = [(root, starts[root], ends[root])]
+    while stack:
+        i, lo, hi = stack.pop()
+        cursor = hi
+        for k in sorted(children[i], key=ends.__getitem__, reverse=True):
+            if cursor <= lo:
+                break
+            ks = max(starts[k], lo)
+            if ks >= cursor:
+                continue
+            ke = min(ends[k], cursor)
+            out[i] += cursor - ke
+            stack.append((k, ks, ke))
+            cursor = ks
+        if cursor > lo:
+            out[i] += cursor - lo
+    return out
+
+
+def attribute_trace(
+    span_ids: Sequence[Hashable],
+    parent_ids: Sequence[Optional[Hashable]],
+    starts: Sequence[int],
+    ends: Sequence[int],
+    root: int,
+) -> Tuple[List[int], List[int]]:
+    """(self time, critical-path time) per span of one trace, in ns.
+
+    ``ends`` must already substitute the start for unfinished spans.
+    O(n log n) in the number of spans.
+    """
+    children, _ = span_tree(span_ids, parent_ids)
+    return exclusive_times(children, starts, ends), critical_path(children, starts, ends, root)
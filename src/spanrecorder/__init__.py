@@ -2,11 +2,122 @@
 
 This package provides:
   - Span / Event model
-  - Async-safe context propagation via contextvars
+  - Async-safe context propagation via contextvars, across thread pools and
+    (W3C traceparent) process boundaries
+  - Offloading of large attribute values to a content-addressed blob store
+  - Shared-memory span ring for collecting spans from worker processes
   - In-memory SpanRecorder with a context-manager API
+  - Span processors / exporters (bounded, batching export off the request thread)
+  - OTLP/HTTP exporter (protobuf or JSON) and a fake collector for tests
+  - Head and tail sampling with per-trace decisions
 """
 
-from .span import Span, SpanEvent, SpanStatus
+from .span import NonRecordingSpan, Span, SpanContext, SpanEvent, SpanStatus
 from .recorder import SpanRecorder, new_trace_id
+from .processor import (
+    BatchSpanProcessor,
+    DropPolicy,
+    SimpleSpanProcessor,
+    SpanExporter,
+    SpanProcessor,
+    StoreExporter,
+)
+from .otlp import OTLPExportError, OTLPHttpSpanExporter
+from .blobs import (
+    BlobNotFound,
+    BlobResolver,
+    BlobStore,
+    MemoryBlobStore,
+    OffloadingExporter,
+    is_blob_ref,
+    offload_attributes,
+    resolve_blobs,
+)
+from .propagation import (
+    ContextExecutor,
+    attach,
+    extract,
+    format_traceparent,
+    inject,
+    parse_traceparent,
+    wrap_with_context,
+)
+from .shm_ring import (
+    RingHandle,
+    SharedRingExporter,
+    SharedSpanRing,
+    SpanRingCollector,
+    TracedCall,
+    flush_worker_spans,
+    install_span_ring,
+    submit_traced,
+    worker_recorder,
+)
+from .sampling import (
+    AlwaysOffSampler,
+    AlwaysOnSampler,
+    AnyTailSampler,
+    AttributeTraceSampler,
+    ErrorTraceSampler,
+    KeepErrorsSampler,
+    RateLimitingSampler,
+    RatioSampler,
+    Sampler,
+    SamplingDecision,
+    SlowTraceSampler,
+    TailSampler,
+)
 
-__all__ = ["Span", "SpanEvent", "SpanStatus", "SpanRecorder", "new_trace_id"]
+__all__ = [
+    "Span",
+    "SpanEvent",
+    "SpanStatus",
+    "SpanRecorder",
+    "new_trace_id",
+    "SpanProcessor",
+    "SpanExporter",
+    "SimpleSpanProcessor",
+    "BatchSpanProcessor",
+    "DropPolicy",
+    "StoreExporter",
+    "OTLPHttpSpanExporter",
+    "OTLPExportError",
+    "NonRecordingSpan",
+    "SpanContext",
+    "BlobStore",
+    "BlobNotFound",
+    "BlobResolver",
+    "MemoryBlobStore",
+    "OffloadingExporter",
+    "is_blob_ref",
+    "offload_attributes",
+    "resolve_blobs",
+    "ContextExecutor",
+    "wrap_with_context",
+    "inject",
+    "extract",
+    "attach",
+    "format_traceparent",
+    "parse_traceparent",
+    "SharedSpanRing",
+    "RingHandle",
+    "SharedRingExporter",
+    "SpanRingCollector",
+    "TracedCall",
+    "install_span_ring",
+    "worker_recorder",
+    "flush_worker_spans",
+    "submit_traced",
+    "Sampler",
+    "TailSampler",
+    "SamplingDecision",
+    "AlwaysOnSampler",
+    "AlwaysOffSampler",
+    "RatioSampler",
+    "RateLimitingSampler",
+    "KeepErrorsSampler",
+    "SlowTraceSampler",
+    "ErrorTraceSampler",
+    "AttributeTraceSampler",
+    "AnyTailSampler",
+]
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Protocol, Sequence, Tuple
+import hashlib
+import json
+import threading
+
+from .processor import SpanExporter
+from .span import Span
+
+# A large attribute value is replaced by {"$blob": <sha256 hex>, "size": n, "enc": "text"|"json"}.
+# Plain JSON, so references survive to_dict(), JSONL and segment files unchanged.
+BLOB_KEY = "$blob"
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+class BlobStore(Protocol):
+    """Content-addressed byte store: put() returns the sha256 hex digest of ``data``."""
+
+    def put(self, data: bytes) -> str: ...
+    def get(self, digest: str) -> bytes: ...
+
+
+class MemoryBlobStore:
+    """In-process BlobStore (tests, short-lived scripts)."""
+
+    def __init__(self) -> None:
+        self._blobs: Dict[str, bytes] = {}
+        self.writes = 0
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self._blobs:
+            self._blobs[digest] = data
+            self.writes += 1
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        try:
+            return self._blobs[digest]
+        except KeyError:
+            raise BlobNotFound(digest) from None
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+
+def is_blob_ref(value: Any) -> bool:
+    return value.__class__ is dict and BLOB_KEY in value
+
+
+def _encode(value: Any) -> tuple:
+    if value.__class__ is str:
+        return value.encode("utf-8"), "text"
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"), "json"
+
+
+def _ref(blobs: BlobStore, data: bytes, enc: str) -> Dict[str, Any]:
+    return {BLOB_KEY: blobs.put(data), "size": len(data), "enc": enc}
+
+
+def offload_value(value: Any, blobs: BlobStore, max_inline_bytes: int, min_blob_bytes: int = 256) -> Any:
+    """``value``, or a blob reference if its encoding is over ``max_inline_bytes``.
+
+    Oversized lists (e.g. retrieved passages) are offloaded element by
+    element first, so items shared between traces are stored once; the list
+    itself is offloaded only if the references still do not fit.
+    """
+    if value is None or value.__class__ in (bool, int, float):
+        return value
+    # Cheap bound for strings: UTF-8 takes at most 4 bytes per character.
+    if value.__class__ is str and len(value) * 4 <= max_inline_bytes:
+        return value
+    data, enc = _encode(value)
+    if len(data) <= max_inline_bytes:
+        return value
+    if value.__class__ is list:
+        items = []
+        for item in value:
+            if is_blob_ref(item):
+                items.append(item)
+                continue
+            item_data, item_enc = _encode(item)
+            items.append(_ref(blobs, item_data, item_enc) if len(item_data) >= min_blob_bytes else item)
+        data, enc = _encode(items)
+        if len(data) <= max_inline_bytes:
+            return items
+    return _ref(blobs, data, enc)
+
+
+def offload_attributes(
+    span: Span, blobs: BlobStore, max_inline_bytes: int, min_blob_bytes: int = 256
+) -> Tuple[Span, int]:
+    """``span`` with oversized attribute values replaced by blob references, and how many.
+
+    The span itself is never modified (other processors and get_spans()
+    still see the values): if anything is offloaded, a shallow copy with a
+    new attributes dict is returned.
+    """
+    attrs = span._attributes
+    if not attrs:
+        return span, 0
+    new_attrs = None
+    n = 0
+    for k, v in attrs.items():
+        if v.__class__ in (bool, int, float) or v is None or is_blob_ref(v):
+            continue
+        new = offload_value(v, blobs, max_inline_bytes, min_blob_bytes)
+        if new is not v:
+            if new_attrs is None:
+                new_attrs = dict(attrs)
+            new_attrs[k] = new
+            n += 1
+    if new_attrs is None:
+        return span, 0
+    copy = Span(
+        name=span.name,
+        trace_id=span._trace_id,
+        span_id=span._span_id,
+        parent_id=span._parent_id,
+        start_ns=span.start_ns,
+        end_ns=span.end_ns,
+        attributes=new_attrs,
+        events=span._events,
+        exception_type=span.exception_type,
+        exception_message=span.exception_message,
+    )
+    copy._status = span._status
+    return copy, n
+
+
+class BlobResolver:
+    """Resolves blob references against a BlobStore, caching recently used blobs.
+
+    Popular documents are referenced by many traces; the cache keeps them
+    decoded so a batch of judge prompts reads each one once.
+    """
+
+    def __init__(self, blobs: BlobStore, *, cache_size: int = 1024) -> None:
+        self.blobs = blobs
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, ref: Dict[str, Any]) -> Any:
+        digest = ref[BLOB_KEY]
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+        data = self.blobs.get(digest)
+        value = data.decode("utf-8") if ref.get("enc") == "text" else json.loads(data)
+        with self._lock:
+            self._cache[digest] = value
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+    def resolve(self, value: Any) -> Any:
+        """``value`` with every blob reference (at any depth) replaced by its content."""
+        cls = value.__class__
+        if cls is dict:
+            if BLOB_KEY in value:
+                return self.resolve(self._load(value))
+            return {k: self.resolve(v) for k, v in value.items()}
+        if cls is list:
+            return [self.resolve(v) for v in value]
+        return value
+
+
+def resolve_blobs(value: Any, blobs: BlobStore) -> Any:
+    return BlobResolver(blobs, cache_size=0).resolve(value)
+
+
+class OffloadingExporter:
+    """SpanExporter wrapper that moves large attribute values to a BlobStore before exporting.
+
+    Values whose JSON (or UTF-8) encoding exceeds ``max_inline_bytes`` are
+    written once to ``blobs`` and replaced by a reference in a copy of the
+    span; the wrapped exporter only ever sees the small form, while the
+    recorder and other processors keep the original values. Behind a
+    BatchSpanProcessor the hashing and blob writes run on the export worker,
+    not on the request thread.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        blobs: BlobStore,
+        *,
+        max_inline_bytes: int = 1024,
+        min_blob_bytes: int = 256,
+    ) -> None:
+        if max_inline_bytes <= 0:
+            raise ValueError("max_inline_bytes must be positive")
+        self.exporter = exporter
+        self.blobs = blobs
+        self.max_inline_bytes = max_inline_bytes
+        self.min_blob_bytes = min_blob_bytes
+        self.offloaded_values = 0
+
+    def export(self, spans: Sequence[Span]) -> None:
+        out: List[Span] = []
+        for s in spans:
+            s, n = offload_attributes(s, self.blobs, self.max_inline_bytes, self.min_blob_bytes)
+            self.offloaded_values += n
+            out.append(s)
+        self.exporter.export(out)
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
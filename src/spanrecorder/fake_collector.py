@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import gzip
+import json
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+@dataclass
+class CollectedRequest:
+    path: str
+    headers: Dict[str, str]
+    body: bytes  # decompressed
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+    client_port: int = 0
+
+
+# -------------------------
+# Minimal decoding of what OTLPHttpSpanExporter sends
+# -------------------------
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    shift = v = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            return v, pos
+        shift += 7
+
+
+def _fields(buf: bytes) -> List[Tuple[int, Any]]:
+    out = []
+    pos = 0
+    while pos < len(buf):
+        key, pos = _read_varint(buf, pos)
+        field_no, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire == 1:
+            value = buf[pos : pos + 8]
+            pos += 8
+        elif wire == 2:
+            n, pos = _read_varint(buf, pos)
+            value = buf[pos : pos + n]
+            pos += n
+        elif wire == 5:
+            value = buf[pos : pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire}")
+        out.append((field_no, value))
+    return out
+
+
+def _pb_any(buf: bytes) -> Any:
+    for f, v in _fields(buf):
+        if f == 1:
+            return v.decode("utf-8")
+        if f == 2:
+            return bool(v)
+        if f == 3:
+            return v - (1 << 64) if v >= 1 << 63 else v
+        if f == 4:
+            return struct.unpack("<d", v)[0]
+        if f == 5:
+            return [_pb_any(x) for _, x in _fields(v)]
+        if f == 6:
+            return dict(_pb_kv(x) for _, x in _fields(v))
+        if f == 7:
+            return v
+    return None
+
+
+def _pb_kv(buf: bytes) -> Tuple[str, Any]:
+    key, value = "", None
+    for f, v in _fields(buf):
+        if f == 1:
+            key = v.decode("utf-8")
+        elif f == 2:
+            value = _pb_any(v)
+    return key, value
+
+
+def decode_protobuf_spans(body: bytes) -> List[Dict[str, Any]]:
+    """Spans of an ExportTraceServiceRequest as flat dicts."""
+    spans = []
+    for _, rs in _fields(body):
+        for f, ss in _fields(rs):
+            if f != 2:
+                continue
+            for g, raw in _fields(ss):
+                if g != 2:
+                    continue
+                d: Dict[str, Any] = {"attributes": {}, "events": [], "parent_span_id": None, "status_code": 0}
+                for h, v in _fields(raw):
+                    if h == 1:
+                        d["trace_id"] = v.hex()
+                    elif h == 2:
+                        d["span_id"] = v.hex()
+                    elif h == 4:
+                        d["parent_span_id"] = v.hex()
+                    elif h == 5:
+                        d["name"] = v.decode("utf-8")
+                    elif h == 7:
+                        d["start_time_unix_nano"] = struct.unpack("<Q", v)[0]
+                    elif h == 8:
+                        d["end_time_unix_nano"] = struct.unpack("<Q", v)[0]
+                    elif h == 9:
+                        k, val = _pb_kv(v)
+                        d["attributes"][k] = val
+                    elif h == 11:
+                        names = [x.decode("utf-8") for i, x in _fields(v) if i == 2]
+                        d["events"].append({"name": names[0] if names else ""})
+                    elif h == 15:
+                        for i, x in _fields(v):
+                            if i == 3:
+                                d["status_code"] = x
+                spans.append(d)
+    return spans
+
+
+def _json_value(v: Dict[str, Any]) -> Any:
+    if "intValue" in v:
+        return int(v["intValue"])
+    if "arrayValue" in v:
+        return [_json_value(x) for x in v["arrayValue"].get("values", [])]
+    if "kvlistValue" in v:
+        return {kv["key"]: _json_value(kv["value"]) for kv in v["kvlistValue"].get("values", [])}
+    for key in ("stringValue", "boolValue", "doubleValue", "bytesValue"):
+        if key in v:
+            return v[key]
+    return None
+
+
+def decode_json_spans(body: bytes) -> List[Dict[str, Any]]:
+    spans = []
+    for rs in json.loads(body).get("resourceSpans", []):
+        for ss in rs.get("scopeSpans", []):
+            for s in ss.get("spans", []):
+                spans.append(
+                    {
+                        "trace_id": s["traceId"],
+                        "span_id": s["spanId"],
+                        "parent_span_id": s.get("parentSpanId"),
+                        "name": s["name"],
+                        "start_time_unix_nano": int(s["startTimeUnixNano"]),
+                        "end_time_unix_nano": int(s["endTimeUnixNano"]),
+                        "attributes": {kv["key"]: _json_value(kv["value"]) for kv in s.get("attributes", [])},
+                        "events": [{"name": e["name"]} for e in s.get("events", [])],
+                        "status_code": s.get("status", {}).get("code", 0),
+                    }
+                )
+    return spans
+
+
+# -------------------------
+# Server
+# -------------------------
+
+
+class FakeOTLPCollector:
+    """In-process OTLP/HTTP trace collector for tests.
+
+    Listens on 127.0.0.1 (random port by default), decodes JSON and
+    protobuf bodies (gzip or not) and keeps every request in ``requests``.
+    respond_with() queues canned responses (e.g. 429 with Retry-After) and
+    ``delay_s`` makes it slow. Usable as a context manager.
+    """
+
+    def __init__(self, port: int = 0, *, delay_s: float = 0.0) -> None:
+        self.delay_s = delay_s
+        self.requests: List[CollectedRequest] = []
+        self._responses: Deque[Tuple[int, Dict[str, str]]] = deque()
+        self._lock = threading.Lock()
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_POST(self) -> None:  # noqa: N802
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                collector._handle(self, body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-otlp-collector", daemon=True)
+        self._thread.start()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/traces"
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s for r in self.requests for s in r.spans]
+
+    @property
+    def connections(self) -> int:
+        """Distinct client connections seen (by client port)."""
+        with self._lock:
+            return len({r.client_port for r in self.requests})
+
+    def respond_with(self, status: int, headers: Optional[Dict[str, str]] = None, *, times: int = 1) -> None:
+        with self._lock:
+            for _ in range(times):
+                self._responses.append((status, dict(headers or {})))
+
+    def _handle(self, handler: BaseHTTPRequestHandler, body: bytes) -> None:
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        with self._lock:
+            status, headers = self._responses.popleft() if self._responses else (200, {})
+        if 200 <= status < 300:
+            if handler.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            ctype = handler.headers.get("Content-Type", "")
+            spans = decode_json_spans(body) if "json" in ctype else decode_protobuf_spans(body)
+            req = CollectedRequest(handler.path, dict(handler.headers), body, spans, handler.client_address[1])
+            with self._lock:
+                self.requests.append(req)
+        payload = b"{}" if 200 <= status < 300 else b'{"message":"unavailable"}'
+        handler.send_response(status)
+        for k, v in headers.items():
+            handler.send_header(k, v)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOTLPCollector":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import http.client
+import json
+import queue
+import random
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from .span import Span, SpanStatus
+
+# OTLP status codes (same ints Span uses internally).
+_STATUS_CODE = {SpanStatus.UNSET: 0, SpanStatus.OK: 1, SpanStatus.ERROR: 2}
+_SPAN_KIND_INTERNAL = 1
+_RETRYABLE_STATUS = frozenset((429, 502, 503, 504))
+
+SCOPE_NAME = "evaltrace.spanrecorder"
+
+
+def monotonic_to_unix_offset_ns() -> int:
+    """Add to Span timestamps (perf_counter_ns) to get Unix-epoch nanoseconds."""
+    return time.time_ns() - time.perf_counter_ns()
+
+
+def _id_bytes(value: str, size: int) -> bytes:
+    """OTLP ids are 16 (trace) / 8 (span) bytes; other ids are hashed to that size."""
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        raw = b""
+    return raw if len(raw) == size else hashlib.blake2b(value.encode("utf-8"), digest_size=size).digest()
+
+
+# -------------------------
+# OTLP/JSON
+# -------------------------
+
+
+def _json_any(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_json_any(v) for v in value]}}
+    if isinstance(value, dict):
+        return {"kvlistValue": {"values": _json_attrs(value)}}
+    if isinstance(value, bytes):
+        return {"bytesValue": base64.b64encode(value).decode("ascii")}
+    return {"stringValue": str(value)}
+
+
+def _json_attrs(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": str(k), "value": _json_any(v)} for k, v in attrs.items()]
+
+
+def _events(span: Span) -> List[Tuple[int, str, Dict[str, Any]]]:
+    out = [(e.ts_ns, e.name, e.attributes) for e in (span._events or ())]
+    if span.exception_type is not None:
+        out.append(
+            (
+                span.end_ns if span.end_ns is not None else span.start_ns,
+                "exception",
+                {"exception.type": span.exception_type, "exception.message": span.exception_message or ""},
+            )
+        )
+    return out
+
+
+def encode_json(
+    spans: Sequence[Span], resource: Dict[str, Any], *, offset_ns: int = 0, scope: str = SCOPE_NAME
+) -> bytes:
+    """ExportTraceServiceRequest as OTLP/JSON (hex ids, int64 as strings)."""
+    out = []
+    for s in spans:
+        end = s.end_ns if s.end_ns is not None else s.start_ns
+        d: Dict[str, Any] = {
+            "traceId": _id_bytes(s.trace_id, 16).hex(),
+            "spanId": _id_bytes(s.span_id, 8).hex(),
+            "name": s.name,
+            "kind": _SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(s.start_ns + offset_ns),
+            "endTimeUnixNano": str(end + offset_ns),
+            "attributes": _json_attrs(s._attributes or {}),
+            "events": [
+                {"timeUnixNano": str(ts + offset_ns), "name": name, "attributes": _json_attrs(attrs)}
+                for ts, name, attrs in _events(s)
+            ],
+            "status": {"code": _STATUS_CODE[s.status]},
+        }
+        if s.parent_id is not None:
+            d["parentSpanId"] = _id_bytes(s.parent_id, 8).hex()
+        if s.status is SpanStatus.ERROR and s.exception_message:
+            d["status"]["message"] = s.exception_message
+        out.append(d)
+    body = {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _json_attrs(resource)},
+                "scopeSpans": [{"scope": {"name": scope}, "spans": out}],
+            }
+        ]
+    }
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# -------------------------
+# OTLP/protobuf (hand-encoded wire format; no protobuf dependency)
+# -------------------------
+
+
+def _varint(v: int) -> bytes:
+    v &= (1 << 64) - 1  # negative int64 -> two's complement, 10 bytes
+    out = bytearray()
+    while v >= 0x80:
+        out.append((v & 0x7F) | 0x80)
+        v >>= 7
+    out.append(v)
+    return bytes(out)
+
+
+def _tag(field: int, wire: int) -> bytes:
+    return _varint((field << 3) | wire)
+
+
+def _len_field(field: int, data: bytes) -> bytes:
+    return _tag(field, 2) + _varint(len(data)) + data
+
+
+def _str_field(field: int, s: str) -> bytes:
+    return _len_field(field, s.encode("utf-8"))
+
+
+def _fixed64_field(field: int, v: int) -> bytes:
+    return _tag(field, 1) + struct.pack("<Q", v)
+
+
+def _pb_any(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _tag(2, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _tag(3, 0) + _varint(value)
+    if isinstance(value, float):
+        return _tag(4, 1) + struct.pack("<d", value)
+    if isinstance(value, str):
+        return _str_field(1, value)
+    if isinstance(value, (list, tuple)):
+        return _len_field(5, b"".join(_len_field(1, _pb_any(v)) for v in value))
+    if isinstance(value, dict):
+        return _len_field(6, b"".join(_len_field(1, _pb_kv(k, v)) for k, v in value.items()))
+    if isinstance(value, bytes):
+        return _len_field(7, value)
+    return _str_field(1, str(value))
+
+
+def _pb_kv(key: Any, value: Any) -> bytes:
+    return _str_field(1, str(key)) + _len_field(2, _pb_any(value))
+
+
+def _pb_attrs(field: int, attrs: Dict[str, Any]) -> bytes:
+    return b"".join(_len_field(field, _pb_kv(k, v)) for k, v in attrs.items())
+
+
+def _pb_span(s: Span, offset_ns: int) -> bytes:
+    end = s.end_ns if s.end_ns is not None else s.start_ns
+    parts = [
+        _len_field(1, _id_bytes(s.trace_id, 16)),
+        _len_field(2, _id_bytes(s.span_id, 8)),
+    ]
+    if s.parent_id is not None:
+        parts.append(_len_field(4, _id_bytes(s.parent_id, 8)))
+    parts += [
+        _str_field(5, s.name),
+        _tag(6, 0) + _varint(_SPAN_KIND_INTERNAL),
+        _fixed64_field(7, s.start_ns + offset_ns),
+        _fixed64_field(8, end + offset_ns),
+        _pb_attrs(9, s._attributes or {}),
+    ]
+    for ts, name, attrs in _events(s):
+        parts.append(_len_field(11, _fixed64_field(1, ts + offset_ns) + _str_field(2, name) + _pb_attrs(3, attrs)))
+    status = b""
+    if s.status is SpanStatus.ERROR and s.exception_message:
+        status += _str_field(2, s.exception_message)
+    code = _STATUS_CODE[s.status]
+    if code:
+        status += _tag(3, 0) + _varint(code)
+    parts.append(_len_field(15, status))
+    return b"".join(parts)
+
+
+def encode_protobuf(
+    spans: Sequence[Span], resource: Dict[str, Any], *, offset_ns: int = 0, scope: str = SCOPE_NAME
+) -> bytes:
+    """ExportTraceServiceRequest in protobuf wire format."""
+    scope_spans = _len_field(1, _str_field(1, scope))
+    scope_spans += b"".join(_len_field(2, _pb_span(s, offset_ns)) for s in spans)
+    resource_spans = _len_field(1, _pb_attrs(1, resource)) + _len_field(2, scope_spans)
+    return _len_field(1, resource_spans)
+
+
+# -------------------------
+# Transport
+# -------------------------
+
+
+class OTLPExportError(Exception):
+    """A batch could not be delivered (after retries, or rejected by the collector)."""
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, reused across exports."""
+
+    def __init__(self, scheme: str, host: str, port: Optional[int], size: int, timeout_s: float) -> None:
+        self._cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self.host = host
+        self.port = port
+        self.timeout_s = timeout_s
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=size)
+
+    def get(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """A connection and whether it was reused (it may have been closed by the server)."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self.new(), False
+
+    def new(self) -> http.client.HTTPConnection:
+        return self._cls(self.host, self.port, timeout=self.timeout_s)
+
+    def put(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _retry_after_s(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None  # HTTP-date form: fall back to our own backoff
+
+
+class OTLPHttpSpanExporter:
+    """SpanExporter that POSTs spans to an OTLP/HTTP collector (``/v1/traces``).
+
+    Meant to run behind BatchSpanProcessor, which batches by size and time
+    off the request thread and bounds memory with ``max_queue_size``; this
+    exporter only ever holds the batch it is sending.
+
+    - ``encoding``: ``"protobuf"`` (default) or ``"json"``; gzip unless
+      ``compression=None``
+    - keep-alive connections are pooled (``max_connections``) and reused
+    - 429/502/503/504 and connection errors are retried with full-jitter
+      backoff, honoring ``Retry-After``, until ``max_retries`` or the
+      ``export_timeout_s`` deadline; then OTLPExportError is raised and the
+      processor counts the batch as failed
+    - Span timestamps are monotonic, so they are shifted by an offset to
+      Unix time taken at construction
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        *,
+        encoding: str = "protobuf",
+        compression: Optional[str] = "gzip",
+        headers: Optional[Dict[str, str]] = None,
+        resource: Optional[Dict[str, Any]] = None,
+        timeout_s: float = 10.0,
+        export_timeout_s: float = 30.0,
+        max_retries: int = 5,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 5.0,
+        max_connections: int = 2,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if encoding not in ("protobuf", "json"):
+            raise ValueError(f"Unknown encoding: {encoding!r}")
+        if compression not in (None, "gzip"):
+            raise ValueError(f"Unknown compression: {compression!r}")
+        url = urlsplit(endpoint)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported endpoint: {endpoint!r}")
+        self.endpoint = endpoint
+        self.path = url.path or "/v1/traces"
+        self.encoding = encoding
+        self.compression = compression
+        self.resource = resource if resource is not None else {"service.name": "evaltrace"}
+        self.export_timeout_s = export_timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.offset_ns = monotonic_to_unix_offset_ns()
+        self._sleep = sleep
+        self._rng = random.Random()
+        self._pool = _ConnectionPool(url.scheme, url.hostname or "localhost", url.port, max_connections, timeout_s)
+        self._headers = {
+            "Content-Type": "application/x-protobuf" if encoding == "protobuf" else "application/json",
+            **(headers or {}),
+        }
+        if compression == "gzip":
+            self._headers["Content-Encoding"] = "gzip"
+        self._lock = threading.Lock()
+        self.exported_spans = 0
+        self.retries = 0
+        self.throttled = 0
+        self._shutdown = False
+
+    def encode(self, spans: Sequence[Span]) -> bytes:
+        encode = encode_protobuf if self.encoding == "protobuf" else encode_json
+        body = encode(spans, self.resource, offset_ns=self.offset_ns)
+        return gzip.compress(body, compresslevel=5) if self.compression == "gzip" else body
+
+    def export(self, spans: Sequence[Span]) -> None:
+        if self._shutdown:
+            raise OTLPExportError("Exporter is shut down")
+        if not spans:
+            return
+        body = self.encode(spans)
+        deadline = time.monotonic() + self.export_timeout_s
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                status, retry_after, detail = self._post(body)
+            except (OSError, http.client.HTTPException) as e:
+                status, retry_after, detail = None, None, f"{type(e).__name__}: {e}"
+            if status is not None and 200 <= status < 300:
+                with self._lock:
+                    self.exported_spans += len(spans)
+                return
+            if status is not None and status not in _RETRYABLE_STATUS:
+                raise OTLPExportError(f"Collector rejected batch: HTTP {status} {detail}")
+            if status in (429, 503):
+                with self._lock:
+                    self.throttled += 1
+            cap = min(self.backoff_max_s, self.backoff_base_s * 2 ** (attempt - 1))
+            wait = retry_after if retry_after is not None else self._rng.uniform(0, cap)
+            if attempt > self.max_retries or time.monotonic() + wait > deadline:
+                raise OTLPExportError(f"Giving up after {attempt} attempts: {detail or f'HTTP {status}'}")
+            with self._lock:
+                self.retries += 1
+            self._sleep(wait)
+
+    def _post(self, body: bytes) -> Tuple[int, Optional[float], str]:
+        conn, reused = self._pool.get()
+        try:
+            try:
+                conn.request("POST", self.path, body=body, headers=self._headers)
+                resp = conn.getresponse()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                if not reused:
+                    raise
+                # Idle keep-alive connection closed by the server: retry once on a fresh one.
+                conn.close()
+                conn = self._pool.new()
+                conn.request("POST", self.path, body=body, headers=self._headers)
+                resp = conn.getresponse()
+            detail = resp.read(4096).decode("utf-8", "replace")
+            resp.read()  # drain so the connection can be reused
+        except BaseException:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._pool.put(conn)
+        return resp.status, _retry_after_s(resp.getheader("Retry-After")), detail
+
+    def shutdown(self) -> None:
+        self._shutdown = True
+        self._pool.close()
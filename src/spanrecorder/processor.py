@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Deque, List, Optional, Protocol, Sequence, Union
+import threading
+
+from .span import Span
+
+
+class SpanExporter(Protocol):
+    """Destination for finished spans (file, collector, ...)."""
+
+    def export(self, spans: Sequence[Span]) -> None: ...
+    def shutdown(self) -> None: ...
+
+
+class SpanProcessor(Protocol):
+    """Hook invoked by SpanRecorder when spans start and end."""
+
+    def on_start(self, span: Span) -> None: ...
+    def on_end(self, span: Span) -> None: ...
+    def force_flush(self, timeout: Optional[float] = None) -> bool: ...
+    def shutdown(self) -> None: ...
+
+
+@dataclass
+class StoreExporter:
+    """Adapt any store with ``write(spans)`` (e.g. JsonlTraceStore) to SpanExporter."""
+
+    store: Any
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.store.write(spans)
+
+    def shutdown(self) -> None:
+        pass
+
+
+class SimpleSpanProcessor:
+    """Export every span synchronously, on the thread that ended it.
+
+    Only suitable for tests and short-lived scripts; use BatchSpanProcessor
+    in services so the request thread never waits on the exporter.
+    """
+
+    def __init__(self, exporter: SpanExporter) -> None:
+        self.exporter = exporter
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        self.exporter.export([span])
+
+    def force_flush(self, timeout: Optional[float] = None) -> bool:
+        return True
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+
+class DropPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
+class BatchSpanProcessor:
+    """Bounded queue of finished spans drained in batches by a worker thread.
+
+    - on_end() only appends to a ring buffer; it never touches the exporter.
+    - When the queue is full, either the oldest queued span or the incoming
+      span is discarded (``drop_policy``) and ``dropped_spans`` is incremented.
+    - The worker exports as soon as ``max_batch_size`` spans are queued, or
+      every ``flush_interval_s`` seconds otherwise.
+    - Exporter exceptions are swallowed (the batch is lost) and counted in
+      ``export_failures`` so a broken sink cannot kill the worker.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        *,
+        max_queue_size: int = 2048,
+        max_batch_size: int = 512,
+        flush_interval_s: float = 1.0,
+        drop_policy: Union[DropPolicy, str] = DropPolicy.DROP_OLDEST,
+    ) -> None:
+        if max_queue_size <= 0:
+            raise ValueError("max_queue_size must be positive")
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        if flush_interval_s <= 0:
+            raise ValueError("flush_interval_s must be positive")
+
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = min(max_batch_size, max_queue_size)
+        self.flush_interval_s = flush_interval_s
+        self.drop_policy = DropPolicy(drop_policy)
+
+        self.dropped_spans = 0
+        self.exported_spans = 0
+        self.export_failures = 0
+
+        self._queue: Deque[Span] = deque()
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._flush_requested = 0
+        self._flush_done = 0
+
+        self._worker = threading.Thread(
+            target=self._run, name="evaltrace-span-exporter", daemon=True
+        )
+        self._worker.start()
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        with self._cond:
+            if self._shutdown:
+                self.dropped_spans += 1
+                return
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped_spans += 1
+                if self.drop_policy is DropPolicy.DROP_NEWEST:
+                    return
+                self._queue.popleft()
+            self._queue.append(span)
+            if len(self._queue) == self.max_batch_size:
+                self._cond.notify()
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._queue)
+
+    def force_flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far has been handed to the exporter."""
+        with self._cond:
+            self._flush_requested += 1
+            target = self._flush_requested
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: self._flush_done >= target or not self._worker.is_alive(),
+                timeout,
+            ) and not self._queue
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Flush what is queued, stop the worker and shut the exporter down (idempotent)."""
+        with self._cond:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        self.exporter.shutdown()
+
+    def _next_batch(self) -> List[Span]:
+        n = min(len(self._queue), self.max_batch_size)
+        return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if (
+                    not self._shutdown
+                    and len(self._queue) < self.max_batch_size
+                    and self._flush_requested == self._flush_done
+                ):
+                    self._cond.wait(self.flush_interval_s)
+                flush_target = self._flush_requested
+                stopping = self._shutdown
+                batch = self._next_batch()
+
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                    self.exported_spans += len(batch)
+                except Exception:
+                    self.export_failures += 1
+
+            with self._cond:
+                if not self._queue:
+                    if self._flush_done < flush_target:
+                        self._flush_done = flush_target
+                        self._cond.notify_all()
+                    if stopping:
+                        return
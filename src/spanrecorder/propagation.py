@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, MutableMapping, Optional, TypeVar, Union
+import contextvars
+import functools
+import re
+
+from .recorder import _current_span_var
+from .span import NonRecordingSpan, Span, SpanContext
+
+T = TypeVar("T")
+
+TRACEPARENT = "traceparent"
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+
+
+# -------------------------
+# W3C trace context
+# -------------------------
+
+
+def format_traceparent(span: Union[Span, NonRecordingSpan, SpanContext]) -> Optional[str]:
+    """``00-<trace-id>-<parent-id>-<flags>`` for ``span``, or None if it has no usable ids.
+
+    Unsampled traces have no span id of their own, so the header carries a
+    placeholder parent id with the sampled flag cleared; downstream services
+    then keep the trace unrecorded.
+    """
+    trace_id = span.trace_id
+    if len(trace_id) != 32:
+        return None
+    if not span.is_recording:
+        return f"00-{trace_id}-{'0' * 15}1-00"
+    span_id = span.span_id
+    if span_id is None or len(span_id) != 16:
+        return None
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def parse_traceparent(value: str) -> Optional[SpanContext]:
+    """SpanContext from a ``traceparent`` header; None if it is malformed."""
+    m = _TRACEPARENT_RE.match(value.strip().lower())
+    if m is None:
+        return None
+    version, trace_id, span_id, flags, rest = m.groups()
+    # Version ff is forbidden; version 00 has nothing after the flags.
+    if version == "ff" or (version == "00" and rest):
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
+
+
+def inject(
+    carrier: Optional[MutableMapping[str, str]] = None,
+    span: Union[Span, NonRecordingSpan, SpanContext, None] = None,
+) -> MutableMapping[str, str]:
+    """Write the ``traceparent`` of ``span`` (default: the current span) into ``carrier``.
+
+    ``carrier`` is any str mapping (HTTP headers, a message's metadata, a
+    dict passed to a worker); a new dict is created if omitted. Without a
+    current span the carrier is returned unchanged.
+    """
+    if carrier is None:
+        carrier = {}
+    if span is None:
+        span = _current_span_var.get()
+    if span is not None:
+        value = format_traceparent(span)
+        if value is not None:
+            carrier[TRACEPARENT] = value
+    return carrier
+
+
+def extract(carrier: Optional[Dict[str, Any]]) -> Optional[SpanContext]:
+    """The remote parent carried by ``carrier`` (header names are case-insensitive)."""
+    if not carrier:
+        return None
+    value = carrier.get(TRACEPARENT)
+    if value is None:
+        for k, v in carrier.items():
+            if k.lower() == TRACEPARENT:
+                value = v
+                break
+    if not isinstance(value, str):
+        return None
+    return parse_traceparent(value)
+
+
+@contextmanager
+def attach(parent: Union[Span, NonRecordingSpan, SpanContext, None]) -> Iterator[None]:
+    """Make ``parent`` the current span for the block (no-op for None).
+
+    Spans started inside become its children, whichever recorder starts
+    them::
+
+        with attach(extract(request.headers)):
+            with recorder.start_span("rerank"):
+                ...
+    """
+    if parent is None:
+        yield
+        return
+    token = _current_span_var.set(parent)
+    try:
+        yield
+    finally:
+        _current_span_var.reset(token)
+
+
+# -------------------------
+# Thread pools
+# -------------------------
+
+
+def wrap_with_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """``fn`` bound to a copy of the caller's context (current span included).
+
+    For callbacks handed to thread pools, schedulers or ``loop.call_soon``
+    from threads, which otherwise run in the worker's own (empty) context.
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> T:
+        return ctx.run(fn, *args, **kwargs)
+
+    return run
+
+
+class ContextExecutor(Executor):
+    """Executor wrapper that runs every task in a copy of the submitter's context.
+
+    Wraps any thread-based executor so spans started in tasks (including
+    ``map()``) are children of the span that was current at submit time::
+
+        pool = ContextExecutor(ThreadPoolExecutor(8))
+        with recorder.start_span("retrieve"):
+            docs = list(pool.map(search_shard, shards))
+
+    Contexts cannot cross process boundaries; for process pools use
+    spanrecorder.shm_ring.submit_traced() (traceparent + shared-memory
+    collection).
+    """
+
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        self.executor = executor if executor is not None else ThreadPoolExecutor()
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> "Future[T]":
+        return self.executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
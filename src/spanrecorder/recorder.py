@@ -1,24 +1,26 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
 import contextvars
-import uuid
+import threading
 
-from .span import Span, SpanStatus
+from .processor import SpanProcessor
+from .sampling import ErrorTraceSampler, Sampler, SamplingDecision, TailSampler
+from .span import NonRecordingSpan, Span, SpanContext, SpanStatus, _ids
 
 
-_current_span_var: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+_current_span_var: contextvars.ContextVar[Optional[Union[Span, NonRecordingSpan, SpanContext]]] = contextvars.ContextVar(
     "evaltrace_current_span",
     default=None,
 )
 
 
 def new_trace_id() -> str:
-    return uuid.uuid4().hex
+    return "%032x" % _ids.trace_id()
 
 
-@dataclass
 class SpanHandle:
     """Context manager returned by SpanRecorder.start_span(...).
 
@@ -27,9 +29,12 @@ class SpanHandle:
             ...
     """
 
-    recorder: "SpanRecorder"
-    span: Span
-    _token: Optional[contextvars.Token] = None
+    __slots__ = ("recorder", "span", "_token")
+
+    def __init__(self, recorder: "SpanRecorder", span: Span) -> None:
+        self.recorder = recorder
+        self.span = span
+        self._token: Optional[contextvars.Token] = None
 
     def __enter__(self) -> Span:
         self._token = _current_span_var.set(self.span)
@@ -53,19 +58,99 @@ class SpanHandle:
         return False
 
 
+class NonRecordingSpanHandle:
+    """Context manager for unsampled traces: only maintains the current-span context."""
+
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: NonRecordingSpan) -> None:
+        self.span = span
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> NonRecordingSpan:
+        self._token = _current_span_var.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self._token is not None:
+            _current_span_var.reset(self._token)
+        return False
+
+
+@dataclass
+class _PendingTrace:
+    """Spans of a trace buffered until its root ends and the tail sampler decides."""
+
+    root: Span
+    decision: SamplingDecision
+    started: List[Span] = field(default_factory=list)
+    spans: List[Span] = field(default_factory=list)  # ended
+
+
 class SpanRecorder:
-    """Minimal in-memory recorder for EvalTrace.
+    """Minimal recorder for EvalTrace.
 
     Core API:
-      - start_span(name, attrs=None, trace_id=None) -> context manager
+      - start_span(name, attrs=None, trace_id=None, parent=None) -> context manager
       - current_span() -> Span | None
+      - ingest(spans) records spans finished elsewhere (e.g. worker processes)
       - get_spans() -> List[Span]
       - to_dicts() -> List[dict]
       - reset() clears stored spans
+      - force_flush() / shutdown() drive the attached span processors
+
+    Spans are kept in memory (for get_spans()) unless ``keep_spans=False``;
+    long-running services should disable that and attach a
+    BatchSpanProcessor so memory stays bounded by the processor's queue.
+
+    Sampling:
+      - ``sampler`` (head) decides when a root span is created. Dropped traces
+        get a shared NonRecordingSpan; its children inherit it through the
+        current-span context, so a trace is recorded entirely or not at all.
+      - ``tail_sampler`` buffers each recorded trace until its root ends and
+        forwards it to the processors only if accepted. RECORD_ONLY traces are
+        always buffered and, without a tail sampler, kept only on ERROR.
+      - A remote parent (SpanContext, see spanrecorder.propagation) keeps its
+        sampling decision; the local span under it is treated as a root for
+        tail sampling.
+      - At most ``max_pending_traces`` traces are buffered; beyond that the
+        oldest is discarded and counted in ``dropped_traces``.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        processors: Optional[Sequence[SpanProcessor]] = None,
+        keep_spans: bool = True,
+        sampler: Optional[Sampler] = None,
+        tail_sampler: Optional[TailSampler] = None,
+        max_pending_traces: int = 10_000,
+    ) -> None:
         self._spans: List[Span] = []
+        self._processors: List[SpanProcessor] = list(processors or ())
+        self._keep_spans = keep_spans
+        self.sampler = sampler
+        self.tail_sampler = tail_sampler
+        self.max_pending_traces = max_pending_traces
+        self.dropped_traces = 0
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _PendingTrace] = {}
+        # Recently dropped trace ids, so spans ending after their root are dropped too.
+        self._dropped_recent: "OrderedDict[str, None]" = OrderedDict()
+
+    def add_processor(self, processor: SpanProcessor) -> None:
+        self._processors.append(processor)
+
+    def force_flush(self, timeout: Optional[float] = None) -> bool:
+        ok = True
+        for p in self._processors:
+            ok = p.force_flush(timeout) and ok
+        return ok
+
+    def shutdown(self) -> None:
+        for p in self._processors:
+            p.shutdown()
 
     def reset(self) -> None:
         self._spans.clear()
@@ -79,34 +164,134 @@ class SpanRecorder:
         *,
         attrs: Optional[Dict[str, Any]] = None,
         trace_id: Optional[str] = None,
-    ) -> SpanHandle:
-        parent = self.current_span()
+        parent: Union[Span, NonRecordingSpan, SpanContext, None] = None,
+    ) -> Union[SpanHandle, NonRecordingSpanHandle]:
+        if parent is None:
+            parent = self.current_span()
+        remote = parent.__class__ is SpanContext
+
+        if parent is not None and not parent.is_recording:
+            if remote:
+                return NonRecordingSpanHandle(NonRecordingSpan(name, parent.trace_id))
+            return NonRecordingSpanHandle(parent)
+
+        decision = SamplingDecision.RECORD_AND_SAMPLE
+        if parent is None and self.sampler is not None:
+            decision = self.sampler.should_sample(name, trace_id, attrs)
+            if decision is SamplingDecision.DROP:
+                return NonRecordingSpanHandle(NonRecordingSpan(name, trace_id))
 
+        # Pass raw ids along; they are only rendered as hex when read.
         resolved_trace_id = (
             trace_id
             if trace_id is not None
-            else (parent.trace_id if parent is not None else new_trace_id())
+            else (parent._trace_id if parent is not None else _ids.trace_id())
         )
 
         span = Span(
             name=name,
             trace_id=resolved_trace_id,
-            parent_id=parent.span_id if parent is not None else None,
+            parent_id=parent._span_id if parent is not None else None,
         )
 
         if attrs:
             for k, v in attrs.items():
                 span.set_attribute(k, v)
 
+        if (parent is None or remote) and (
+            decision is SamplingDecision.RECORD_ONLY or self.tail_sampler is not None
+        ):
+            self._begin_pending(span, decision)
+
         return SpanHandle(recorder=self, span=span)
 
+    def _begin_pending(self, root: Span, decision: SamplingDecision) -> None:
+        with self._lock:
+            if root.trace_id in self._pending:
+                # Second root on an explicit trace_id: buffer it with the first.
+                return
+            if len(self._pending) >= self.max_pending_traces:
+                evicted = next(iter(self._pending))
+                del self._pending[evicted]
+                self._remember_drop(evicted)
+                self.dropped_traces += 1
+            self._pending[root.trace_id] = _PendingTrace(root=root, decision=decision)
+
+    def _remember_drop(self, trace_id: str) -> None:
+        self._dropped_recent[trace_id] = None
+        if len(self._dropped_recent) > 1024:
+            self._dropped_recent.popitem(last=False)
+
+    # Both hooks first test membership without the lock (a dict lookup is
+    # atomic), so spans of traces that are neither pending nor dropped never
+    # touch it.
+
     def _on_span_start(self, span: Span) -> None:
-        # Store immediately so spans appear even if the program crashes mid-span.
-        self._spans.append(span)
+        trace_id = span.trace_id
+        if trace_id in self._pending or trace_id in self._dropped_recent:
+            with self._lock:
+                pending = self._pending.get(trace_id)
+                if pending is not None:
+                    pending.started.append(span)
+                    return
+                if trace_id in self._dropped_recent:
+                    return
+        self._forward_start(span)
 
     def _on_span_end(self, span: Span) -> None:
-        # Hook for future: export-on-end, processors, sampling, etc.
-        pass
+        trace_id = span.trace_id
+        if trace_id in self._pending or trace_id in self._dropped_recent:
+            with self._lock:
+                pending = self._pending.get(span.trace_id)
+                if pending is not None:
+                    pending.spans.append(span)
+                    if span is not pending.root:
+                        return
+                    del self._pending[span.trace_id]
+                elif span.trace_id in self._dropped_recent:
+                    return
+            if pending is not None:
+                self._finish_pending(pending)
+                return
+        self._forward_end(span)
+
+    def _finish_pending(self, pending: _PendingTrace) -> None:
+        tail = self.tail_sampler
+        if tail is None:
+            tail = ErrorTraceSampler()
+        if not tail.should_keep(pending.root, pending.spans):
+            with self._lock:
+                self._remember_drop(pending.root.trace_id)
+            return
+        # Children still running when the root ended get their start now and
+        # their end through the normal path, since the trace is no longer pending.
+        seen = {id(s) for s in pending.started}
+        started = pending.started + [s for s in pending.spans if id(s) not in seen]
+        for s in sorted(started, key=lambda s: s.start_ns):
+            self._forward_start(s)
+        for s in pending.spans:
+            self._forward_end(s)
+
+    def ingest(self, spans: Iterable[Span]) -> None:
+        """Record spans that were started and ended elsewhere.
+
+        Used for spans collected from worker processes; they go through the
+        same pending/tail-sampling bookkeeping as local spans of their trace.
+        """
+        for span in spans:
+            self._on_span_start(span)
+            self._on_span_end(span)
+
+    def _forward_start(self, span: Span) -> None:
+        # Store immediately so spans appear even if the program crashes mid-span.
+        if self._keep_spans:
+            self._spans.append(span)
+        for p in self._processors:
+            p.on_start(span)
+
+    def _forward_end(self, span: Span) -> None:
+        for p in self._processors:
+            p.on_end(span)
 
     def get_spans(self) -> List[Span]:
         return list(self._spans)
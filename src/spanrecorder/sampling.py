@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Any, Callable, Dict, Optional, Protocol, Sequence
+import random
+import threading
+import time
+import zlib
+
+from .span import Span, SpanStatus
+
+
+class SamplingDecision(IntEnum):
+    DROP = 0               # hand back a NonRecordingSpan for the whole trace
+    RECORD_ONLY = 1        # record, keep only if the tail sampler accepts the trace
+    RECORD_AND_SAMPLE = 2  # record and export (subject to the tail sampler, if any)
+
+
+class Sampler(Protocol):
+    """Head sampler: decides once per trace, when its root span is created."""
+
+    def should_sample(
+        self, name: str, trace_id: Optional[str], attrs: Optional[Dict[str, Any]]
+    ) -> SamplingDecision: ...
+
+
+class TailSampler(Protocol):
+    """Tail sampler: decides once per trace, when its root span has ended."""
+
+    def should_keep(self, root: Span, spans: Sequence[Span]) -> bool: ...
+
+
+# -------------------------
+# Head samplers
+# -------------------------
+
+
+class AlwaysOnSampler:
+    def should_sample(self, name, trace_id, attrs) -> SamplingDecision:
+        return SamplingDecision.RECORD_AND_SAMPLE
+
+
+class AlwaysOffSampler:
+    def should_sample(self, name, trace_id, attrs) -> SamplingDecision:
+        return SamplingDecision.DROP
+
+
+_RATIO_SCALE = 1 << 64
+
+
+def _trace_id_bits(trace_id: str) -> int:
+    try:
+        return int(trace_id[-16:], 16)
+    except ValueError:
+        return zlib.crc32(trace_id.encode("utf-8")) << 32
+
+
+class RatioSampler:
+    """Keep a fixed fraction of traces.
+
+    When the caller supplies a trace_id the decision is derived from it, so
+    every process that sees the same trace agrees on it.
+    """
+
+    def __init__(self, ratio: float) -> None:
+        if not 0.0 <= ratio <= 1.0:
+            raise ValueError("ratio must be in [0, 1]")
+        self.ratio = ratio
+        self._bound = int(ratio * _RATIO_SCALE)
+
+    def should_sample(self, name, trace_id, attrs) -> SamplingDecision:
+        if trace_id is not None:
+            keep = _trace_id_bits(trace_id) < self._bound
+        else:
+            keep = random.random() < self.ratio
+        return SamplingDecision.RECORD_AND_SAMPLE if keep else SamplingDecision.DROP
+
+
+class RateLimitingSampler:
+    """Keep at most ``per_second`` traces per second (token bucket, burst = 1s worth)."""
+
+    def __init__(self, per_second: float) -> None:
+        if per_second <= 0:
+            raise ValueError("per_second must be positive")
+        self.per_second = per_second
+        self._capacity = max(1.0, per_second)
+        self._tokens = self._capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def should_sample(self, name, trace_id, attrs) -> SamplingDecision:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last) * self.per_second)
+            self._last = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return SamplingDecision.RECORD_AND_SAMPLE
+        return SamplingDecision.DROP
+
+
+class KeepErrorsSampler:
+    """Wrap a head sampler so traces it drops are still recorded and kept on ERROR.
+
+    Dropped traces are downgraded to RECORD_ONLY; the recorder buffers them and
+    keeps them only if the tail sampler (ErrorTraceSampler by default) accepts.
+    """
+
+    def __init__(self, base: Sampler) -> None:
+        self.base = base
+
+    def should_sample(self, name, trace_id, attrs) -> SamplingDecision:
+        decision = self.base.should_sample(name, trace_id, attrs)
+        if decision is SamplingDecision.DROP:
+            return SamplingDecision.RECORD_ONLY
+        return decision
+
+
+# -------------------------
+# Tail samplers
+# -------------------------
+
+
+class SlowTraceSampler:
+    """Keep traces whose root span took at least ``threshold_ms``."""
+
+    def __init__(self, threshold_ms: float) -> None:
+        self.threshold_ns = int(threshold_ms * 1_000_000)
+
+    def should_keep(self, root: Span, spans: Sequence[Span]) -> bool:
+        dn = root.duration_ns
+        return dn is not None and dn >= self.threshold_ns
+
+
+class ErrorTraceSampler:
+    """Keep traces where any span ended with ERROR status."""
+
+    def should_keep(self, root: Span, spans: Sequence[Span]) -> bool:
+        return any(s.status == SpanStatus.ERROR for s in spans)
+
+
+class AttributeTraceSampler:
+    """Keep traces where any span matches ``predicate``."""
+
+    def __init__(self, predicate: Callable[[Span], bool]) -> None:
+        self.predicate = predicate
+
+    def should_keep(self, root: Span, spans: Sequence[Span]) -> bool:
+        return any(self.predicate(s) for s in spans)
+
+
+class AnyTailSampler:
+    """Keep a trace if any of the wrapped tail samplers keeps it."""
+
+    def __init__(self, *samplers: TailSampler) -> None:
+        self.samplers = samplers
+
+    def should_keep(self, root: Span, spans: Sequence[Span]) -> bool:
+        return any(t.should_keep(root, spans) for t in self.samplers)
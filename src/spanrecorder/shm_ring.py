@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+import json
+import multiprocessing
+import struct
+import threading
+
+from .processor import BatchSpanProcessor
+from .propagation import attach, extract, inject
+from .recorder import SpanRecorder
+from .span import _STATUS_BY_CODE, Span, SpanEvent
+
+T = TypeVar("T")
+
+# Ring header: magic, capacity, head (bytes ever written), tail (bytes ever
+# read), dropped spans. head/tail only grow; positions are taken mod capacity.
+_HEADER = struct.Struct("<8sQQQQ")
+_MAGIC = b"EVTRING1"
+_DATA_OFFSET = 64
+_LEN = struct.Struct("<I")
+
+# Span record: trace id, span id, parent id, start, end, status, flags,
+# name length, extra length; then the name and (optional) JSON extras.
+_SPAN = struct.Struct("<16s8s8sqqBBHI")
+_HAS_PARENT = 1
+_IDS_IN_EXTRA = 2
+_NO_PARENT = bytes(8)
+
+
+def _id_bytes(v: Any, size: int) -> Optional[bytes]:
+    """Raw bytes of an int or lowercase-hex id; None if it would not round-trip."""
+    if v.__class__ is int:
+        return v.to_bytes(size, "big") if 0 <= v < 1 << (8 * size) else None
+    if isinstance(v, str) and len(v) == 2 * size and v == v.lower():
+        try:
+            return bytes.fromhex(v)
+        except ValueError:
+            return None
+    return None
+
+
+def encode_span(span: Span) -> bytes:
+    """Compact binary form of a finished span (ids and timings packed, the rest JSON)."""
+    extra: Dict[str, Any] = {}
+    trace_b = _id_bytes(span._trace_id, 16)
+    span_b = _id_bytes(span._span_id, 8)
+    parent = span._parent_id
+    parent_b = _NO_PARENT if parent is None else _id_bytes(parent, 8)
+    flags = 0 if parent is None else _HAS_PARENT
+    if trace_b is None or span_b is None or parent_b is None:
+        flags |= _IDS_IN_EXTRA
+        extra["ids"] = [span.trace_id, span.span_id, span.parent_id]
+        trace_b, span_b, parent_b = bytes(16), bytes(8), _NO_PARENT
+    if span._attributes:
+        extra["a"] = span._attributes
+    if span._events:
+        extra["e"] = [[e.name, e.ts_ns, e.attributes] for e in span._events]
+    if span.exception_type is not None:
+        extra["x"] = [span.exception_type, span.exception_message]
+    extra_b = json.dumps(extra, separators=(",", ":"), default=str).encode() if extra else b""
+    name_b = span.name.encode()
+    end = span.end_ns if span.end_ns is not None else -1
+    return (
+        _SPAN.pack(trace_b, span_b, parent_b, span.start_ns, end, span._status, flags, len(name_b), len(extra_b))
+        + name_b
+        + extra_b
+    )
+
+
+def decode_span(buf: bytes, pos: int = 0) -> Span:
+    """Inverse of encode_span() for the record starting at ``pos``."""
+    trace_b, span_b, parent_b, start, end, status, flags, name_len, extra_len = _SPAN.unpack_from(buf, pos)
+    pos += _SPAN.size
+    name = bytes(buf[pos : pos + name_len]).decode()
+    pos += name_len
+    extra = json.loads(bytes(buf[pos : pos + extra_len])) if extra_len else {}
+    if flags & _IDS_IN_EXTRA:
+        trace_id, span_id, parent_id = extra["ids"]
+    else:
+        trace_id = int.from_bytes(trace_b, "big")
+        span_id = int.from_bytes(span_b, "big")
+        parent_id = int.from_bytes(parent_b, "big") if flags & _HAS_PARENT else None
+    events = extra.get("e")
+    exc = extra.get("x") or (None, None)
+    return Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=span_id,
+        parent_id=parent_id,
+        start_ns=start,
+        end_ns=None if end < 0 else end,
+        status=_STATUS_BY_CODE[status],
+        attributes=extra.get("a"),
+        events=[SpanEvent(n, ts, a) for n, ts, a in events] if events else None,
+        exception_type=exc[0],
+        exception_message=exc[1],
+    )
+
+
+@dataclass(frozen=True)
+class RingHandle:
+    """What a worker process needs to attach to a SharedSpanRing (pass it at process creation)."""
+
+    name: str
+    lock: Any
+
+
+class SharedSpanRing:
+    """Multi-producer ring buffer of encoded spans in shared memory.
+
+    Worker processes append length-prefixed span records under a
+    process-shared lock (one acquisition per batch) and the parent drains
+    everything written so far in one copy. Writers never block on a full
+    ring: spans that do not fit are discarded and counted in ``dropped``.
+
+    Create it in the parent and hand ``handle`` to workers (e.g. as a pool
+    initializer argument); the lock must be inherited at process creation,
+    not sent through a queue.
+    """
+
+    def __init__(self, size_bytes: int = 4 << 20, *, _handle: Optional[RingHandle] = None) -> None:
+        if _handle is None:
+            if size_bytes <= _LEN.size + _SPAN.size:
+                raise ValueError("size_bytes is too small")
+            self._shm = shared_memory.SharedMemory(create=True, size=_DATA_OFFSET + size_bytes)
+            self._lock = multiprocessing.Lock()
+            _HEADER.pack_into(self._shm.buf, 0, _MAGIC, size_bytes, 0, 0, 0)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=_handle.name)
+            self._lock = _handle.lock
+            self._owner = False
+        magic, self.capacity, _, _, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{self._shm.name} is not a span ring")
+
+    @classmethod
+    def attach(cls, handle: RingHandle) -> "SharedSpanRing":
+        return cls(_handle=handle)
+
+    @property
+    def handle(self) -> RingHandle:
+        return RingHandle(self._shm.name, self._lock)
+
+    @property
+    def dropped(self) -> int:
+        return _HEADER.unpack_from(self._shm.buf, 0)[4]
+
+    @property
+    def used_bytes(self) -> int:
+        _, _, head, tail, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        return head - tail
+
+    def write(self, spans: Sequence[Span]) -> int:
+        """Append ``spans``; returns how many fit (the rest count as dropped)."""
+        records = []
+        for span in spans:
+            payload = encode_span(span)
+            records.append(_LEN.pack(len(payload)) + payload)
+        buf = self._shm.buf
+        cap = self.capacity
+        with self._lock:
+            magic, _, head, tail, dropped = _HEADER.unpack_from(buf, 0)
+            free = cap - (head - tail)
+            n = 0
+            size = 0
+            for rec in records:
+                if size + len(rec) > free:
+                    break
+                size += len(rec)
+                n += 1
+            if n:
+                data = b"".join(records[:n])
+                pos = head % cap
+                first = min(size, cap - pos)
+                buf[_DATA_OFFSET + pos : _DATA_OFFSET + pos + first] = data[:first]
+                if first < size:
+                    buf[_DATA_OFFSET : _DATA_OFFSET + size - first] = data[first:]
+            _HEADER.pack_into(buf, 0, magic, cap, head + size, tail, dropped + len(records) - n)
+        return n
+
+    def drain(self) -> List[Span]:
+        """Remove and decode every span written so far."""
+        buf = self._shm.buf
+        cap = self.capacity
+        with self._lock:
+            magic, _, head, tail, dropped = _HEADER.unpack_from(buf, 0)
+            size = head - tail
+            if not size:
+                return []
+            pos = tail % cap
+            first = min(size, cap - pos)
+            data = bytes(buf[_DATA_OFFSET + pos : _DATA_OFFSET + pos + first])
+            if first < size:
+                data += bytes(buf[_DATA_OFFSET : _DATA_OFFSET + size - first])
+            _HEADER.pack_into(buf, 0, magic, cap, head, head, dropped)
+        spans = []
+        pos = 0
+        while pos < size:
+            (n,) = _LEN.unpack_from(data, pos)
+            pos += _LEN.size
+            spans.append(decode_span(data, pos))
+            pos += n
+        return spans
+
+    def close(self) -> None:
+        """Detach; the creating process also frees the segment."""
+        shm, self._shm = self._shm, None
+        if shm is None:
+            return
+        shm.close()
+        if self._owner:
+            shm.unlink()
+
+    def __enter__(self) -> "SharedSpanRing":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class SharedRingExporter:
+    """SpanExporter writing batches into a SharedSpanRing (use behind a BatchSpanProcessor)."""
+
+    def __init__(self, ring: SharedSpanRing) -> None:
+        self.ring = ring
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.ring.write(spans)
+
+    def shutdown(self) -> None:
+        self.ring.close()
+
+
+class SpanRingCollector:
+    """Drains a SharedSpanRing into a parent-side SpanRecorder.
+
+    A background thread drains every ``interval_s``; drain() does it on
+    demand (e.g. before ending the span that waited for the workers, so a
+    tail sampler sees the whole trace). close() stops the thread after a
+    last drain; the ring itself stays open.
+    """
+
+    def __init__(self, ring: SharedSpanRing, recorder: SpanRecorder, *, interval_s: float = 0.05) -> None:
+        self.ring = ring
+        self.recorder = recorder
+        self.interval_s = interval_s
+        self.collected_spans = 0
+        self._drain_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="evaltrace-span-ring", daemon=True)
+        self._thread.start()
+
+    def drain(self) -> int:
+        with self._drain_lock:
+            spans = self.ring.drain()
+            if spans:
+                self.recorder.ingest(spans)
+                self.collected_spans += len(spans)
+        return len(spans)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.drain()
+
+    def close(self) -> None:
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+        self.drain()
+
+    def __enter__(self) -> "SpanRingCollector":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# -------------------------
+# Worker side
+# -------------------------
+
+_worker: Optional[Tuple[SpanRecorder, BatchSpanProcessor]] = None
+
+
+def install_span_ring(
+    handle: RingHandle, recorder: Optional[SpanRecorder] = None, **batch_kwargs: Any
+) -> SpanRecorder:
+    """Send the spans of this (worker) process to the ring behind ``handle``.
+
+    Attaches a BatchSpanProcessor over a SharedRingExporter to ``recorder``
+    (a new ``SpanRecorder(keep_spans=False)`` if omitted) and makes it this
+    process's worker_recorder(). Meant as a pool initializer::
+
+        ProcessPoolExecutor(initializer=install_span_ring, initargs=(ring.handle,))
+    """
+    global _worker
+    if recorder is None:
+        recorder = SpanRecorder(keep_spans=False)
+    processor = BatchSpanProcessor(SharedRingExporter(SharedSpanRing.attach(handle)), **batch_kwargs)
+    recorder.add_processor(processor)
+    _worker = (recorder, processor)
+    return recorder
+
+
+def worker_recorder() -> Optional[SpanRecorder]:
+    """The recorder set up by install_span_ring() in this process, if any."""
+    return _worker[0] if _worker is not None else None
+
+
+def flush_worker_spans(timeout: Optional[float] = None) -> bool:
+    """Push this worker's queued spans into the ring (pool workers exit without atexit)."""
+    return _worker[1].force_flush(timeout) if _worker is not None else True
+
+
+class TracedCall:
+    """Picklable callable that runs ``fn`` under the traceparent captured at creation.
+
+    Spans started by ``fn`` in the worker are children of the submitter's
+    current span; the worker's spans are flushed to the ring before the
+    result is returned.
+    """
+
+    def __init__(self, fn: Callable[..., Any], carrier: Optional[Dict[str, str]] = None) -> None:
+        self.fn = fn
+        self.carrier = carrier if carrier is not None else dict(inject())
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            with attach(extract(self.carrier)):
+                return self.fn(*args, **kwargs)
+        finally:
+            flush_worker_spans()
+
+
+def submit_traced(executor: Executor, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> "Future[T]":
+    """``executor.submit(fn, ...)`` with the current span as the task's remote parent."""
+    return executor.submit(TracedCall(fn), *args, **kwargs)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
+import itertools
+import os
+import random
 import time
-import uuid
 
 
 class SpanStatus(str, Enum):
@@ -13,46 +14,189 @@ class SpanStatus(str, Enum):
     UNSET = "UNSET"
 
 
+# Spans store their status as a small int; codes match OTLP's StatusCode.
+_STATUS_BY_CODE = (SpanStatus.UNSET, SpanStatus.OK, SpanStatus.ERROR)
+_CODE_BY_STATUS = {s: i for i, s in enumerate(_STATUS_BY_CODE)}
+
+_MASK64 = (1 << 64) - 1
+# Odd constant: multiplying by it is a bijection mod 2**64, so distinct
+# counter values give distinct (and well-spread) ids.
+_ID_MIX = 0x9E3779B97F4A7C15
+
+
+class _IdGenerator:
+    """Per-process random counter for 64-bit span ids and 128-bit trace ids.
+
+    Much cheaper than uuid4 (no syscall per id). Reseeded after fork so
+    parent and child processes don't hand out the same sequence.
+    """
+
+    def __init__(self) -> None:
+        self.reseed()
+
+    def reseed(self) -> None:
+        rnd = random.SystemRandom()
+        self._prefix = rnd.getrandbits(64) << 64
+        self._counter = itertools.count(rnd.getrandbits(64))
+
+    def span_id(self) -> int:
+        return ((next(self._counter) * _ID_MIX) & _MASK64) or 1
+
+    def trace_id(self) -> int:
+        return self._prefix | self.span_id()
+
+
+_ids = _IdGenerator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_ids.reseed)
+
+
 def _new_id() -> str:
-    # Short, stable string ids (good for logs)
-    return uuid.uuid4().hex
+    # W3C-compatible 32-hex trace id
+    return "%032x" % _ids.trace_id()
 
 
-def now_ns() -> int:
-    # Monotonic clock (safe for durations)
-    return time.perf_counter_ns()
+now_ns = time.perf_counter_ns  # monotonic clock (safe for durations)
 
 
-@dataclass
 class SpanEvent:
-    name: str
-    ts_ns: int
-    attributes: Dict[str, Any] = field(default_factory=dict)
+    # Slots written out by hand: dataclass(slots=True) needs Python 3.10.
+    __slots__ = ("name", "ts_ns", "attributes")
+
+    def __init__(self, name: str, ts_ns: int, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.ts_ns = ts_ns
+        self.attributes: Dict[str, Any] = attributes if attributes is not None else {}
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not SpanEvent:
+            return NotImplemented
+        return (self.name, self.ts_ns, self.attributes) == (other.name, other.ts_ns, other.attributes)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"SpanEvent(name={self.name!r}, ts_ns={self.ts_ns!r}, attributes={self.attributes!r})"
 
 
-@dataclass
 class Span:
     """A minimal span model for AI/RAG observability.
 
     - trace_id groups spans for one request/interaction
     - span_id uniquely identifies this span
     - parent_id links to parent span (if any)
+
+    Slotted and allocation-light: ids are kept as ints until first read as
+    hex, ``attributes``/``events`` are only created when first used, and the
+    status is stored as a small int.
     """
 
-    name: str
-    trace_id: str
-    span_id: str = field(default_factory=_new_id)
-    parent_id: Optional[str] = None
+    __slots__ = (
+        "name",
+        "_trace_id",
+        "_span_id",
+        "_parent_id",
+        "start_ns",
+        "end_ns",
+        "_status",
+        "_attributes",
+        "_events",
+        "exception_type",
+        "exception_message",
+    )
 
-    start_ns: int = field(default_factory=now_ns)
-    end_ns: Optional[int] = None
+    is_recording = True
 
-    status: SpanStatus = SpanStatus.UNSET
-    attributes: Dict[str, Any] = field(default_factory=dict)
-    events: List[SpanEvent] = field(default_factory=list)
+    def __init__(
+        self,
+        name: str,
+        trace_id: Union[str, int],
+        span_id: Union[str, int, None] = None,
+        parent_id: Union[str, int, None] = None,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+        status: SpanStatus = SpanStatus.UNSET,
+        attributes: Optional[Dict[str, Any]] = None,
+        events: Optional[List[SpanEvent]] = None,
+        exception_type: Optional[str] = None,
+        exception_message: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self._trace_id = trace_id
+        self._span_id = span_id if span_id is not None else _ids.span_id()
+        self._parent_id = parent_id
+        self.start_ns = start_ns if start_ns is not None else now_ns()
+        self.end_ns = end_ns
+        self._status = _CODE_BY_STATUS[status]
+        self._attributes = attributes or None
+        self._events = events or None
+        self.exception_type = exception_type
+        self.exception_message = exception_message
+
+    # ---- ids (hex on demand) ----
 
-    exception_type: Optional[str] = None
-    exception_message: Optional[str] = None
+    @property
+    def trace_id(self) -> str:
+        v = self._trace_id
+        if v.__class__ is int:
+            v = self._trace_id = "%032x" % v
+        return v
+
+    @trace_id.setter
+    def trace_id(self, value: Union[str, int]) -> None:
+        self._trace_id = value
+
+    @property
+    def span_id(self) -> str:
+        v = self._span_id
+        if v.__class__ is int:
+            v = self._span_id = "%016x" % v
+        return v
+
+    @span_id.setter
+    def span_id(self, value: Union[str, int]) -> None:
+        self._span_id = value
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        v = self._parent_id
+        if v.__class__ is int:
+            v = self._parent_id = "%016x" % v
+        return v
+
+    @parent_id.setter
+    def parent_id(self, value: Union[str, int, None]) -> None:
+        self._parent_id = value
+
+    # ---- lazily created containers ----
+
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        if self._attributes is None:
+            self._attributes = {}
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value: Dict[str, Any]) -> None:
+        self._attributes = value
+
+    @property
+    def events(self) -> List[SpanEvent]:
+        if self._events is None:
+            self._events = []
+        return self._events
+
+    @events.setter
+    def events(self, value: List[SpanEvent]) -> None:
+        self._events = value
+
+    @property
+    def status(self) -> SpanStatus:
+        return _STATUS_BY_CODE[self._status]
+
+    @status.setter
+    def status(self, value: SpanStatus) -> None:
+        self._status = _CODE_BY_STATUS[value]
 
     def end(self, *, status: Optional[SpanStatus] = None, end_ns: Optional[int] = None) -> None:
         """End the span (idempotent)."""
@@ -61,9 +205,9 @@ class Span:
         self.end_ns = end_ns if end_ns is not None else now_ns()
 
         if status is not None:
-            self.status = status
-        elif self.status == SpanStatus.UNSET:
-            self.status = SpanStatus.OK
+            self._status = _CODE_BY_STATUS[status]
+        elif self._status == 0:
+            self._status = 1
 
     @property
     def duration_ns(self) -> Optional[int]:
@@ -72,7 +216,10 @@ class Span:
         return self.end_ns - self.start_ns
 
     def set_attribute(self, key: str, value: Any) -> None:
-        self.attributes[key] = value
+        attrs = self._attributes
+        if attrs is None:
+            attrs = self._attributes = {}
+        attrs[key] = value
 
     def add_event(
         self,
@@ -91,9 +238,62 @@ class Span:
     def record_exception(self, exc: BaseException) -> None:
         self.exception_type = type(exc).__name__
         self.exception_message = str(exc)
-        self.status = SpanStatus.ERROR
+        self._status = 2
+
+    def _fields(self) -> tuple:
+        return (
+            self.name,
+            self.trace_id,
+            self.span_id,
+            self.parent_id,
+            self.start_ns,
+            self.end_ns,
+            self._status,
+            self._attributes or {},
+            self._events or [],
+            self.exception_type,
+            self.exception_message,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not Span:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None  # mutable, like the dataclass it replaces
+
+    def __repr__(self) -> str:
+        return (
+            f"Span(name={self.name!r}, trace_id={self.trace_id!r}, span_id={self.span_id!r}, "
+            f"parent_id={self.parent_id!r}, start_ns={self.start_ns!r}, end_ns={self.end_ns!r}, "
+            f"status={self.status!r})"
+        )
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Span":
+        """Inverse of to_dict() (``duration_ns`` is derived, so it is ignored)."""
+        exc = d.get("exception") or {}
+        events = [
+            SpanEvent(name=e["name"], ts_ns=e["ts_ns"], attributes=e.get("attributes") or {})
+            for e in d.get("events") or ()
+        ]
+        return cls(
+            name=d["name"],
+            trace_id=d["trace_id"],
+            span_id=d.get("span_id"),
+            parent_id=d.get("parent_id"),
+            start_ns=d["start_ns"],
+            end_ns=d.get("end_ns"),
+            status=SpanStatus(d.get("status") or SpanStatus.UNSET),
+            attributes=d.get("attributes") or None,
+            events=events or None,
+            exception_type=exc.get("type"),
+            exception_message=exc.get("message"),
+        )
 
     def to_dict(self) -> Dict[str, Any]:
+        attrs = self._attributes
+        events = self._events
         return {
             "name": self.name,
             "trace_id": self.trace_id,
@@ -102,15 +302,121 @@ class Span:
             "start_ns": self.start_ns,
             "end_ns": self.end_ns,
             "duration_ns": self.duration_ns,
-            "status": self.status.value,
-            "attributes": dict(self.attributes),
-            "events": [
-                {"name": e.name, "ts_ns": e.ts_ns, "attributes": dict(e.attributes)}
-                for e in self.events
-            ],
+            "status": _STATUS_BY_CODE[self._status].value,
+            "attributes": dict(attrs) if attrs else {},
+            "events": (
+                [{"name": e.name, "ts_ns": e.ts_ns, "attributes": dict(e.attributes)} for e in events]
+                if events
+                else []
+            ),
             "exception": (
                 {"type": self.exception_type, "message": self.exception_message}
                 if self.exception_type is not None
                 else None
             ),
         }
+
+
+class NonRecordingSpan:
+    """Stand-in for spans of unsampled traces.
+
+    Accepts the mutating Span API and discards everything, so instrumented code
+    does not need to check whether its trace is being recorded. A single
+    instance is shared by the root and all of its descendants.
+    """
+
+    __slots__ = ("name", "_trace_id")
+
+    is_recording = False
+    span_id = None
+    parent_id = None
+    status = SpanStatus.UNSET
+
+    def __init__(self, name: str, trace_id: Optional[str] = None) -> None:
+        self.name = name
+        self._trace_id = trace_id
+
+    @property
+    def trace_id(self) -> str:
+        # Only pay for an id if someone asks for it (e.g. to log it).
+        if self._trace_id is None:
+            self._trace_id = _new_id()
+        return self._trace_id
+
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        return {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None, ts_ns: Optional[int] = None) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self, *, status: Optional[SpanStatus] = None, end_ns: Optional[int] = None) -> None:
+        pass
+
+
+class SpanContext:
+    """Identity of a span recorded elsewhere (another process or service).
+
+    Made current with ``propagation.attach()`` (or passed as ``parent=`` to
+    start_span), it parents local spans without being recorded itself.
+    ``sampled`` carries the remote sampling decision: when False, local
+    spans of the trace are NonRecordingSpans. Like NonRecordingSpan it
+    accepts and discards the mutating Span API.
+    """
+
+    __slots__ = ("_trace_id", "_span_id", "sampled")
+
+    name = None
+    parent_id = None
+    status = SpanStatus.UNSET
+
+    def __init__(self, trace_id: Union[str, int], span_id: Union[str, int], sampled: bool = True) -> None:
+        self._trace_id = trace_id
+        self._span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def is_recording(self) -> bool:
+        return self.sampled
+
+    @property
+    def trace_id(self) -> str:
+        v = self._trace_id
+        return "%032x" % v if v.__class__ is int else v
+
+    @property
+    def span_id(self) -> str:
+        v = self._span_id
+        return "%016x" % v if v.__class__ is int else v
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not SpanContext:
+            return NotImplemented
+        return (self.trace_id, self.span_id, self.sampled) == (other.trace_id, other.span_id, other.sampled)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"SpanContext(trace_id={self.trace_id!r}, span_id={self.span_id!r}, sampled={self.sampled!r})"
+
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        return {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None, ts_ns: Optional[int] = None) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self, *, status: Optional[SpanStatus] = None, end_ns: Optional[int] = None) -> None:
+        pass
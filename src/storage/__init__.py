@@ -1,4 +1,21 @@
 from .trace_store import TraceStore, JsonlTraceStore
 from .result_store import ResultStore, JsonResultStore
+from .blob_store import FileBlobStore
+from .partitioned_store import PartitionedTraceStore, SegmentInfo
+from .segment_store import SegmentTraceStore
+from .sqlite_result_store import ResultNotFound, ResultRow, SqliteResultStore, migrate_json_results
 
-__all__ = ["TraceStore", "JsonlTraceStore", "ResultStore", "JsonResultStore"]
+__all__ = [
+    "TraceStore",
+    "JsonlTraceStore",
+    "ResultStore",
+    "JsonResultStore",
+    "SqliteResultStore",
+    "ResultRow",
+    "ResultNotFound",
+    "migrate_json_results",
+    "FileBlobStore",
+    "PartitionedTraceStore",
+    "SegmentInfo",
+    "SegmentTraceStore",
+]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from spanrecorder.blobs import BlobNotFound
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass
+class FileBlobStore:
+    """Content-addressed blobs as files: ``<directory>/<sha256[:2]>/<sha256[2:]>``.
+
+    Each distinct content is written once (atomically, via rename), so
+    concurrent writers and processes can share a directory. Digests known to
+    exist are remembered (up to ``known_digests``) so re-putting a popular
+    value costs a hash, not a stat.
+    """
+
+    directory: str
+    known_digests: int = 100_000
+    writes: int = field(default=0, init=False)
+    _known: "OrderedDict[str, None]" = field(default_factory=OrderedDict, init=False, repr=False)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._known:
+            return digest
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            self.writes += 1
+        self._known[digest] = None
+        if len(self._known) > self.known_digests:
+            self._known.popitem(last=False)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        if not _DIGEST_RE.match(digest):
+            raise BlobNotFound(digest)
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise BlobNotFound(digest) from None
+
+    def __contains__(self, digest: str) -> bool:
+        return bool(_DIGEST_RE.match(digest)) and os.path.exists(self._path(digest))
@@ -0,0 +1,541 @@
+from __future__ import annotations
+
+import gzip
+import itertools
+import json
+import lzma
+import os
+import queue
+import shutil
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from spanrecorder.span import Span
+
+_HOUR_NS = 3600 * 10**9
+_PARTITIONS = {
+    "hour": (_HOUR_NS, "%Y%m%dT%H"),
+    "day": (24 * _HOUR_NS, "%Y%m%d"),
+}
+# Slack for partition pruning: writers and readers derive wall time from
+# the monotonic span clock separately, so their offsets differ slightly.
+_CLOCK_SKEW_NS = 10**9
+
+_SUFFIX = ".jsonl"
+_ACTIVE_PREFIX = "active-"
+_EXTENSIONS = {None: "", "gzip": ".gz", "zlib": ".zz", "lzma": ".xz"}
+_COMPRESSION_BY_EXT = {v: k for k, v in _EXTENSIONS.items()}
+
+_seq = itertools.count()
+
+
+def _open_compressed(path: str, mode: str, compression: Optional[str]) -> IO[bytes]:
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == "lzma":
+        return lzma.open(path, mode)
+    return open(path, mode)
+
+
+def _read_lines(path: str) -> Iterator[bytes]:
+    """Complete lines of a (possibly compressed) segment; a torn tail is skipped."""
+    ext = os.path.splitext(path)[1]
+    compression = _COMPRESSION_BY_EXT.get(ext) if ext != _SUFFIX else None
+    if compression == "zlib":
+        d = zlib.decompressobj()
+        pending = b""
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(1 << 20)
+                data = pending + (d.decompress(chunk) if chunk else d.flush())
+                *lines, pending = data.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield line
+                if not chunk:
+                    return
+    with _open_compressed(path, "rb", compression) as f:
+        for line in f:
+            if line.endswith(b"\n") and line.strip():
+                yield line
+
+
+@dataclass(frozen=True)
+class SegmentInfo:
+    """A segment file; sealed ones carry their span start_ns range in the name."""
+
+    path: str
+    partition: str
+    min_start_ns: Optional[int]  # None while active
+    max_start_ns: Optional[int]
+
+    @property
+    def active(self) -> bool:
+        return self.min_start_ns is None
+
+    @property
+    def compressed(self) -> bool:
+        return not self.path.endswith(_SUFFIX)
+
+    @classmethod
+    def parse(cls, partition_dir: str, name: str) -> Optional["SegmentInfo"]:
+        partition = os.path.basename(partition_dir)
+        path = os.path.join(partition_dir, name)
+        if name.startswith(_ACTIVE_PREFIX):
+            return cls(path, partition, None, None) if name.endswith(_SUFFIX) else None
+        base, ext = os.path.splitext(name)
+        if ext != _SUFFIX:
+            if ext not in _COMPRESSION_BY_EXT:
+                return None
+            base, ext = os.path.splitext(base)
+            if ext != _SUFFIX:
+                return None
+        parts = base.split("-")
+        if len(parts) < 2 or not (parts[0].isdigit() and parts[1].isdigit()):
+            return None
+        return cls(path, partition, int(parts[0]), int(parts[1]))
+
+
+class _ActiveSegment:
+    __slots__ = ("path", "partition", "file", "size", "min_start_ns", "max_start_ns")
+
+    def __init__(self, path: str, partition: str) -> None:
+        self.path = path
+        self.partition = partition
+        self.file = open(path, "ab")
+        self.size = 0
+        self.min_start_ns = 1 << 63
+        self.max_start_ns = -(1 << 63)
+
+
+class PartitionedTraceStore:
+    """Trace store split into hour or day directories of rotating JSONL segments.
+
+    Layout: ``<directory>/<partition>/<segment>``, where a partition is the
+    UTC hour (``20250101T13``) or day (``20250101``) of the spans' start
+    time, and span timestamps (perf_counter_ns) are mapped to wall time with
+    ``clock_offset_ns`` (see spanrecorder.otlp.monotonic_to_unix_offset_ns).
+
+    - Each store instance appends to its own ``active-*`` segment per
+      partition, so concurrent writers (threads sharing an instance, or
+      processes with their own) never share a file.
+    - An active segment is sealed when it reaches ``max_segment_bytes``,
+      when more than ``max_open_segments`` partitions are open (oldest
+      first), or on flush()/close(). Sealing renames it to
+      ``<min_start_ns>-<max_start_ns>-<pid>-<seq>.jsonl`` and queues it for
+      compression (``gzip``, ``zlib``, ``lzma`` or None) on a background
+      thread (``background=False`` compresses inline).
+    - Readers prune partitions by directory name and sealed segments by file
+      name before opening anything, so a time-ranged scan only touches the
+      files overlapping the window.
+    - apply_retention() drops whole partitions older than ``retention_s``;
+      compact() merges small sealed segments of a partition. Both also run
+      every ``maintenance_interval_s`` on the background thread when set.
+      Run maintenance from one process per directory.
+
+    iter_spans() yields segments in start-time order, not the end order
+    spans were written in: a trace's root may be read before its children
+    when they landed in different segments or partitions.
+    """
+
+    # Read by analytics.TraceQueryEngine to pick how spans are grouped into traces.
+    span_order = "any"
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        partition: str = "hour",
+        max_segment_bytes: int = 64 << 20,
+        max_open_segments: int = 2,
+        compression: Optional[str] = "gzip",
+        retention_s: Optional[float] = None,
+        compact_below_bytes: int = 4 << 20,
+        background: bool = True,
+        maintenance_interval_s: Optional[float] = None,
+        clock_offset_ns: Optional[int] = None,
+        wall_clock_ns: Callable[[], int] = time.time_ns,
+    ) -> None:
+        if partition not in _PARTITIONS:
+            raise ValueError(f"Unknown partition: {partition!r} (expected 'hour' or 'day')")
+        if compression not in _EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression!r}")
+        if max_segment_bytes <= 0:
+            raise ValueError("max_segment_bytes must be positive")
+        self.directory = directory
+        self.partition = partition
+        self.partition_ns, self._partition_fmt = _PARTITIONS[partition]
+        self.max_segment_bytes = max_segment_bytes
+        self.max_open_segments = max(1, max_open_segments)
+        self.compression = compression
+        self.retention_s = retention_s
+        self.compact_below_bytes = compact_below_bytes
+        self.clock_offset_ns = (
+            clock_offset_ns if clock_offset_ns is not None else time.time_ns() - time.perf_counter_ns()
+        )
+        self.wall_clock_ns = wall_clock_ns
+        self.compression_failures = 0
+        self._names: Dict[int, str] = {}
+
+        self._lock = threading.Lock()
+        self._active: "OrderedDict[str, _ActiveSegment]" = OrderedDict()
+        self._closed = False
+        self._queue: "Optional[queue.Queue[Optional[str]]]" = None
+        self._worker: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue()
+            self._maintenance_interval_s = maintenance_interval_s
+            self._worker = threading.Thread(target=self._run, name="evaltrace-trace-compactor", daemon=True)
+            self._worker.start()
+
+    # -------------------------
+    # Partitions
+    # -------------------------
+
+    def partition_of(self, start_ns: int) -> str:
+        bucket = (start_ns + self.clock_offset_ns) // self.partition_ns
+        name = self._names.get(bucket)
+        if name is None:
+            dt = datetime.fromtimestamp(bucket * self.partition_ns // 10**9, tz=timezone.utc)
+            name = self._names[bucket] = dt.strftime(self._partition_fmt)
+            if len(self._names) > 1024:
+                self._names.clear()
+        return name
+
+    def _partition_start_wall_ns(self, name: str) -> Optional[int]:
+        try:
+            dt = datetime.strptime(name, self._partition_fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return int(dt.timestamp()) * 10**9
+
+    def partitions(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> List[str]:
+        """Partition names (oldest first) that may hold spans starting in [start_ns, end_ns)."""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        out = []
+        for name in names:
+            lo = self._partition_start_wall_ns(name)
+            if lo is None:
+                continue
+            if start_ns is not None and lo + self.partition_ns <= start_ns + self.clock_offset_ns - _CLOCK_SKEW_NS:
+                continue
+            if end_ns is not None and lo >= end_ns + self.clock_offset_ns + _CLOCK_SKEW_NS:
+                continue
+            out.append(name)
+        return out
+
+    def segments(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> List[SegmentInfo]:
+        """Segments that may hold spans starting in [start_ns, end_ns), by name only."""
+        out: List[SegmentInfo] = []
+        for partition in self.partitions(start_ns=start_ns, end_ns=end_ns):
+            for info in self.segments_in(partition):
+                if not info.active:
+                    if start_ns is not None and info.max_start_ns < start_ns:
+                        continue
+                    if end_ns is not None and info.min_start_ns >= end_ns:
+                        continue
+                out.append(info)
+        return out
+
+    # -------------------------
+    # Writing
+    # -------------------------
+
+    def write(self, spans: Iterable[Span]) -> None:
+        by_partition: Dict[str, List[Tuple[int, bytes]]] = {}
+        for s in spans:
+            line = (json.dumps(s.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+            by_partition.setdefault(self.partition_of(s.start_ns), []).append((s.start_ns, line))
+        if not by_partition:
+            return
+        sealed: List[str] = []
+        with self._lock:
+            if self._closed:
+                raise ValueError("write() on a closed PartitionedTraceStore")
+            for partition, lines in by_partition.items():
+                seg = self._active.get(partition)
+                if seg is None:
+                    seg = self._open_segment(partition)
+                else:
+                    self._active.move_to_end(partition)
+                buf: List[bytes] = []
+                for start, line in lines:
+                    buf.append(line)
+                    seg.size += len(line)
+                    if start < seg.min_start_ns:
+                        seg.min_start_ns = start
+                    if start > seg.max_start_ns:
+                        seg.max_start_ns = start
+                    if seg.size >= self.max_segment_bytes:
+                        seg.file.write(b"".join(buf))
+                        buf = []
+                        sealed.append(self._seal(self._active.pop(partition)))
+                        seg = self._open_segment(partition)
+                if buf:
+                    seg.file.write(b"".join(buf))
+                    seg.file.flush()
+            while len(self._active) > self.max_open_segments:
+                _, seg = self._active.popitem(last=False)
+                sealed.append(self._seal(seg))
+        for path in sealed:
+            self._schedule_compression(path)
+
+    def _open_segment(self, partition: str) -> _ActiveSegment:
+        pdir = os.path.join(self.directory, partition)
+        os.makedirs(pdir, exist_ok=True)
+        name = f"{_ACTIVE_PREFIX}{os.getpid()}-{next(_seq):06d}-{time.time_ns()}{_SUFFIX}"
+        seg = self._active[partition] = _ActiveSegment(os.path.join(pdir, name), partition)
+        return seg
+
+    def _seal(self, seg: _ActiveSegment) -> str:
+        seg.file.close()
+        if seg.size == 0:
+            os.unlink(seg.path)
+            return ""
+        name = f"{seg.min_start_ns:020d}-{seg.max_start_ns:020d}-{os.getpid()}-{next(_seq):06d}{_SUFFIX}"
+        path = os.path.join(os.path.dirname(seg.path), name)
+        os.replace(seg.path, path)
+        return path
+
+    def _schedule_compression(self, path: str) -> None:
+        if not path or self.compression is None:
+            return
+        if self._queue is not None:
+            self._queue.put(path)
+        else:
+            self._compress(path)
+
+    def _compress(self, path: str) -> None:
+        target = path + _EXTENSIONS[self.compression]
+        tmp = f"{target}.tmp-{os.getpid()}"
+        try:
+            self._write_compressed(tmp, _read_raw(path))
+            os.replace(tmp, target)
+            os.unlink(path)
+        except FileNotFoundError:
+            pass  # removed by retention or compaction meanwhile
+        except Exception:
+            self.compression_failures += 1
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def _write_compressed(self, path: str, chunks: Iterable[bytes]) -> None:
+        if self.compression == "zlib":
+            c = zlib.compressobj(6)
+            with open(path, "wb") as f:
+                for chunk in chunks:
+                    f.write(c.compress(chunk))
+                f.write(c.flush())
+            return
+        with _open_compressed(path, "wb", self.compression) as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def flush(self) -> None:
+        """Seal every active segment and wait for pending compression."""
+        with self._lock:
+            active = list(self._active.values())
+            self._active.clear()
+            sealed = [self._seal(seg) for seg in active]
+        for path in sealed:
+            self._schedule_compression(path)
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._closed = True
+        if self._queue is not None and self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._queue = None
+
+    def __enter__(self) -> "PartitionedTraceStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        assert self._queue is not None
+        q = self._queue
+        interval = self._maintenance_interval_s
+        next_maintenance = time.monotonic() + interval if interval else None
+        while True:
+            timeout = max(0.0, next_maintenance - time.monotonic()) if next_maintenance else None
+            try:
+                path = q.get(timeout=timeout)
+            except queue.Empty:
+                path = ""
+            else:
+                if path is None:
+                    q.task_done()
+                    return
+                try:
+                    self._compress(path)
+                finally:
+                    q.task_done()
+            if next_maintenance is not None and time.monotonic() >= next_maintenance:
+                try:
+                    self.apply_retention()
+                    self.compact()
+                except Exception:
+                    pass  # keep compressing; maintenance retries next interval
+                next_maintenance = time.monotonic() + interval
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+
+    def apply_retention(self, now_ns: Optional[int] = None) -> List[str]:
+        """Delete partitions that ended more than ``retention_s`` ago; returns their names."""
+        if self.retention_s is None:
+            return []
+        now = now_ns if now_ns is not None else self.wall_clock_ns()
+        cutoff = now - int(self.retention_s * 1e9)
+        with self._lock:
+            open_partitions = set(self._active)
+        removed = []
+        for name in self.partitions():
+            lo = self._partition_start_wall_ns(name)
+            if lo + self.partition_ns <= cutoff and name not in open_partitions:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                removed.append(name)
+        return removed
+
+    def compact(self, partition: Optional[str] = None) -> int:
+        """Merge sealed segments smaller than ``compact_below_bytes`` per partition.
+
+        Lines are concatenated without re-parsing, in segment start order.
+        Returns the number of segments merged away.
+        """
+        merged = 0
+        for name in [partition] if partition is not None else self.partitions():
+            pdir = os.path.join(self.directory, name)
+            # Uncompressed sealed segments are still queued for compression: leave them be.
+            small = [
+                s
+                for s in self.segments_in(name)
+                if not s.active
+                and (s.compressed or self.compression is None)
+                and _size(s.path) < self.compact_below_bytes
+            ]
+            if len(small) < 2:
+                continue
+            lo = min(s.min_start_ns for s in small)
+            hi = max(s.max_start_ns for s in small)
+            base = f"{lo:020d}-{hi:020d}-{os.getpid()}-{next(_seq):06d}{_SUFFIX}"
+            target = os.path.join(pdir, base + _EXTENSIONS[self.compression])
+            tmp = f"{target}.tmp-{os.getpid()}"
+            chunks = (line for s in small for line in _read_lines_raw(s.path))
+            if self.compression is None:
+                with open(tmp, "wb") as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+            else:
+                self._write_compressed(tmp, chunks)
+            os.replace(tmp, target)
+            for s in small:
+                try:
+                    os.unlink(s.path)
+                except FileNotFoundError:
+                    pass
+            merged += len(small) - 1
+        return merged
+
+    def segments_in(self, partition: str) -> List[SegmentInfo]:
+        """All segments of one partition (sealed in start order, then active ones)."""
+        pdir = os.path.join(self.directory, partition)
+        try:
+            names = os.listdir(pdir)
+        except FileNotFoundError:
+            return []
+        infos = [i for i in (SegmentInfo.parse(pdir, n) for n in names) if i is not None]
+        # A segment being compressed briefly exists in both forms: keep the compressed one.
+        compressed = {i.path[: i.path.rindex(_SUFFIX) + len(_SUFFIX)] for i in infos if i.compressed}
+        return sorted(
+            (i for i in infos if i.compressed or i.path not in compressed),
+            key=lambda i: (i.active, i.min_start_ns or 0, i.path),
+        )
+
+    def disk_usage(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> int:
+        return sum(_size(s.path) for s in self.segments(start_ns=start_ns, end_ns=end_ns))
+
+    # -------------------------
+    # Reading
+    # -------------------------
+
+    def iter_spans(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[Span]:
+        """Spans starting in [start_ns, end_ns), segment by segment (start order within a writer)."""
+        lo = start_ns if start_ns is not None else -(1 << 63)
+        hi = end_ns if end_ns is not None else 1 << 63
+        bounded = start_ns is not None or end_ns is not None
+        for seg in self.segments(start_ns=start_ns, end_ns=end_ns):
+            inside = not seg.active and lo <= seg.min_start_ns and seg.max_start_ns < hi
+            try:
+                for line in _read_lines(seg.path):
+                    d = json.loads(line)
+                    if bounded and not inside and not lo <= d["start_ns"] < hi:
+                        continue
+                    yield Span.from_dict(d)
+            except FileNotFoundError:
+                continue  # compressed/compacted/expired since listing
+
+    def read_all(self) -> List[Span]:
+        return list(self.iter_spans())
+
+    def iter_traces(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[List[Span]]:
+        """One list of spans per trace among the spans in the window."""
+        by_trace: Dict[str, List[Span]] = {}
+        for span in self.iter_spans(start_ns=start_ns, end_ns=end_ns):
+            by_trace.setdefault(span.trace_id, []).append(span)
+        yield from by_trace.values()
+
+    def get_trace(
+        self, trace_id: str, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+    ) -> List[Span]:
+        """Spans of one trace (scan; narrow it with a time window when known)."""
+        # Byte pre-filter; an attribute may contain the same text, so the
+        # parsed trace_id is what decides.
+        needle = f'"trace_id": "{trace_id}"'.encode("utf-8")
+        out = []
+        for seg in self.segments(start_ns=start_ns, end_ns=end_ns):
+            try:
+                for line in _read_lines(seg.path):
+                    if needle in line:
+                        d = json.loads(line)
+                        if d.get("trace_id") == trace_id:
+                            out.append(Span.from_dict(d))
+            except FileNotFoundError:
+                continue
+        return out
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _read_raw(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _read_lines_raw(path: str) -> Iterator[bytes]:
+    for line in _read_lines(path):
+        yield line if line.endswith(b"\n") else line + b"\n"
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import glob
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from latency.batch import LatencyTable, extract_latency_table
+from latency.columnar import NULL, NULL_NS, SpanColumns
+from latency.extract import LatencyFeatures
+from spanrecorder.span import _STATUS_BY_CODE, Span, SpanEvent
+
+# Segment layout (all offsets absolute, columns 8-byte aligned):
+#
+#   MAGIC | column bytes ... | footer JSON | u64 footer length | MAGIC
+#
+# The footer lists every column as [offset, nbytes, typecode] plus segment
+# stats (row count, start_ns range) used to prune segments before mapping them.
+
+MAGIC = b"ETSEG001"
+SEGMENT_SUFFIX = ".seg"
+
+# Attributes promoted to their own dictionary-encoded columns (what the
+# latency taxonomy reads). They are also kept in the attribute blob.
+PROMOTED_KEYS = ("kind", "component", "phase")
+
+
+class _Dictionary:
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return NULL
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.codes)
+        return c
+
+    def encode(self) -> Tuple[array, bytes]:
+        offsets = array("q", [0])
+        data = bytearray()
+        for s in self.codes:  # insertion order == code order
+            data += s.encode("utf-8")
+            offsets.append(len(data))
+        return offsets, bytes(data)
+
+
+class StringTable:
+    """Dictionary decoded lazily from a mapped segment (code -> str)."""
+
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self._offsets = offsets
+        self._data = data
+        self._text: Optional[str] = None
+        self._bounds: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        if self._text is None:
+            # Decode the table once on first use; byte offsets equal character
+            # offsets when it is pure ASCII (ids, span names), the common case.
+            text = str(self._data, "utf-8")
+            if len(text) == len(self._data):
+                self._bounds = self._offsets.tolist()
+            self._text = text
+        if self._bounds is not None:
+            return self._text[self._bounds[code] : self._bounds[code + 1]]
+        return str(self._data[self._offsets[code] : self._offsets[code + 1]], "utf-8")
+
+
+def write_segment(path: str, spans: Iterable[Span]) -> int:
+    """Write ``spans`` as one immutable segment (atomically). Returns the row count."""
+    ids, labels, keys = _Dictionary(), _Dictionary(), _Dictionary()
+    cols: Dict[str, array] = {
+        "trace": array("i"),
+        "span": array("i"),
+        "parent": array("i"),
+        "start_ns": array("q"),
+        "end_ns": array("q"),
+        "status": array("b"),
+        "name": array("i"),
+        "kind": array("i"),
+        "component": array("i"),
+        "phase": array("i"),
+        "attr_key_offsets": array("q", [0]),
+        "attr_keys": array("i"),
+        "blob_offsets": array("q", [0]),
+    }
+    blob = bytearray()
+
+    for s in spans:
+        attrs = s.attributes
+        cols["trace"].append(ids.code(s.trace_id))
+        cols["span"].append(ids.code(s.span_id))
+        cols["parent"].append(ids.code(s.parent_id))
+        cols["start_ns"].append(s.start_ns)
+        cols["end_ns"].append(s.end_ns if s.end_ns is not None else NULL_NS)
+        cols["status"].append(s._status)  # span.py's code, as in OTLP
+        cols["name"].append(labels.code(s.name))
+        for k in PROMOTED_KEYS:
+            v = attrs.get(k)
+            cols[k].append(labels.code(str(v) if v is not None else None))
+
+        cols["attr_keys"].extend(keys.code(k) for k in attrs)
+        cols["attr_key_offsets"].append(len(cols["attr_keys"]))
+        if attrs or s.events or s.exception_type is not None:
+            rec = [
+                list(attrs.values()),
+                [[e.name, e.ts_ns, e.attributes] for e in s.events],
+                [s.exception_type, s.exception_message] if s.exception_type is not None else None,
+            ]
+            blob += json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cols["blob_offsets"].append(len(blob))
+
+    n = len(cols["start_ns"])
+    raw: Dict[str, Any] = dict(cols)
+    for table_name, table in (("ids", ids), ("labels", labels), ("keys", keys)):
+        offsets, data = table.encode()
+        raw[f"{table_name}.offsets"] = offsets
+        raw[f"{table_name}.data"] = data
+    raw["blob"] = bytes(blob)
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        layout: Dict[str, List[Any]] = {}
+        for col_name, col in raw.items():
+            pos = f.tell()
+            if pos % 8:
+                f.write(b"\0" * (8 - pos % 8))
+                pos = f.tell()
+            data = col.tobytes() if isinstance(col, array) else col
+            f.write(data)
+            layout[col_name] = [pos, len(data), col.typecode if isinstance(col, array) else "B"]
+        starts = cols["start_ns"]
+        footer = json.dumps(
+            {
+                "rows": n,
+                "byteorder": sys.byteorder,
+                "columns": layout,
+                "min_start_ns": min(starts) if n else None,
+                "max_start_ns": max(starts) if n else None,
+            }
+        ).encode("utf-8")
+        f.write(footer)
+        f.write(struct.pack("<Q", len(footer)))
+        f.write(MAGIC)
+    os.replace(tmp, path)
+    return n
+
+
+def read_footer(path: str) -> Dict[str, Any]:
+    """A segment's footer, read from the end of the file without mapping it."""
+    tail = len(MAGIC) + 8
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < len(MAGIC) + tail:
+            raise ValueError(f"Not a trace segment: {path}")
+        f.seek(size - tail)
+        raw = f.read(tail)
+        if raw[8:] != MAGIC:
+            raise ValueError(f"Not a trace segment: {path}")
+        (footer_len,) = struct.unpack("<Q", raw[:8])
+        f.seek(size - tail - footer_len)
+        return json.loads(f.read(footer_len))
+
+
+class SegmentReader:
+    """Memory-mapped, read-only view of one segment.
+
+    column(name) returns a zero-copy memoryview typed by the column's array
+    typecode; span_columns() bundles what latency.columnar needs.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[: len(MAGIC)] != MAGIC or mm[-len(MAGIC) :] != MAGIC:
+            raise ValueError(f"Not a trace segment: {path}")
+        (footer_len,) = struct.unpack("<Q", mm[-len(MAGIC) - 8 : -len(MAGIC)])
+        footer_end = len(mm) - len(MAGIC) - 8
+        self.footer: Dict[str, Any] = json.loads(mm[footer_end - footer_len : footer_end])
+        if self.footer["byteorder"] != sys.byteorder:
+            raise ValueError(f"Segment {path} was written with {self.footer['byteorder']}-endian columns")
+        self._view = memoryview(mm)
+        self._columns: Dict[str, memoryview] = {}
+        self._tables: Dict[str, StringTable] = {}
+
+    def __len__(self) -> int:
+        return self.footer["rows"]
+
+    def __enter__(self) -> "SegmentReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+        return False
+
+    def close(self) -> None:
+        self._tables.clear()
+        self._columns.clear()
+        self._view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # caller still holds column views; the mapping goes away with them
+
+    def column(self, name: str) -> memoryview:
+        view = self._columns.get(name)
+        if view is None:
+            offset, nbytes, typecode = self.footer["columns"][name]
+            view = self._view[offset : offset + nbytes]
+            if typecode != "B":
+                view = view.cast(typecode)
+            self._columns[name] = view
+        return view
+
+    def table(self, name: str) -> StringTable:
+        t = self._tables.get(name)
+        if t is None:
+            t = self._tables[name] = StringTable(self.column(f"{name}.offsets"), self.column(f"{name}.data"))
+        return t
+
+    def span_columns(self) -> SpanColumns:
+        c = self.column
+        return SpanColumns(
+            trace=c("trace"),
+            span=c("span"),
+            parent=c("parent"),
+            start_ns=c("start_ns"),
+            end_ns=c("end_ns"),
+            name=c("name"),
+            kind=c("kind"),
+            component=c("component"),
+            phase=c("phase"),
+            ids=self.table("ids"),
+            labels=self.table("labels"),
+        )
+
+    def span(self, i: int) -> Span:
+        ids, labels, keys = self.table("ids"), self.table("labels"), self.table("keys")
+        key_offsets, blob_offsets = self.column("attr_key_offsets"), self.column("blob_offsets")
+        parent, end = self.column("parent")[i], self.column("end_ns")[i]
+
+        attrs: Dict[str, Any] = {}
+        events: List[SpanEvent] = []
+        exc = None
+        b0, b1 = blob_offsets[i], blob_offsets[i + 1]
+        if b1 > b0:
+            values, raw_events, exc = json.loads(bytes(self.column("blob")[b0:b1]))
+            attr_keys = self.column("attr_keys")[key_offsets[i] : key_offsets[i + 1]]
+            attrs = {keys[k]: v for k, v in zip(attr_keys, values)}
+            events = [SpanEvent(name=e[0], ts_ns=e[1], attributes=e[2]) for e in raw_events]
+
+        return Span(
+            name=labels[self.column("name")[i]],
+            trace_id=ids[self.column("trace")[i]],
+            span_id=ids[self.column("span")[i]],
+            parent_id=ids[parent] if parent != NULL else None,
+            start_ns=self.column("start_ns")[i],
+            end_ns=end if end != NULL_NS else None,
+            status=_STATUS_BY_CODE[self.column("status")[i]],
+            attributes=attrs or None,
+            events=events or None,
+            exception_type=exc[0] if exc else None,
+            exception_message=exc[1] if exc else None,
+        )
+
+    def iter_spans(self) -> Iterator[Span]:
+        for i in range(len(self)):
+            yield self.span(i)
+
+
+_seq = itertools.count()
+
+
+@dataclass
+class SegmentTraceStore:
+    """Directory of immutable columnar segments; one segment per write() call.
+
+    Segment names embed the write time, pid and a per-process counter, so
+    concurrent writers never touch the same file and lexical order is write
+    order. Batch writes (e.g. via BatchSpanProcessor) to keep segments large.
+    """
+
+    directory: str
+
+    def write(self, spans: Iterable[Span]) -> None:
+        spans = list(spans)
+        if not spans:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(_seq):06d}{SEGMENT_SUFFIX}"
+        write_segment(os.path.join(self.directory, name), spans)
+
+    def segment_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, f"*{SEGMENT_SUFFIX}")))
+
+    def segment_paths_in(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> List[str]:
+        """Segments whose start_ns range overlaps [start_ns, end_ns), pruned on footers alone."""
+        out = []
+        for path in self.segment_paths():
+            if start_ns is None and end_ns is None:
+                out.append(path)
+                continue
+            footer = read_footer(path)
+            lo, hi = footer["min_start_ns"], footer["max_start_ns"]
+            if lo is None:
+                continue
+            if start_ns is not None and hi < start_ns:
+                continue
+            if end_ns is not None and lo >= end_ns:
+                continue
+            out.append(path)
+        return out
+
+    def iter_segments(
+        self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+    ) -> Iterator[SegmentReader]:
+        """Yield readers for segments whose start_ns range overlaps [start_ns, end_ns)."""
+        for path in self.segment_paths_in(start_ns=start_ns, end_ns=end_ns):
+            with SegmentReader(path) as seg:
+                if len(seg):
+                    yield seg
+
+    def read_all(self) -> List[Span]:
+        return list(self.iter_spans())
+
+    def iter_spans(
+        self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+    ) -> Iterator[Span]:
+        for seg in self.iter_segments(start_ns=start_ns, end_ns=end_ns):
+            starts = seg.column("start_ns")
+            for i in range(len(seg)):
+                if start_ns is not None and starts[i] < start_ns:
+                    continue
+                if end_ns is not None and starts[i] >= end_ns:
+                    continue
+                yield seg.span(i)
+
+    def latency_table(
+        self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None, attribution: bool = False
+    ) -> LatencyTable:
+        """LatencyFeatures for every trace, computed from the mapped columns (no Span objects)."""
+        readers = [SegmentReader(p) for p in self.segment_paths_in(start_ns=start_ns, end_ns=end_ns)]
+        try:
+            batches = [seg.span_columns() for seg in readers if len(seg)]
+            return extract_latency_table(*batches, attribution=attribution)
+        finally:
+            del batches
+            for seg in readers:
+                seg.close()
+
+    def latency_features(
+        self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None, attribution: bool = False
+    ) -> List[LatencyFeatures]:
+        return list(self.latency_table(start_ns=start_ns, end_ns=end_ns, attribution=attribution))
+
+    def iter_traces(self) -> Iterator[List[Span]]:
+        """Yield one list of spans per trace (traces may straddle segments)."""
+        by_trace: Dict[str, List[Span]] = {}
+        for span in self.iter_spans():
+            by_trace.setdefault(span.trace_id, []).append(span)
+        yield from by_trace.values()
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        trace_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        rubric TEXT,
+        ts_ns INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        PRIMARY KEY (trace_id, kind)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS results_kind_ts ON results (kind, ts_ns)",
+    "CREATE INDEX IF NOT EXISTS results_rubric_ts ON results (rubric, ts_ns) WHERE rubric IS NOT NULL",
+)
+
+
+class ResultNotFound(KeyError, FileNotFoundError):
+    """No result for (trace_id, kind); also a FileNotFoundError, like JsonResultStore.read()."""
+
+
+@dataclass(frozen=True, slots=True)
+class ResultRow:
+    trace_id: str
+    kind: str
+    rubric: Optional[str]
+    ts_ns: int
+    payload: Dict[str, Any]
+
+
+def _dumps(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _rubric(payload: Dict[str, Any]) -> Optional[str]:
+    rubric = payload.get("rubric_name")
+    return rubric if isinstance(rubric, str) else None
+
+
+class SqliteResultStore:
+    """ResultStore in one SQLite database (WAL mode) instead of a file per result.
+
+    One row per (trace_id, kind); writing the same pair again replaces it.
+    ``rubric`` is taken from ``payload["rubric_name"]`` (judge results) and
+    ``ts_ns`` is the wall-clock write time unless given, so results can be
+    queried by trace, kind, rubric and time range through indexes, and
+    several kinds (e.g. judge results and latency features) joined per trace.
+    Writes share one connection behind a lock; query() and join() scans
+    open their own, so they can run while other threads write. An in-memory
+    database (``":memory:"`` or ``""``) exists only on that one connection,
+    so its scans run there under the lock instead.
+    """
+
+    def __init__(self, path: str, *, timeout_s: float = 30.0) -> None:
+        self.path = path
+        self.timeout_s = timeout_s
+        self._in_memory = path in ("", ":memory:")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout_s, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._migrate()
+
+    def _migrate(self) -> None:
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.path}: schema version {version} is newer than supported {SCHEMA_VERSION}")
+        if version < SCHEMA_VERSION:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for stmt in _SCHEMA:
+                    self._conn.execute(stmt)
+                self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # -------------------------
+    # Writing
+    # -------------------------
+
+    def write(self, trace_id: str, kind: str, payload: Dict[str, Any], *, ts_ns: Optional[int] = None) -> None:
+        self.write_many([(trace_id, kind, payload)], ts_ns=ts_ns)
+
+    def write_many(
+        self,
+        results: Iterable[Tuple[str, str, Dict[str, Any]]],
+        *,
+        ts_ns: Optional[int] = None,
+        batch_size: int = 5000,
+    ) -> int:
+        """Insert or replace ``(trace_id, kind, payload)`` rows; one transaction per ``batch_size`` rows."""
+        ts = ts_ns if ts_ns is not None else time.time_ns()
+        written = 0
+        batch: List[Tuple[str, str, Optional[str], int, str]] = []
+        for trace_id, kind, payload in results:
+            batch.append((trace_id, kind, _rubric(payload), ts, _dumps(payload)))
+            if len(batch) >= batch_size:
+                written += self._insert(batch)
+                batch = []
+        if batch:
+            written += self._insert(batch)
+        return written
+
+    def _insert(self, rows: List[Tuple[str, str, Optional[str], int, str]]) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO results (trace_id, kind, rubric, ts_ns, payload) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def delete(self, trace_id: str, kind: Optional[str] = None) -> int:
+        sql, args = "DELETE FROM results WHERE trace_id = ?", [trace_id]
+        if kind is not None:
+            sql += " AND kind = ?"
+            args.append(kind)
+        with self._lock:
+            return self._conn.execute(sql, args).rowcount
+
+    # -------------------------
+    # Reading
+    # -------------------------
+
+    def read(self, trace_id: str, kind: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM results WHERE trace_id = ? AND kind = ?", (trace_id, kind)
+            ).fetchone()
+        if row is None:
+            raise ResultNotFound(f"{trace_id}.{kind}")
+        return json.loads(row[0])
+
+    def read_many(self, trace_ids: Iterable[str], kind: str) -> Dict[str, Dict[str, Any]]:
+        """Payloads of ``kind`` for the given traces; missing ones are left out."""
+        out: Dict[str, Dict[str, Any]] = {}
+        ids = list(dict.fromkeys(trace_ids))
+        for i in range(0, len(ids), 500):  # stay under SQLite's bound-parameter limit
+            chunk = ids[i : i + 500]
+            marks = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT trace_id, payload FROM results WHERE kind = ? AND trace_id IN ({marks})",
+                    [kind, *chunk],
+                ).fetchall()
+            for trace_id, payload in rows:
+                out[trace_id] = json.loads(payload)
+        return out
+
+    def _where(
+        self,
+        *,
+        trace_id: Optional[str],
+        kinds: Optional[Sequence[str]],
+        rubric: Optional[str],
+        start_ns: Optional[int],
+        end_ns: Optional[int],
+    ) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        args: List[Any] = []
+        if trace_id is not None:
+            clauses.append("trace_id = ?")
+            args.append(trace_id)
+        if kinds is not None:
+            clauses.append(f"kind IN ({','.join('?' * len(kinds))})")
+            args.extend(kinds)
+        if rubric is not None:
+            clauses.append("rubric = ?")
+            args.append(rubric)
+        if start_ns is not None:
+            clauses.append("ts_ns >= ?")
+            args.append(start_ns)
+        if end_ns is not None:
+            clauses.append("ts_ns < ?")
+            args.append(end_ns)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def _rows(self, sql: str, args: Sequence[Any]) -> Iterator[tuple]:
+        if self._in_memory:
+            with self._lock:
+                rows = self._conn.execute(sql, args).fetchall()
+            yield from rows
+            return
+        # Scans use their own connection: WAL lets them read a consistent
+        # snapshot while the store keeps writing, without holding the lock.
+        conn = sqlite3.connect(self.path, timeout=self.timeout_s)
+        try:
+            cur = conn.execute(sql, args)
+            while True:
+                rows = cur.fetchmany(1000)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            conn.close()
+
+    def query(
+        self,
+        *,
+        trace_id: Optional[str] = None,
+        kind: Optional[str] = None,
+        rubric: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[ResultRow]:
+        """Results matching every given filter, oldest first; ``end_ns`` is exclusive."""
+        where, args = self._where(
+            trace_id=trace_id, kinds=None if kind is None else [kind], rubric=rubric, start_ns=start_ns, end_ns=end_ns
+        )
+        sql = f"SELECT trace_id, kind, rubric, ts_ns, payload FROM results{where} ORDER BY ts_ns, trace_id, kind"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        for trace_id_, kind_, rubric_, ts, payload in self._rows(sql, args):
+            yield ResultRow(trace_id_, kind_, rubric_, ts, json.loads(payload))
+
+    def join(
+        self,
+        kinds: Sequence[str],
+        *,
+        rubric: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+        require_all: bool = True,
+    ) -> Iterator[Tuple[str, Dict[str, Dict[str, Any]]]]:
+        """``(trace_id, {kind: payload})`` per trace, e.g. ``join(["judge", "latency"])``.
+
+        ``rubric`` and the time range select traces through any of their
+        results of those kinds. With ``require_all``, traces missing one of
+        ``kinds`` are skipped.
+        """
+        kinds = list(kinds)
+        if not kinds:
+            return
+        marks = ",".join("?" * len(kinds))
+        sql = f"SELECT trace_id, kind, payload FROM results WHERE kind IN ({marks})"
+        args: List[Any] = list(kinds)
+        if rubric is not None or start_ns is not None or end_ns is not None:
+            where, sel_args = self._where(trace_id=None, kinds=kinds, rubric=rubric, start_ns=start_ns, end_ns=end_ns)
+            sql += f" AND trace_id IN (SELECT trace_id FROM results{where})"
+            args.extend(sel_args)
+        sql += " ORDER BY trace_id"
+
+        current: Optional[str] = None
+        group: Dict[str, Dict[str, Any]] = {}
+        for trace_id, kind, payload in self._rows(sql, args):
+            if trace_id != current:
+                if current is not None and (not require_all or len(group) == len(kinds)):
+                    yield current, group
+                current, group = trace_id, {}
+            group[kind] = json.loads(payload)
+        if current is not None and (not require_all or len(group) == len(kinds)):
+            yield current, group
+
+    def kinds(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT kind FROM results ORDER BY kind")]
+
+    def count(self, kind: Optional[str] = None) -> int:
+        where, args = self._where(
+            trace_id=None, kinds=None if kind is None else [kind], rubric=None, start_ns=None, end_ns=None
+        )
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM results{where}", args).fetchone()[0]
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SqliteResultStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _json_results(directory: str) -> Iterator[Tuple[str, str, Dict[str, Any], int]]:
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith(".json") or not entry.is_file():
+                continue
+            trace_id, sep, kind = name[: -len(".json")].partition(".")
+            if not sep or not kind:
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            yield trace_id, kind, payload, entry.stat().st_mtime_ns
+
+
+def migrate_json_results(directory: str, store: SqliteResultStore, *, batch_size: int = 5000) -> int:
+    """Copy a JsonResultStore directory (``{trace_id}.{kind}.json`` files) into ``store``.
+
+    File modification times become ``ts_ns``. The files are left in place;
+    running it again just rewrites the same rows.
+    """
+    written = 0
+    batch: List[Tuple[str, str, Optional[str], int, str]] = []
+    for trace_id, kind, payload, ts in _json_results(directory):
+        batch.append((trace_id, kind, _rubric(payload), ts, _dumps(payload)))
+        if len(batch) >= batch_size:
+            written += store._insert(batch)
+            batch = []
+    if batch:
+        written += store._insert(batch)
+    return written
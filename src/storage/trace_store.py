@@ -2,8 +2,8 @@ from __future__ import annotations
 
 import json
 import os
-from dataclasses import dataclass
-from typing import Iterable, List, Protocol
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
 
 from spanrecorder.span import Span
 
@@ -11,26 +11,207 @@ from spanrecorder.span import Span
 class TraceStore(Protocol):
     def write(self, spans: Iterable[Span]) -> None: ...
     def read_all(self) -> List[Span]: ...
+    def iter_spans(self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[Span]: ...
+    def iter_traces(self) -> Iterator[List[Span]]: ...
+
+
+_LEN_BITS = 32
+_LEN_MASK = (1 << _LEN_BITS) - 1
+
+
+class _TraceIndex:
+    """In-memory view of the sidecar index.
+
+    - ``lines``: trace_id -> packed ``offset << 32 | length`` of each span line
+    - ``blocks``: ``[first_offset, end_offset, min_start_ns, max_start_ns]``
+      per ~block_bytes of data, so time-range scans can skip whole blocks
+    - ``watermark``: data-file offset up to which everything is indexed
+    """
+
+    def __init__(self, block_bytes: int) -> None:
+        self.block_bytes = block_bytes
+        self.lines: Dict[str, List[int]] = {}
+        self.blocks: List[List[int]] = []
+        self.watermark = 0
+
+    def add(self, trace_id: str, offset: int, length: int, start_ns: int) -> None:
+        self.lines.setdefault(trace_id, []).append((offset << _LEN_BITS) | length)
+        end = offset + length
+        blocks = self.blocks
+        if not blocks or offset >= blocks[-1][0] + self.block_bytes:
+            blocks.append([offset, end, start_ns, start_ns])
+        else:
+            b = blocks[-1]
+            if end > b[1]:
+                b[1] = end
+            if start_ns < b[2]:
+                b[2] = start_ns
+            if start_ns > b[3]:
+                b[3] = start_ns
+        if end > self.watermark:
+            self.watermark = end
+
+
+def _index_line(trace_id: str, offset: int, length: int, start_ns: int) -> str:
+    return f"{trace_id}\t{offset}\t{length}\t{start_ns}\n"
 
 
 @dataclass
 class JsonlTraceStore:
+    """Append-only JSON-lines span file with a sidecar byte-offset index.
+
+    The index (``<path>.idx`` by default) maps trace_id -> line offsets and is
+    extended incrementally: write() appends entries for the lines it adds, and
+    any lines appended by someone else are indexed on the next read. It is
+    only needed by get_trace(), iter_traces() and time-ranged iter_spans();
+    a plain iter_spans() is a sequential constant-memory scan.
+    """
+
     path: str
+    index_path: Optional[str] = None
+    block_bytes: int = 1 << 20
+    _index: Optional[_TraceIndex] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.index_path is None:
+            self.index_path = self.path + ".idx"
+
+    # -------------------------
+    # Writing
+    # -------------------------
 
     def write(self, spans: Iterable[Span]) -> None:
         os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
-        with open(self.path, "a", encoding="utf-8") as f:
+        index = self._ensure_index()
+        entries: List[str] = []
+        with open(self.path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
             for s in spans:
-                f.write(json.dumps(s.to_dict(), ensure_ascii=False) + "\n")
+                line = (json.dumps(s.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                trace_id = s.trace_id
+                index.add(trace_id, offset, len(line), s.start_ns)
+                entries.append(_index_line(trace_id, offset, len(line), s.start_ns))
+                offset += len(line)
+        if entries:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.writelines(entries)
+
+    # -------------------------
+    # Reading
+    # -------------------------
 
     def read_all(self) -> List[Span]:
+        return list(self.iter_spans())
+
+    def iter_spans(
+        self, *, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+    ) -> Iterator[Span]:
+        """Yield spans in file order; with a time range, only spans starting in [start_ns, end_ns)."""
         if not os.path.exists(self.path):
+            return
+        if start_ns is None and end_ns is None:
+            with open(self.path, "rb") as f:
+                for _, raw in self._iter_lines(f, 0, None):
+                    yield Span.from_dict(json.loads(raw))
+            return
+
+        lo = start_ns if start_ns is not None else -(1 << 63)
+        hi = end_ns if end_ns is not None else 1 << 63
+        blocks = [b for b in self._ensure_index().blocks if b[3] >= lo and b[2] < hi]
+        with open(self.path, "rb") as f:
+            for first, end, _, _ in blocks:
+                for _, raw in self._iter_lines(f, first, end):
+                    d = json.loads(raw)
+                    if lo <= d["start_ns"] < hi:
+                        yield Span.from_dict(d)
+
+    def iter_traces(self) -> Iterator[List[Span]]:
+        """Yield one list of spans per trace, in order of each trace's last line.
+
+        Single sequential pass: a trace is emitted as soon as its last indexed
+        line has been read, so memory is bounded by how interleaved traces are
+        in the file rather than by its size.
+        """
+        if not os.path.exists(self.path):
+            return
+        index = self._ensure_index()
+        last_line = {tid: packed[-1] >> _LEN_BITS for tid, packed in index.lines.items()}
+        open_traces: Dict[str, List[Span]] = {}
+        with open(self.path, "rb") as f:
+            for offset, raw in self._iter_lines(f, 0, index.watermark):
+                span = Span.from_dict(json.loads(raw))
+                tid = span.trace_id
+                spans = open_traces.setdefault(tid, [])
+                spans.append(span)
+                if last_line.get(tid) == offset:
+                    del open_traces[tid]
+                    yield spans
+
+    def get_trace(self, trace_id: str) -> List[Span]:
+        """Read one trace by seeking straight to its lines."""
+        packed = self._ensure_index().lines.get(trace_id)
+        if not packed:
             return []
         spans: List[Span] = []
-        with open(self.path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                spans.append(Span.from_dict(json.loads(line)))
+        with open(self.path, "rb") as f:
+            for p in sorted(packed):
+                f.seek(p >> _LEN_BITS)
+                spans.append(Span.from_dict(json.loads(f.read(p & _LEN_MASK))))
         return spans
+
+    def trace_ids(self) -> List[str]:
+        return list(self._ensure_index().lines)
+
+    # -------------------------
+    # Index maintenance
+    # -------------------------
+
+    @staticmethod
+    def _iter_lines(f, start: int, end: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+        """Yield (offset, line) for complete, non-blank lines in [start, end)."""
+        f.seek(start)
+        offset = start
+        for raw in f:
+            if end is not None and offset >= end:
+                return
+            if not raw.endswith(b"\n"):
+                return  # partially written tail
+            if raw.strip():
+                yield offset, raw
+            offset += len(raw)
+
+    def _ensure_index(self) -> _TraceIndex:
+        index = self._index
+        if index is None:
+            index = self._index = self._load_index()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < index.watermark:
+            # Data file was truncated or replaced: start over.
+            index = self._index = _TraceIndex(self.block_bytes)
+            open(self.index_path, "w").close()
+        if size > index.watermark:
+            self._catch_up(index)
+        return index
+
+    def _load_index(self) -> _TraceIndex:
+        index = _TraceIndex(self.block_bytes)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 4:
+                        continue  # torn write
+                    index.add(parts[0], int(parts[1]), int(parts[2]), int(parts[3]))
+        return index
+
+    def _catch_up(self, index: _TraceIndex) -> None:
+        entries: List[str] = []
+        with open(self.path, "rb") as f:
+            for offset, raw in self._iter_lines(f, index.watermark, None):
+                d = json.loads(raw)
+                index.add(d["trace_id"], offset, len(raw), d["start_ns"])
+                entries.append(_index_line(d["trace_id"], offset, len(raw), d["start_ns"]))
+        if entries:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.writelines(entries)
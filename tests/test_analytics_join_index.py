@@ -0,0 +1,84 @@
+import math
+import random
+
+from analytics.join_index import QualityLatencyIndex
+from judge.scoring import JudgeResult
+from latency.extract import LatencyFeatures
+
+
+def _pair(i, retrieval_ms, llm_ms, score):
+    tid = "%032x" % (i + 1)
+    feats = LatencyFeatures(
+        trace_id=tid, total_ms=retrieval_ms + llm_ms, by_component_ms={"retrieval": retrieval_ms, "llm": llm_ms}
+    )
+    res = JudgeResult(tid, "rag", {"correctness": score, "clarity": 4}, overall=score)
+    return feats, res
+
+
+def _build(n=2000, seed=0):
+    rng = random.Random(seed)
+    index = QualityLatencyIndex(bucket_s=100)
+    pairs = []
+    for i in range(n):
+        retrieval = rng.uniform(10, 100)
+        llm = rng.uniform(100, 1000)
+        score = 5 if retrieval > 55 else 3  # slower retrieval (more context) scores better
+        pairs.append(_pair(i, retrieval, llm, score))
+    for i, (f, r) in enumerate(pairs):
+        dep = "v2" if i % 2 else "v1"
+        if i % 3:
+            index.add_latency(f, deployment=dep, ts=i * 0.1)
+            index.add_judge(r)
+        else:  # judge result first
+            index.add_judge(r.to_dict(), deployment=dep, ts=i * 0.1)
+            index.add_latency(f.to_dict())
+    return index, pairs
+
+
+def test_join_and_correlations():
+    index, _ = _build()
+    assert len(index) == index.joined == 2000
+    corr = {(c.component, c.dimension): c for c in index.correlations()}
+    assert corr[("retrieval", "correctness")].r > 0.8
+    assert abs(corr[("llm", "correctness")].r) < 0.1
+    assert ("retrieval", "clarity") not in corr  # constant score: undefined correlation
+    assert index.correlations()[0].component == "retrieval"
+
+
+def test_incremental_updates_match_rebuild():
+    index, pairs = _build(500)
+    # Re-judge a third of the traces, then compare to an index built from the final state.
+    final = {}
+    for i, (f, r) in enumerate(pairs):
+        if i % 3 == 0:
+            r = JudgeResult(r.trace_id, r.rubric_name, {"correctness": 1, "clarity": 2}, overall=1)
+            index.add_judge(r)
+        final[f.trace_id] = (f, r, "v2" if i % 2 else "v1", i * 0.1)
+    fresh = QualityLatencyIndex(bucket_s=100)
+    for f, r, dep, ts in final.values():
+        fresh.add_latency(f, deployment=dep, ts=ts)
+        fresh.add_judge(r)
+    a = {(c.component, c.dimension): c for c in index.correlations()}
+    b = {(c.component, c.dimension): c for c in fresh.correlations()}
+    assert a.keys() == b.keys()
+    for k in a:
+        assert a[k].n == b[k].n and math.isclose(a[k].r, b[k].r, abs_tol=1e-9)
+    assert index.score_by_latency_decile() == fresh.score_by_latency_decile()
+    assert index.deployment_trend("v1") == fresh.deployment_trend("v1")
+
+
+def test_deciles_and_trends():
+    index, _ = _build()
+    deciles = index.score_by_latency_decile()
+    assert sum(d.n for d in deciles) == 2000
+    assert [d.decile for d in deciles] == sorted(d.decile for d in deciles) and deciles[-1].decile == 10
+    assert all(abs(d.n - 200) < 100 for d in deciles)  # bins (~4% wide here) are never split
+    assert all(a.hi_ms <= b.lo_ms * 1.0001 for a, b in zip(deciles, deciles[1:]))
+
+    trend = index.deployment_trend("v1")
+    assert [p.bucket_start for p in trend] == [0.0, 100.0]
+    assert sum(p.n for p in trend) == 1000
+    assert trend[0].mean_scores["clarity"] == 4.0
+    assert index.deployment_trend("nope") == []
+    report = index.report()
+    assert report["joined"] == 2000 and set(report["deployment_trends"]) == {"None", "v1", "v2"}
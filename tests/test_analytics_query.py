@@ -0,0 +1,150 @@
+import pytest
+
+from analytics import QuerySyntaxError, TraceQuery, TraceQueryEngine
+from judge.scoring import JudgeResult
+from spanrecorder.span import Span, SpanStatus
+from storage import JsonlTraceStore, PartitionedTraceStore, SqliteResultStore
+
+MS = 10**6
+T0 = 1735689600 * 10**9
+
+
+def _trace(i, retrieval_ms, status=SpanStatus.OK):
+    tid = "%032x" % (i + 1)
+    t = T0 + i * 1000 * MS
+    root = Span("request", trace_id=tid, span_id="%016x" % (2 * i + 1), start_ns=t, end_ns=t + 900 * MS)
+    root.set_attribute("kind", "request")
+    ret = Span("retrieval.search", trace_id=tid, parent_id=root.span_id, start_ns=t, end_ns=t + retrieval_ms * MS)
+    ret.set_attribute("retrieval.top_k", 5 if i % 2 else 10)
+    llm = Span("llm.call", trace_id=tid, parent_id=root.span_id, start_ns=t + retrieval_ms * MS, end_ns=t + 800 * MS)
+    llm.status = status
+    return [ret, llm, root]  # end order, as exporters write
+
+
+def _setup(tmp_path, n=60):
+    store = JsonlTraceStore(str(tmp_path / "spans.jsonl"))
+    results = SqliteResultStore(str(tmp_path / "results.db"))
+    for i in range(n):
+        store.write(_trace(i, retrieval_ms=100 + 10 * i, status=SpanStatus.ERROR if i % 10 == 0 else SpanStatus.OK))
+        if i % 3 == 0:
+            res = JudgeResult("%032x" % (i + 1), "rag", {"grounding": i % 5 + 1}, overall=3)
+            results.write(res.trace_id, "judge", res.to_dict())
+    return store, results
+
+
+def test_parse_dsl():
+    q = TraceQuery.parse('traces where latency.retriever > 0.3s and judge.grounding < 3 and span.name in ("a", "b") limit 5')
+    assert [(p.field, p.op, p.value) for p in q.predicates] == [
+        ("latency.retriever", ">", 300.0),
+        ("judge.grounding", "<", 3),
+        ("span.name", "in", ("a", "b")),
+    ]
+    assert q.limit == 5
+    for bad in ["span.name ~ 'x'", "bogus.field = 1", "judge.grounding < 3ms", "span.name = 'x' limit", "span.name = "]:
+        with pytest.raises(QuerySyntaxError):
+            TraceQuery.parse(bad)
+
+
+def test_judge_and_latency_query_is_driven_by_results(tmp_path):
+    store, results = _setup(tmp_path)
+    engine = TraceQueryEngine(store, results)
+    query = "latency.retriever > 300ms and judge.grounding < 3"
+    assert engine.plan(query).source == "judge_results"
+
+    got = list(engine.run(query))
+    expected = [i for i in range(60) if i % 3 == 0 and 100 + 10 * i > 300 and i % 5 + 1 < 3]
+    assert sorted(m.trace_id for m in got) == sorted("%032x" % (i + 1) for i in expected)
+    assert all(m.judge["scores"]["grounding"] < 3 and m.latency.by_component_ms["retriever"] > 300 for m in got)
+
+    # Same answer from the scan plan (no scannable result store).
+    scan = TraceQueryEngine(store, _ReadOnly(results))
+    assert scan.plan(query).source == "scan"
+    assert sorted(m.trace_id for m in scan.run(query)) == sorted(m.trace_id for m in got)
+    results.close()
+
+
+class _ReadOnly:
+    def __init__(self, results):
+        self.results = results
+
+    def read(self, trace_id, kind):
+        return self.results.read(trace_id, kind)
+
+
+def test_span_predicates_window_ids_and_limit(tmp_path):
+    store, results = _setup(tmp_path)
+    engine = TraceQueryEngine(store, results)
+
+    errors = list(engine.run("span.name = 'llm.call' and span.status = 'ERROR'"))
+    assert len(errors) == 6
+    # All span predicates must hold on the same span.
+    assert engine.count("span.kind = 'request' and span.attr.retrieval.top_k = 5") == 0
+    assert engine.count("span.kind = 'retrieval.search' and span.attr.retrieval.top_k = 5") == 30
+
+    windowed = (
+        f"start_ns >= {T0 + 10 * 1000 * MS} and start_ns < {T0 + 20 * 1000 * MS}"
+        " and span.name = 'retrieval.search' and span.duration_ms >= 250ms"
+    )
+    assert engine.count(windowed) == 5  # traces 15..19 have retrieval >= 250 ms
+
+    ids = ["%032x" % 3, "%032x" % 4, "missing"]
+    q = TraceQuery().where("trace_id", "in", ids).where("latency.total_ms", "<", 1000)
+    assert engine.plan(q).source == "trace_ids"
+    assert [m.trace_id for m in engine.run(q)] == ids[:2]
+
+    # LIMIT stops reading the store early.
+    reads = []
+    spans = store.iter_spans
+
+    def counting(**kw):
+        for s in spans(**kw):
+            reads.append(s)
+            yield s
+
+    store.iter_spans = counting
+    assert len(list(engine.run("span.name = 'request' limit 3"))) == 3
+    assert len(reads) == 9
+    assert "limit 3" in engine.explain("span.name = 'request' limit 3")
+    results.close()
+
+
+def test_partitioned_store_window_pruning(tmp_path):
+    store = PartitionedTraceStore(str(tmp_path / "p"), clock_offset_ns=0, background=False, max_segment_bytes=4000)
+    for i in range(50):
+        store.write(_trace(i, retrieval_ms=100))
+    store.flush()
+    engine = TraceQueryEngine(store)
+    lo, hi = T0 + 20 * 1000 * MS, T0 + 25 * 1000 * MS
+    got = list(engine.run(f"start_ns >= {lo} and start_ns < {hi} and latency.retriever >= 100"))
+    assert [m.trace_id for m in got] == ["%032x" % (i + 1) for i in range(20, 25)]
+    assert len(store.segments(start_ns=lo, end_ns=hi)) < len(store.segments())
+
+
+def test_windowed_judge_query_scans_and_missing_components_never_match(tmp_path):
+    store, results = _setup(tmp_path, n=12)
+    engine = TraceQueryEngine(store, results)
+    windowed = f"start_ns >= {T0 + 3 * 1000 * MS} and judge.grounding >= 1"
+    assert engine.plan(windowed).source == "scan"
+    assert [m.trace_id for m in engine.run(windowed)] == ["%032x" % (i + 1) for i in (3, 6, 9)]
+
+    # No trace has a generator component: absent is not 0 ms.
+    assert engine.count("latency.generator < 1") == 0
+    assert engine.count("latency.self.generator < 1") == 0
+    assert engine.count("latency.share.generator < 1") == 0
+    assert engine.count("latency.retriever < 1000") == 12
+    results.close()
+
+
+def test_partitioned_store_groups_traces_split_across_segments(tmp_path):
+    store = PartitionedTraceStore(str(tmp_path / "p"), clock_offset_ns=0, background=False, max_segment_bytes=300)
+    ret, llm, root = _trace(0, retrieval_ms=100)
+    extra = [Span("rerank", trace_id=root.trace_id, parent_id=root.span_id, start_ns=T0 + i, end_ns=T0 + i + MS) for i in (1, 2)]
+    for s in [ret, llm] + extra:
+        store.write([s])  # each child rotates into its own segment
+    store.write([root])
+    store.flush()
+    assert len(store.segments()) > 1
+
+    got = list(TraceQueryEngine(store).run("latency.span_count >= 1"))
+    assert [m.trace_id for m in got] == [root.trace_id]
+    assert got[0].latency.span_count == 5
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from app.pipeline_hooks import instrumented_rag_example
+from judge.extract import build_judge_request, build_judge_requests
+from judge.rubrics.rag_answer_quality import RagAnswerQualityRubric
+from spanrecorder import (
+    BlobNotFound,
+    MemoryBlobStore,
+    OffloadingExporter,
+    SimpleSpanProcessor,
+    SpanRecorder,
+    StoreExporter,
+    is_blob_ref,
+    resolve_blobs,
+)
+from storage import FileBlobStore, JsonlTraceStore
+
+
+class _ListStore(list):
+    def write(self, spans):
+        self.extend(spans)
+
+
+def _traces(rec, n, doc_text, answer):
+    for i in range(n):
+        with rec.start_span("request", attrs={"kind": "request", "user.query": f"q{i}"}):
+            passages = [{"id": "popular", "text": doc_text}, {"id": f"d{i}", "text": f"short {i}"}]
+            with rec.start_span("retrieval", attrs={"kind": "retrieval", "retrieval.passages": passages}):
+                pass
+            with rec.start_span("response", attrs={"assistant.answer": answer}):
+                pass
+
+
+def test_large_attributes_are_stored_once(tmp_path):
+    blobs = FileBlobStore(str(tmp_path / "blobs"))
+    store = JsonlTraceStore(str(tmp_path / "spans.jsonl"))
+    exporter = OffloadingExporter(StoreExporter(store), blobs, max_inline_bytes=512)
+    rec = SpanRecorder(processors=[SimpleSpanProcessor(exporter)], keep_spans=False)
+
+    doc, answer = "popular document " * 200, "long answer " * 100
+    _traces(rec, 20, doc, answer)
+
+    assert blobs.writes == 2  # the shared passage and the shared answer
+    assert exporter.offloaded_values == 40
+    assert (tmp_path / "spans.jsonl").stat().st_size < 20 * (len(doc) + len(answer)) / 3
+
+    spans = store.read_all()
+    passages = next(s for s in spans if s.name == "retrieval").attributes["retrieval.passages"]
+    assert is_blob_ref(passages[0]) and passages[1] == {"id": "d0", "text": "short 0"}
+    assert resolve_blobs(passages, blobs)[0] == {"id": "popular", "text": doc}
+
+    req = build_judge_request(store.get_trace(spans[0].trace_id), RagAnswerQualityRubric(), blobs=blobs)
+    assert req.payload["final_answer"] == answer
+    assert req.payload["retrieved_context"][0][0]["text"] == doc
+    assert doc in req.prompt
+
+    reqs = list(build_judge_requests(spans, RagAnswerQualityRubric(), blobs=blobs))
+    assert len(reqs) == 20 and all(r.payload["final_answer"] == answer for r in reqs)
+
+
+def test_small_values_and_scalars_stay_inline():
+    blobs = MemoryBlobStore()
+    exported, plain = _ListStore(), _ListStore()
+    exporter = OffloadingExporter(StoreExporter(exported), blobs, max_inline_bytes=64)
+    rec = SpanRecorder(processors=[SimpleSpanProcessor(exporter), SimpleSpanProcessor(StoreExporter(plain))])
+    original = {"n": 10**12, "s": "short", "big": "x" * 100, "blob": {"k": "v" * 100}}
+    with rec.start_span("x", attrs=original):
+        pass
+    attrs = exported[0].attributes
+    assert attrs["n"] == 10**12 and attrs["s"] == "short"
+    assert is_blob_ref(attrs["big"]) and attrs["big"]["enc"] == "text"
+    assert resolve_blobs(attrs, blobs)["blob"] == {"k": "v" * 100}
+    json.dumps(exported[0].to_dict())  # references are plain JSON
+    assert exported[0].span_id == rec.get_spans()[0].span_id
+
+    # The recorded span is not rewritten: other exporters and get_spans() see the values.
+    assert rec.get_spans()[0].attributes == original
+    assert plain[0].attributes == original
+
+    with pytest.raises(BlobNotFound):
+        resolve_blobs({"$blob": "0" * 64, "size": 1, "enc": "text"}, MemoryBlobStore())
+
+
+def test_pipeline_example_feeds_judge_request():
+    rec = SpanRecorder()
+    assert instrumented_rag_example(rec, "what?") == "This is a placeholder answer."
+    req = build_judge_request(rec.get_spans(), RagAnswerQualityRubric())
+    assert req.payload["user_query"] == "what?"
+    assert req.payload["final_answer"] == "This is a placeholder answer."
+    assert req.payload["retrieved_context"][0][0]["id"] == "doc1"
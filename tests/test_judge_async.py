@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from judge.async_runner import (
+    JudgeBatchConfig,
+    TokenBucket,
+    TransientJudgeError,
+    arun_judge_many,
+    run_judge_batch,
+)
+from judge.extract import JudgeRequest
+
+
+def _requests(n):
+    return [JudgeRequest(trace_id=f"t{i}", rubric_name="r", prompt=f"prompt {i}", payload={}) for i in range(n)]
+
+
+def _answer(prompt):
+    return json.dumps({"scores": {"correctness": 4}, "overall": int(prompt.split()[-1]) % 5 + 1})
+
+
+class FakeAsyncClient:
+    """Injects per-prompt latency and a number of transient failures per prompt."""
+
+    def __init__(self, delay=0.0, failures=None, hang=()):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.hang = set(hang)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def acomplete(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(10 if prompt in self.hang else self.delay)
+            if self.failures.get(prompt, 0) > 0:
+                self.failures[prompt] -= 1
+                raise TransientJudgeError("429")
+            return _answer(prompt)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_streams_results_with_bounded_concurrency():
+    client = FakeAsyncClient(delay=0.01)
+    config = JudgeBatchConfig(max_concurrency=4)
+    results = [r async for r in arun_judge_many(iter(_requests(20)), client, config)]
+    assert sorted(r.trace_id for r in results) == sorted(f"t{i}" for i in range(20))
+    assert client.max_in_flight == 4
+    assert all(r.scores == {"correctness": 4} for r in results)
+
+
+def test_retries_timeouts_and_input_order():
+    client = FakeAsyncClient(failures={"prompt 1": 2, "prompt 2": 5}, hang={"prompt 3"})
+    config = JudgeBatchConfig(max_concurrency=8, max_retries=2, backoff_base_s=0.001, timeout_s=0.05)
+    results = run_judge_batch(_requests(5), client, config)
+
+    assert [r.trace_id for r in results] == ["t0", "t1", "t2", "t3", "t4"]
+    assert results[1].overall == 2  # succeeded on the third attempt
+    assert results[2].raw == {"error": "TransientJudgeError", "message": "429", "attempts": 3}
+    assert results[3].raw["error"] == "TimeoutError"
+    assert results[4].overall == 5
+
+
+def test_sync_client_runs_on_thread_pool():
+    threads = set()
+
+    class SyncClient:
+        def complete(self, prompt):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.01)
+            return _answer(prompt)
+
+    results = run_judge_batch(_requests(8), SyncClient(), JudgeBatchConfig(max_concurrency=4))
+    assert [r.overall for r in results] == [i % 5 + 1 for i in range(8)]
+    assert all(name.startswith("evaltrace-judge") for name in threads)
+
+
+def test_token_bucket_reserves_in_arrival_order():
+    now = [0.0]
+    bucket = TokenBucket(rate=10.0, capacity=2.0, clock=lambda: now[0])
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    now[0] = 1.0
+    assert bucket.reserve(5) == pytest.approx(0.3)
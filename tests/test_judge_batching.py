@@ -0,0 +1,84 @@
+import asyncio
+import json
+import re
+
+from judge.batching import arun_judge_batched, build_batch_prompt, plan_batches, run_judge_batched, split_batch_output
+from judge.extract import JudgeRequest
+from judge.prompts.templates import compile_prompt
+from judge.rubrics.rag_answer_quality import RagAnswerQualityRubric
+from judge.tokens import estimate_tokens
+
+RUBRIC = RagAnswerQualityRubric()
+DIMS = {"correctness": 4, "grounding": 4, "completeness": 3, "clarity": 5}
+
+
+def _req(i, answer="short answer"):
+    payload = {"user_query": f"q{i}", "final_answer": answer, "retrieved_context": [], "tool_calls": []}
+    prompt = compile_prompt(RUBRIC).render(payload)
+    return JudgeRequest(trace_id=f"t{i}", rubric_name=RUBRIC.name, prompt=prompt, payload=payload, rubric_version="1")
+
+
+class BatchClient:
+    """Answers batches with an array, skipping/garbling the ids in ``skip``."""
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def complete(self, prompt):
+        if "EVALUATION_INPUTS" in prompt:
+            self.batch_calls += 1
+            ids = re.findall(r'"trace_id":"(t\d+)"', prompt)
+            out = []
+            for tid in ids:
+                if tid in self.skip:
+                    out.append({"trace_id": tid, "scores": {"correctness": 2}})  # missing dimensions
+                else:
+                    out.append({"trace_id": tid, "scores": DIMS, "overall": 4, "rationale": tid})
+            return "```json\n" + json.dumps(out) + "\n```"
+        self.single_calls += 1
+        return json.dumps({"scores": DIMS, "overall": 1, "rationale": "single"})
+
+
+def test_batches_adapt_to_token_budget():
+    reqs = [_req(i) for i in range(10)] + [_req(10, answer="x" * 40_000)]
+    batches = plan_batches(reqs, RUBRIC, token_budget=8000, max_batch_size=8)
+    assert [len(b) for b in batches] == [8, 2, 1]
+    assert sum(batches, []) == list(range(11))
+
+    small = plan_batches(reqs[:10], RUBRIC, token_budget=1500)
+    assert 1 < len(small[0]) < 8
+    for batch in small:
+        members = [reqs[i] for i in batch]
+        assert estimate_tokens(build_batch_prompt(members, RUBRIC)) + 150 * len(batch) <= 1500
+
+
+def test_batched_results_split_with_single_call_fallback():
+    reqs = [_req(i) for i in range(6)]
+    client = BatchClient(skip={"t2"})
+    results = run_judge_batched(reqs, client, RUBRIC, max_batch_size=6)
+    assert [r.trace_id for r in results] == [f"t{i}" for i in range(6)]
+    assert client.batch_calls == 1 and client.single_calls == 1
+    assert results[0].rationale == "t0" and results[0].scores == DIMS
+    assert results[2].rationale == "single"
+
+
+def test_split_accepts_keyed_objects_and_rejects_garbage():
+    reqs = [_req(0), _req(1)]
+    keyed = json.dumps({"t0": {"scores": DIMS, "overall": 3}, "zzz": {"scores": DIMS}})
+    assert list(split_batch_output(keyed, reqs, RUBRIC)) == ["t0"]
+    assert split_batch_output("not json", reqs, RUBRIC) == {}
+
+
+def test_async_batched_matches_sync():
+    class AsyncBatchClient(BatchClient):
+        async def acomplete(self, prompt):
+            await asyncio.sleep(0.001)
+            return self.complete(prompt)
+
+    client = AsyncBatchClient(skip={"t5"})
+    reqs = [_req(i) for i in range(12)]
+    results = asyncio.run(arun_judge_batched(reqs, client, RUBRIC, max_batch_size=4))
+    assert [r.trace_id for r in results] == [f"t{i}" for i in range(12)]
+    assert (client.batch_calls, client.single_calls) == (3, 1)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from judge.async_runner import JudgeBatchConfig, run_judge_batch
+from judge.cache import JudgeCache, judge_cache_key, run_judge_cached
+from judge.extract import JudgeRequest
+
+
+def _req(trace_id, prompt="p", version="1"):
+    return JudgeRequest(trace_id=trace_id, rubric_name="r", prompt=prompt, payload={}, rubric_version=version)
+
+
+class CountingClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return json.dumps({"scores": {"correctness": 5}, "overall": 5, "rationale": prompt})
+
+
+def test_key_covers_rubric_version_prompt_and_model():
+    base = judge_cache_key("r", "1", "p", "m")
+    assert base == judge_cache_key("r", "1", "p", "m")
+    assert len({base, judge_cache_key("r", "2", "p", "m"), judge_cache_key("r", "1", "q", "m"),
+                judge_cache_key("r", "1", "p", "n"), judge_cache_key("r1", "", "p", "m")}) == 5
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    client = CountingClient()
+    cache = JudgeCache(model_id="m", directory=str(tmp_path))
+    first = run_judge_cached(_req("t1"), client, cache)
+    again = run_judge_cached(_req("t2"), client, cache)
+    assert client.calls == 1
+    assert again.trace_id == "t2" and again.scores == first.scores
+
+    # A fresh process only has the disk tier.
+    fresh = JudgeCache(model_id="m", directory=str(tmp_path))
+    assert run_judge_cached(_req("t3"), client, fresh).overall == 5
+    assert client.calls == 1
+    assert (fresh.stats.disk_hits, fresh.stats.misses) == (1, 0)
+    assert cache.stats.memory_hits == 1 and cache.stats.hit_rate == 0.5
+
+    run_judge_cached(_req("t4", version="2"), client, cache)
+    assert client.calls == 2
+
+
+def test_failures_are_not_cached():
+    class Broken:
+        calls = 0
+
+        def complete(self, prompt):
+            self.calls += 1
+            return "not json"
+
+    client, cache = Broken(), JudgeCache()
+    run_judge_cached(_req("a"), client, cache)
+    run_judge_cached(_req("b"), client, cache)
+    assert client.calls == 2
+
+
+def test_disk_eviction_by_size_and_age(tmp_path):
+    cache = JudgeCache(directory=str(tmp_path), max_bytes=2_000, max_entries=1)
+    client = CountingClient()
+    for i in range(30):
+        run_judge_cached(_req(f"t{i}", prompt=f"p{i}"), client, cache)
+    size = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(tmp_path) for f in fs)
+    assert size <= 2_000
+    assert cache.stats.evictions > 0
+
+    aged = JudgeCache(directory=str(tmp_path), max_age_s=0.0)
+    time.sleep(0.01)
+    assert aged.get(_req("x", prompt="p29")) is None
+
+
+def test_single_flight_across_threads():
+    client = CountingClient(delay=0.05)
+    cache = JudgeCache()
+    results = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(run_judge_cached(_req(f"t{i}"), client, cache)))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert client.calls == 1
+    assert sorted(r.trace_id for r in results) == [f"t{i}" for i in range(8)]
+    assert cache.stats.coalesced + cache.stats.memory_hits == 7
+
+
+def test_late_follower_does_not_call_again():
+    # The follower's lookup missed, then the leader stored the result and
+    # left the in-flight table before the follower took the lock.
+    client = CountingClient()
+    cache = JudgeCache()
+    run_judge_cached(_req("leader"), client, cache)
+    cache._lookup = lambda key: None
+    assert run_judge_cached(_req("late"), client, cache).trace_id == "late"
+    assert client.calls == 1
+
+
+def test_disk_tier_byte_count_under_concurrent_writes(tmp_path):
+    cache = JudgeCache(directory=str(tmp_path), max_bytes=1 << 30)
+    client = CountingClient()
+    threads = [
+        threading.Thread(target=lambda i=i: [run_judge_cached(_req("t", prompt=f"p{i}-{j}"), client, cache) for j in range(25)])
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    size = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(tmp_path) for f in fs)
+    assert cache._disk._bytes == size
+
+
+def test_async_batch_uses_cache_and_coalesces():
+    class AsyncClient:
+        calls = 0
+
+        async def acomplete(self, prompt):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return json.dumps({"scores": {"clarity": 3}, "overall": 3})
+
+    client, cache = AsyncClient(), JudgeCache(model_id="m")
+    reqs = [_req(f"t{i}", prompt=f"p{i % 3}") for i in range(12)]
+    results = run_judge_batch(reqs, client, JudgeBatchConfig(max_concurrency=12), cache=cache)
+    assert client.calls == 3
+    assert [r.trace_id for r in results] == [f"t{i}" for i in range(12)]
+    assert cache.stats.coalesced == 9
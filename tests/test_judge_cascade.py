@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from judge.cascade import CascadeConfig, JudgeTier, arun_judge_cascade, run_judge_cascade
+from judge.extract import JudgeRequest
+from judge.rubrics.rag_answer_quality import RagAnswerQualityRubric
+from judge.scoring import JudgeResult
+
+RUBRIC = RagAnswerQualityRubric()
+DIMS = {"correctness": 4, "grounding": 4, "completeness": 4, "clarity": 5}
+
+
+def _req(i=0):
+    return JudgeRequest(trace_id=f"t{i}", rubric_name=RUBRIC.name, prompt=f"prompt {i}", payload={})
+
+
+class ScriptedClient:
+    """Returns the given answers in turn (cycling)."""
+
+    def __init__(self, *answers):
+        self.answers = answers
+        self.calls = 0
+
+    def complete(self, prompt):
+        answer = self.answers[self.calls % len(self.answers)]
+        self.calls += 1
+        return answer if isinstance(answer, str) else json.dumps(answer)
+
+
+def _answer(overall=4, **scores):
+    return {"scores": {**DIMS, **scores}, "overall": overall, "rationale": "ok"}
+
+
+def test_confident_cheap_answer_is_not_escalated():
+    cheap, strong = ScriptedClient(_answer()), ScriptedClient(_answer(overall=5))
+    res = run_judge_cascade(_req(), [JudgeTier("cheap", cheap, samples=3), JudgeTier("strong", strong)], RUBRIC)
+    assert res.tier == "cheap" and res.confidence == 1.0 and res.overall == 4
+    assert cheap.calls == 3 and strong.calls == 0
+
+
+def test_escalation_reasons():
+    cases = {
+        "non_json": ScriptedClient("not json"),
+        "missing_dimensions": ScriptedClient({"scores": {"correctness": 4}, "overall": 4}),
+        "borderline": ScriptedClient(_answer(overall=3)),
+        "disagreement": ScriptedClient(_answer(overall=1, correctness=1), _answer(overall=5, correctness=5)),
+    }
+    for reason, cheap in cases.items():
+        strong = ScriptedClient(_answer(overall=5))
+        tiers = [JudgeTier("cheap", cheap, samples=2), JudgeTier("strong", strong)]
+        res = run_judge_cascade(_req(), tiers, RUBRIC)
+        assert res.tier == "strong" and res.overall == 5 and strong.calls == 1, reason
+        assert reason in res.raw["cascade"][0]["reasons"]
+        assert res.confidence is None  # single strong sample
+
+
+def test_consensus_uses_low_median_and_tracks_agreement():
+    cheap = ScriptedClient(_answer(overall=4), _answer(overall=4), _answer(overall=5, clarity=2))
+    res = run_judge_cascade(_req(), [JudgeTier("cheap", cheap, samples=3)], RUBRIC, CascadeConfig(min_confidence=0.5))
+    assert res.overall == 4 and res.scores["clarity"] == 5
+    # clarity and overall only agree 2/3.
+    assert abs(res.confidence - 2 / 3) < 1e-9
+
+
+def test_tier_and_confidence_round_trip():
+    res = JudgeResult("t", "r", {"a": 1}, 1, tier="cheap", confidence=0.5)
+    back = JudgeResult.from_dict(res.to_dict())
+    assert back.tier == "cheap" and back.confidence == 0.5
+
+
+def test_async_cascade_keeps_input_order():
+    cheap = ScriptedClient(_answer(), _answer(overall=3))
+    strong = ScriptedClient(_answer(overall=5))
+    tiers = [JudgeTier("cheap", cheap), JudgeTier("strong", strong)]
+    results = asyncio.run(arun_judge_cascade([_req(i) for i in range(6)], tiers, RUBRIC))
+    assert [r.trace_id for r in results] == [f"t{i}" for i in range(6)]
+    assert sum(r.tier == "strong" for r in results) == strong.calls == 3
@@ -29,3 +29,127 @@ def test_build_and_run_judge():
     res = run_judge(req, FakeJudgeClient())
     assert res.scores["correctness"] == 4
     assert res.overall == 4
+
+
+def _rag_trace(passage_groups, tool_output="ok"):
+    rec = SpanRecorder()
+    with rec.start_span("request", attrs={"kind": "request", "user.query": "capital of france"}):
+        for passages in passage_groups:
+            with rec.start_span("retrieval.search", attrs={"kind": "retrieval.search", "retrieval.passages": passages}):
+                pass
+        with rec.start_span("tool.call", attrs={"kind": "tool.call", "tool.name": "search", "tool.output": tool_output}):
+            pass
+        with rec.start_span("response", attrs={"kind": "response", "assistant.answer": "Paris is the capital"}):
+            pass
+    return rec.get_spans()
+
+
+def test_prompt_is_compact_and_rubric_header_is_shared():
+    from judge.prompts.templates import compile_prompt
+
+    rubric = RagAnswerQualityRubric()
+    req = build_judge_request(_rag_trace([[{"id": "d1", "text": "Paris"}]]), rubric)
+    assert "\n  " not in req.prompt.split("OUTPUT_JSON_SCHEMA")[0]
+    assert req.prompt.startswith(compile_prompt(rubric).header)
+    assert compile_prompt(rubric) is compile_prompt(RagAnswerQualityRubric())
+    assert req.trace_id not in req.prompt
+
+
+def test_token_budget_dedupes_ranks_and_reports():
+    filler = "lorem ipsum dolor sit amet " * 40
+    groups = [
+        [{"id": "a", "text": filler}, {"id": "paris", "text": "Paris is the capital of France. " + filler}],
+        [{"id": "paris", "text": "Paris is the capital of France. " + filler}, {"id": "b", "text": filler}],
+    ]
+    spans = _rag_trace(groups, tool_output="x" * 10_000)
+    full = build_judge_request(spans, RagAnswerQualityRubric())
+    req = build_judge_request(spans, RagAnswerQualityRubric(), token_budget=1200)
+
+    report = req.payload["prompt_budget"]
+    assert report["duplicates_removed"] == 1
+    assert report["passages_total"] == 4
+    assert report["truncated_tool_outputs"] == [0]
+    kept = {p["id"]: p["text"] for group in req.payload["retrieved_context"] for p in group}
+    assert kept["paris"] == groups[0][1]["text"]  # most relevant passage survives intact
+    assert report["truncated_passages"] == ["a"] and kept["a"].endswith("[...]")
+    assert report["dropped_passages"] == ["b"]
+    assert report["estimated_tokens"] <= 1200
+    assert len(req.prompt) < len(full.prompt) / 3
+    assert "prompt_budget" not in req.prompt
+
+
+def _interleaved_traces(n=3):
+    rec = SpanRecorder()
+    for i in range(n):
+        with rec.start_span("request", attrs={"kind": "request", "user.query": f"q{i}"}):
+            with rec.start_span("retrieval.search", attrs={"kind": "retrieval", "retrieval.passages": [f"p{i}"]}):
+                pass
+            with rec.start_span("response", attrs={"kind": "response", "assistant.answer": f"a{i}"}):
+                pass
+    by_trace = {}
+    for s in sorted(rec.get_spans(), key=lambda s: s.end_ns):  # export order
+        by_trace.setdefault(s.trace_id, []).append(s)
+    # Round-robin the traces so spans of different traces interleave.
+    traces = list(by_trace.values())
+    stream = []
+    for j in range(max(len(t) for t in traces)):
+        stream.extend(t[j] for t in traces if j < len(t))
+    return traces, stream
+
+
+def test_build_judge_requests_matches_per_trace_extraction():
+    from judge.extract import build_judge_requests
+
+    rubric = RagAnswerQualityRubric()
+    traces, stream = _interleaved_traces()
+    reqs = list(build_judge_requests(stream, rubric))
+    expected = {t[0].trace_id: build_judge_request(t, rubric) for t in traces}
+    assert sorted(r.trace_id for r in reqs) == sorted(expected)
+    for r in reqs:
+        assert r.prompt == expected[r.trace_id].prompt
+        assert r.payload == expected[r.trace_id].payload
+
+
+def test_build_judge_requests_emits_on_root_end_and_bounds_inflight():
+    from judge.extract import build_judge_requests
+
+    rubric = RagAnswerQualityRubric()
+    traces, _ = _interleaved_traces(2)
+    first, second = traces
+    it = build_judge_requests(iter(first + second), rubric)
+    # The root span ends last, so the first trace is ready before the second is read.
+    assert next(it).trace_id == first[0].trace_id
+
+    # Children only (no root yet): with room for one open trace, the older one is flushed early.
+    children = [s for t in traces for s in t if s.parent_id is not None]
+    reqs = list(build_judge_requests(children, rubric, max_inflight_traces=1))
+    assert [r.trace_id for r in reqs] == [first[0].trace_id, second[0].trace_id]
+    assert all(r.payload["trace_metadata"]["complete"] is False for r in reqs)
+
+
+def test_build_judge_requests_start_ordered_stream():
+    from judge.extract import build_judge_requests
+
+    rubric = RagAnswerQualityRubric()
+    traces, stream = _interleaved_traces()
+    stream = sorted(stream, key=lambda s: s.start_ns)
+    it = build_judge_requests(stream, rubric, stream_order="start")
+    # Trace 0 is complete once trace 1's root (which starts later) shows up.
+    assert next(it).trace_id == traces[0][0].trace_id
+    rest = list(it)
+    assert [r.trace_id for r in rest] == [traces[1][0].trace_id, traces[2][0].trace_id]
+    for r, t in zip(rest, traces[1:]):
+        assert r.payload == build_judge_request(t, rubric).payload
+
+
+def test_custom_extractor():
+    from judge.extract import DEFAULT_EXTRACTORS, FirstAttr, build_judge_requests
+
+    rubric = RagAnswerQualityRubric()
+    rec = SpanRecorder()
+    with rec.start_span("request", attrs={"user.query": "q", "model.name": "m1"}):
+        pass
+    extractors = DEFAULT_EXTRACTORS + (FirstAttr("model", ("model.name",)),)
+    (req,) = build_judge_requests(rec.get_spans(), rubric, extractors=extractors)
+    assert req.payload["model"] == "m1"
+    assert '"model":"m1"' in req.prompt
@@ -0,0 +1,83 @@
+import random
+
+from judge.sampling import JudgeSamplingPlanner, Stratum, allocate_budget, weighted_mean
+from latency.extract import LatencyFeatures
+
+
+def _features(i, total_ms):
+    return LatencyFeatures(trace_id=f"t{i}", total_ms=total_ms)
+
+
+def test_allocate_budget_respects_budget_floor_and_caps():
+    seen = {"a": 1000, "b": 10, "c": 3}
+    alloc = allocate_budget(seen, {"a": 1.0, "b": 1.0, "c": 100.0}, budget=50)
+    assert sum(alloc.values()) == 50
+    assert alloc["c"] == 3  # capped at its size
+    assert alloc["b"] >= 1 and alloc["a"] > alloc["b"]
+    assert sum(allocate_budget({"a": 5, "b": 5}, {"a": 1.0, "b": 1.0}, budget=100).values()) == 10
+
+
+def test_planner_stratifies_and_keeps_budget_per_window():
+    rng = random.Random(1)
+    planner = JudgeSamplingPlanner(budget_per_window=100, window_s=3600, seed=7, warmup=50, refresh=50)
+    out = []
+    for i in range(5000):
+        total = rng.lognormvariate(3, 0.5)
+        out += planner.offer(_features(i, total), error=(i % 100 == 0), deployment="a" if i % 2 else "b", ts=i * 0.5)
+    out += planner.offer(_features(-1, 10.0), ts=3600.0 + 1)  # closes window 0
+    assert len(out) == 100
+    strata = {s.stratum for s in out}
+    assert any(s.error for s in strata) and any(s.latency == "tail" for s in strata)
+    assert {s.stratum.deployment for s in out} == {"a", "b"}
+    # Weights account for every trace of the window.
+    assert abs(sum(s.weight for s in out) - 5000) < 1e-6
+    # Errors (1%) and tails (5%) are oversampled relative to traffic.
+    assert sum(s.stratum.error for s in out) > 1
+    assert len(planner.flush()) == 1
+
+
+def test_weighted_mean_is_unbiased_under_oversampling():
+    rng = random.Random(3)
+    true_scores, estimates = [], []
+    for run in range(20):
+        planner = JudgeSamplingPlanner(budget_per_window=200, seed=run, warmup=50, refresh=100)
+        score = {}
+        for i in range(4000):
+            total = rng.lognormvariate(3, 0.6)
+            # slow traces score worse; they are heavily oversampled
+            score[f"t{i}"] = 2.0 if total > 40 else 4.0
+            planner.offer(_features(i, total), ts=0.0)
+        samples = planner.flush()
+        true_scores.append(sum(score.values()) / len(score))
+        estimates.append(weighted_mean((s, score[s.trace_id]) for s in samples))
+        naive = sum(score[s.trace_id] for s in samples) / len(samples)
+    bias = sum(e - t for e, t in zip(estimates, true_scores)) / len(estimates)
+    assert abs(bias) < 0.03
+    assert naive < true_scores[-1] - 0.1  # unweighted mean is pulled towards the tail
+
+
+def test_novel_queries():
+    planner = JudgeSamplingPlanner(budget_per_window=10, novelty_memory=2)
+    s1 = planner.stratum(_features(0, 1.0), query="What is the capital of France?")
+    s2 = planner.stratum(_features(1, 1.0), query="the capital of france, what is")
+    assert s1.novel and not s2.novel
+    planner.stratum(_features(2, 1.0), query="x")
+    planner.stratum(_features(3, 1.0), query="y")
+    assert planner.stratum(_features(4, 1.0), query="capital of France what is the").novel  # forgotten
+    assert isinstance(s1, Stratum)
+
+
+def test_reservoirs_share_a_bounded_memory_budget():
+    planner = JudgeSamplingPlanner(budget_per_window=100, seed=5, reservoir_headroom=2.0)
+    # One busy deployment, then 63 quiet ones: 64 strata in the window.
+    for i in range(5000):
+        planner.offer(_features(i, 10.0), deployment="busy", ts=0.0)
+    for d in range(63):
+        for j in range(20):
+            planner.offer(_features(f"{d}-{j}", 10.0), deployment=f"quiet{d}", ts=0.0)
+    assert sum(len(r.items) for r in planner._reservoirs.values()) <= 2 * 100 + 64
+    out = planner.flush()
+    assert len(out) == 100  # what the busy stratum cannot hold goes to the others
+    assert abs(sum(s.weight for s in out) - (5000 + 63 * 20)) < 1e-6
+
+    assert allocate_budget({"a": 100, "b": 100}, {"a": 1.0, "b": 1.0}, budget=50, available={"a": 5}) == {"a": 5, "b": 45}
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from judge.extract import JudgeRequest
+from judge.parsing import JudgeJsonScanner, extract_judge_json
+from judge.runner import parse_judge_output
+from judge.streaming import (
+    AsyncEarlyStopJudgeClient,
+    EarlyStopJudgeClient,
+    arun_judge_streaming,
+    run_judge_streaming,
+)
+
+REQ = JudgeRequest(trace_id="t1", rubric_name="rag", prompt="p", payload={})
+ANSWER = {"scores": {"correctness": 4, "grounding": 5}, "overall": 4, "rationale": 'cites "doc 1" {ok}'}
+
+
+def _chunks(text, size=7):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class TokenStream:
+    """Streams ``text`` in small chunks and records how far generation got."""
+
+    def __init__(self, text):
+        self.text = text
+        self.sent = 0
+        self.closed = False
+
+    def stream(self, prompt):
+        try:
+            for chunk in _chunks(self.text):
+                self.sent += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+    async def astream(self, prompt):
+        try:
+            for chunk in _chunks(self.text):
+                self.sent += 1
+                yield chunk
+                await asyncio.sleep(0)
+        finally:
+            self.closed = True
+
+
+def test_extract_judge_json_recovers_embedded_objects():
+    body = json.dumps(ANSWER)
+    for text in (
+        body,
+        f"Sure! Here is my evaluation:\n```json\n{body}\n```\nLet me know {{if}} you need more.",
+        f'Thinking about "x" {{ draft }} ... final: {body} trailing',
+        json.dumps({"result": ANSWER}),
+    ):
+        assert extract_judge_json(text) == ANSWER, text
+    assert extract_judge_json("no json here") is None
+    assert extract_judge_json('{"overall": 3}') is None
+
+
+def test_parse_judge_output_no_longer_drops_wrapped_json():
+    res = parse_judge_output(REQ, "Here you go:\n```json\n" + json.dumps(ANSWER) + "\n```")
+    assert res.scores == ANSWER["scores"] and res.overall == 4
+    wrapped = parse_judge_output(REQ, json.dumps({"result": ANSWER}))
+    assert wrapped.scores == ANSWER["scores"] and wrapped.overall == 4
+    bad = parse_judge_output(REQ, "I cannot evaluate this.")
+    assert bad.scores == {} and bad.raw["raw_text"] == "I cannot evaluate this."
+
+
+def test_scanner_finds_object_as_soon_as_it_closes():
+    body = json.dumps(ANSWER)
+    text = "Preamble with a stray { brace and \"quotes\".\n" + body + "\nAnd a long explanation " * 50
+    scanner = JudgeJsonScanner()
+    for i, chunk in enumerate(_chunks(text, 3)):
+        if scanner.feed(chunk) is not None:
+            break
+    assert scanner.result == ANSWER
+    end = text.index(body) + len(body)
+    assert i * 3 < end <= (i + 1) * 3
+
+
+def test_streaming_run_stops_generation_early():
+    body = json.dumps(ANSWER)
+    client = TokenStream("```json\n" + body + "\n```\n" + "More commentary. " * 200)
+    res = run_judge_streaming(REQ, client)
+    assert res.scores == ANSWER["scores"] and res.rationale == ANSWER["rationale"]
+    assert client.closed and client.sent < len(_chunks(client.text)) / 5
+    assert EarlyStopJudgeClient(TokenStream(body)).complete("p") == body
+
+
+def test_async_streaming_run_stops_generation_early():
+    client = TokenStream(json.dumps(ANSWER) + " trailing" * 300)
+    res = asyncio.run(arun_judge_streaming(REQ, client))
+    assert res.overall == 4
+    assert client.closed and client.sent < len(_chunks(client.text)) / 5
+    text = asyncio.run(AsyncEarlyStopJudgeClient(TokenStream("no json at all")).acomplete("p"))
+    assert text == "no json at all"
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from latency.compare import compare_runs
+from latency.extract import LatencyFeatures
+
+
+def _run(n, seed, retriever_scale=1.0, decode_scale=1.0):
+    rnd = random.Random(seed)
+    feats = []
+    for i in range(n):
+        retr = rnd.lognormvariate(4, 0.4) * retriever_scale
+        decode = rnd.lognormvariate(5, 0.3) * decode_scale
+        feats.append(
+            LatencyFeatures(
+                trace_id=f"{seed}-{i}",
+                total_ms=retr + decode,
+                by_component_ms={"retriever": retr, "llm": decode},
+                by_component_phase_ms={("llm", "decode"): decode},
+            )
+        )
+    return feats
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_retriever_regression_is_flagged_and_ranked_first(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    base = _run(3_000, 1)
+    cand = _run(3_000, 2, retriever_scale=1.8)
+    result = compare_runs(base, cand, iterations=500, use_numpy=use_numpy)
+
+    assert result.regressed
+    assert result.total.regression
+    assert result.components[0].metric == "retriever"
+    assert result.components[0].regression
+    retr_p95 = result.components[0].shifts["p95"]
+    assert retr_p95.ci_low_ms > 0 and retr_p95.ci_low_ms <= retr_p95.delta_ms <= retr_p95.ci_high_ms
+    llm = next(m for m in result.components if m.metric == "llm")
+    assert not llm.regression and not llm.improvement
+    assert [m.metric for m in result.phases] == ["llm:decode"]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_same_distribution_is_not_flagged_and_seed_is_deterministic(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    base, cand = _run(2_000, 3), _run(2_000, 4)
+    a = compare_runs(base, cand, iterations=400, seed=7, use_numpy=use_numpy)
+    b = compare_runs(base, cand, iterations=400, seed=7, use_numpy=use_numpy)
+    assert not a.regressed
+    assert a.to_dict() == b.to_dict()
@@ -1,5 +1,11 @@
+import pytest
+
 from spanrecorder.recorder import SpanRecorder
+from spanrecorder.span import Span
+from latency.aggregate import aggregate_latency
+from latency.batch import extract_latency_batch, extract_latency_table
 from latency.extract import extract_latency
+from storage.segment_store import SegmentReader, SegmentTraceStore
 
 
 def test_extract_latency_components():
@@ -21,3 +27,109 @@ def test_extract_latency_components():
     assert "llm" in feats.by_component_ms
     assert ("llm", "prefill") in feats.by_component_phase_ms
     assert ("llm", "decode") in feats.by_component_phase_ms
+
+
+def _mixed_traces():
+    rec = SpanRecorder()
+    for i in range(5):
+        with rec.start_span("request", attrs={"kind": "request"}):
+            with rec.start_span("retrieval.search", attrs={"kind": "retrieval.search"}):
+                pass
+            with rec.start_span("rerank", attrs={"component": "retriever", "phase": "rerank"}):
+                pass
+            if i % 2:
+                with rec.start_span("llm.call", attrs={"kind": "llm.call", "phase": "decode"}):
+                    pass
+    spans = rec.get_spans()
+    # interleave traces
+    return spans[::2] + spans[1::2]
+
+
+def _per_trace(spans):
+    by_trace = {}
+    for s in spans:
+        by_trace.setdefault(s.trace_id, []).append(s)
+    return {tid: extract_latency(ss).to_dict() for tid, ss in by_trace.items()}
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_extract_latency_batch_matches_per_trace(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    spans = _mixed_traces()
+    table = extract_latency_batch(spans, use_numpy=use_numpy, attribution=True)
+
+    assert len(table) == 5
+    assert {f.trace_id: f.to_dict() for f in table} == _per_trace(spans)
+
+    report = aggregate_latency(table)
+    expected = aggregate_latency(list(table))
+    assert report.p95_ms == pytest.approx(expected.p95_ms)
+    assert report.component_avg_ms == pytest.approx(expected.component_avg_ms)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_extract_latency_table_over_segments(tmp_path, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    spans = _mixed_traces()
+    store = SegmentTraceStore(str(tmp_path))
+    store.write(spans[:7])
+    store.write(spans[7:])
+
+    readers = [SegmentReader(p) for p in store.segment_paths()]
+    table = extract_latency_table(*(r.span_columns() for r in readers), use_numpy=use_numpy, attribution=True)
+    assert {f.trace_id: f.to_dict() for f in table} == _per_trace(spans)
+
+
+def _fanout_trace():
+    # request [0, 100ms): two overlapping retrievals, then an LLM call with a nested tool call.
+    ms = 1_000_000
+    t = "ab" * 16
+
+    def span(name, sid, parent, start, end, **attrs):
+        return Span(name, t, sid, parent, start * ms, end * ms, attributes={"kind": name, **attrs})
+
+    return [
+        span("request", "01", None, 0, 100),
+        span("retrieval.search", "02", "01", 10, 40),
+        span("retrieval.search", "03", "01", 20, 50),
+        span("llm.call", "04", "01", 50, 95, phase="decode"),
+        span("tool.call", "05", "04", 60, 70),
+    ]
+
+
+def test_self_time_does_not_double_count_nested_or_parallel_spans():
+    feats = extract_latency(_fanout_trace())
+    assert feats.by_component_ms == pytest.approx(
+        {"app": 100.0, "retriever": 60.0, "llm": 45.0, "tool": 10.0}
+    )
+    # The request only loses the union of its children (10-95ms), not their sum.
+    assert feats.self_by_component_ms == pytest.approx(
+        {"app": 15.0, "retriever": 60.0, "llm": 35.0, "tool": 10.0}
+    )
+    assert feats.self_by_component_phase_ms == pytest.approx({("llm", "decode"): 35.0})
+
+
+def test_critical_path_follows_last_finishing_child():
+    feats = extract_latency(_fanout_trace())
+    assert feats.critical_path_ms == pytest.approx(100.0)
+    # The 10-40ms retrieval is hidden behind the one ending at 50ms.
+    assert feats.critical_by_component_ms == pytest.approx(
+        {"app": 15.0, "retriever": 40.0, "llm": 35.0, "tool": 10.0}
+    )
+    assert sum(feats.component_share().values()) == pytest.approx(1.0)
+    assert feats.to_dict()["critical_by_component_phase_ms"] == pytest.approx({"llm:decode": 35.0})
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_batch_attribution_matches_per_trace(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    spans = _fanout_trace() + _mixed_traces()
+    table = extract_latency_batch(spans, use_numpy=use_numpy, attribution=True)
+    assert {f.trace_id: f.to_dict() for f in table} == _per_trace(spans)
+
+    plain = extract_latency_batch(spans, use_numpy=use_numpy, attribution=False)
+    assert plain.self_component_ms is None
+    assert plain.row(0).critical_path_ms == 0.0
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from latency.aggregate import LatencyAggregator, _percentile, aggregate_latency
+from latency.extract import LatencyFeatures
+from latency.sketch import DDSketch
+
+
+def _lognormal(n, seed):
+    rnd = random.Random(seed)
+    return [rnd.lognormvariate(5, 1.2) for _ in range(n)]
+
+
+def _lower_rank(xs, q):
+    xs = sorted(xs)
+    return xs[int(q * (len(xs) - 1))]
+
+
+def test_sketch_quantiles_within_relative_error():
+    xs = _lognormal(50_000, 1) + [0.0] * 100
+    sk = DDSketch(relative_accuracy=0.01)
+    sk.update(xs)
+    assert sk.count == len(xs)
+    for q in (0.0, 0.5, 0.95, 0.99, 1.0):
+        expected = _lower_rank(xs, q)
+        assert sk.quantile(q) == pytest.approx(expected, rel=0.01, abs=1e-9)
+    assert len(sk.bins) < 1000
+
+
+def test_sketch_merge_matches_single_sketch_and_round_trips():
+    a, b = _lognormal(10_000, 2), _lognormal(10_000, 3)
+    left, right, both = DDSketch(), DDSketch(), DDSketch()
+    left.update(a)
+    right.update(b)
+    both.update(a + b)
+
+    merged = DDSketch.from_bytes(left.to_bytes())
+    merged.merge(DDSketch.from_bytes(right.to_bytes()))
+    assert merged.bins == both.bins
+    assert merged.quantiles([0.5, 0.95, 0.99]) == both.quantiles([0.5, 0.95, 0.99])
+    assert len(both.to_bytes()) < 4 * len(both.bins) + 64
+
+    with pytest.raises(ValueError):
+        merged.merge(DDSketch(relative_accuracy=0.02))
+
+
+def test_sketch_collapses_lowest_bins():
+    sk = DDSketch(relative_accuracy=0.01, max_bins=64)
+    sk.update(_lognormal(20_000, 4))
+    assert len(sk.bins) == 64
+    assert sk.quantile(0.99) == pytest.approx(_lower_rank(_lognormal(20_000, 4), 0.99), rel=0.01)
+
+
+def _features(seed, n):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        retr = rnd.lognormvariate(3, 0.5)
+        decode = rnd.lognormvariate(5, 0.8)
+        out.append(
+            LatencyFeatures(
+                trace_id=f"{seed}-{i}",
+                total_ms=retr + decode + 1.0,
+                by_component_ms={"retriever": retr, "llm": decode},
+                by_component_phase_ms={("llm", "decode"): decode},
+            )
+        )
+    return out
+
+
+def test_aggregator_merge_matches_exact_report():
+    parts = [_features(seed, 2_000) for seed in range(3)]
+    workers = []
+    for feats in parts:
+        agg = LatencyAggregator()
+        agg.extend(feats)
+        workers.append(LatencyAggregator.from_bytes(agg.to_bytes()))
+    rollup = workers[0]
+    for w in workers[1:]:
+        rollup.merge(w)
+
+    report = rollup.report()
+    exact = aggregate_latency(f for feats in parts for f in feats)
+    assert report.n == exact.n == 6_000
+    assert report.avg_ms == pytest.approx(exact.avg_ms)
+    assert report.component_avg_ms == pytest.approx(exact.component_avg_ms)
+    for q in ("p50", "p95", "p99"):
+        assert getattr(report, f"{q}_ms") == pytest.approx(getattr(exact, f"{q}_ms"), rel=0.02)
+        assert report.component_quantiles_ms["retriever"][q] == pytest.approx(
+            exact.component_quantiles_ms["retriever"][q], rel=0.02
+        )
+        assert report.component_phase_quantiles_ms["llm:decode"][q] == pytest.approx(
+            exact.component_phase_quantiles_ms["llm:decode"][q], rel=0.02
+        )
+
+
+def test_percentile_expects_sorted_input():
+    xs = sorted(_lognormal(101, 5))
+    assert _percentile(xs, 0.5) == xs[50]
+    with pytest.raises(ValueError):
+        LatencyAggregator().report()
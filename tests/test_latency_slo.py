@@ -0,0 +1,68 @@
+import pytest
+
+from latency.aggregate import aggregate_latency
+from latency.extract import LatencyFeatures
+from latency.slo import LatencySLO, SLOEngine, evaluate_latency_slo
+
+
+def _trace(total_ms, retriever_ms=10.0):
+    return LatencyFeatures(
+        trace_id="t",
+        total_ms=total_ms,
+        by_component_ms={"retriever": retriever_ms, "llm": total_ms - retriever_ms},
+        by_component_phase_ms={("llm", "decode"): total_ms - retriever_ms},
+    )
+
+
+def test_windows_expire_old_buckets():
+    engine = SLOEngine([LatencySLO("total", p95_ms_max=100.0)])
+    t0 = 1_000_000 * 60.0
+    for i in range(10):
+        engine.observe(_trace(50.0), ts=t0 + i)
+    engine.observe(_trace(500.0), ts=t0 + 120)
+
+    stats = engine.window_stats("total", now=t0 + 120)
+    assert (stats[60].total, stats[60].bad) == (1, 1)
+    assert (stats[300].total, stats[300].bad) == (11, 1)
+    assert stats[300].burn_rate == pytest.approx((1 / 11) / 0.05)
+
+    stats = engine.window_stats("total", now=t0 + 3600 + 60)
+    assert stats[3600].total == 1
+    assert stats[21600].total == 11
+    assert engine.window_stats("total", now=t0 + 6 * 3600 + 180)[21600].total == 0
+
+
+def test_multi_window_alerts_per_component_and_deployment():
+    slos = [LatencySLO("total", p95_ms_max=1000.0), LatencySLO("retriever", p95_ms_max=150.0, component="retriever")]
+    engine = SLOEngine(slos)
+    t0 = 2_000_000 * 60.0
+    for i in range(600):
+        ts = t0 + i * 6  # one hour
+        engine.observe(_trace(400.0, retriever_ms=100.0), deployment="v1", ts=ts)
+        engine.observe(_trace(400.0, retriever_ms=300.0 if i % 5 else 100.0), deployment="v2", ts=ts)
+
+    alerts = engine.alerts(now=t0 + 3600)
+    assert {(a.slo_name, a.deployment, a.severity) for a in alerts} == {
+        ("retriever", "v2", "page"),
+        ("retriever", "v2", "ticket"),
+    }
+    assert alerts[0].long_burn_rate == pytest.approx(0.8 / 0.05)
+
+    # The short window recovers first, which silences the page.
+    for i in range(60):
+        engine.observe(_trace(400.0), deployment="v2", ts=t0 + 3600 + i * 5)
+    assert {a.severity for a in engine.alerts(now=t0 + 3600 + 300)} == {"ticket"}
+
+
+def test_series_are_bounded():
+    engine = SLOEngine([LatencySLO("total", p95_ms_max=100.0)], max_series=2)
+    for dep in ("a", "b", "c"):
+        engine.observe(_trace(50.0), deployment=dep, ts=0.0)
+    assert engine.series() == [("total", "b"), ("total", "c")]
+
+
+def test_evaluate_component_slo():
+    report = aggregate_latency([_trace(100.0, retriever_ms=r) for r in range(1, 101)])
+    result = evaluate_latency_slo(report, LatencySLO("retriever", p95_ms_max=90.0, component="retriever"))
+    assert not result.passed
+    assert result.observed_p95_ms > 90.0
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from spanrecorder import BatchSpanProcessor, SpanRecorder
+from spanrecorder.fake_collector import FakeOTLPCollector
+from spanrecorder.otlp import OTLPExportError, OTLPHttpSpanExporter
+
+
+def _record(n_traces=3):
+    rec = SpanRecorder()
+    for i in range(n_traces):
+        with rec.start_span("request", attrs={"kind": "request", "i": i, "ok": True, "tags": ["a", "b"]}):
+            with rec.start_span("retrieval", attrs={"score": 0.5}) as sp:
+                sp.add_event("cache_miss")
+    try:
+        with rec.start_span("failing"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    return rec.get_spans()
+
+
+@pytest.mark.parametrize("encoding", ["protobuf", "json"])
+def test_export_round_trip(encoding):
+    spans = _record()
+    with FakeOTLPCollector() as collector:
+        exporter = OTLPHttpSpanExporter(collector.endpoint, encoding=encoding)
+        exporter.export(spans)
+        exporter.shutdown()
+        (req,) = collector.requests
+        assert req.path == "/v1/traces" and req.headers["Content-Encoding"] == "gzip"
+        got = {s["span_id"]: s for s in collector.spans}
+
+    assert len(got) == len(spans)
+    now = time.time_ns()
+    for span in spans:
+        s = got[span.span_id]
+        assert s["trace_id"] == span.trace_id and s["parent_span_id"] == span.parent_id
+        assert s["name"] == span.name
+        assert s["end_time_unix_nano"] - s["start_time_unix_nano"] == span.duration_ns
+        assert abs(s["start_time_unix_nano"] - now) < 60 * 10**9  # shifted to Unix time
+    root = next(s for s in got.values() if s["name"] == "request" and s["attributes"]["i"] == 0)
+    assert root["attributes"] == {"kind": "request", "i": 0, "ok": True, "tags": ["a", "b"]}
+    failing = next(s for s in got.values() if s["name"] == "failing")
+    assert failing["status_code"] == 2 and failing["events"] == [{"name": "exception"}]
+    child = next(s for s in got.values() if s["name"] == "retrieval")
+    assert child["attributes"] == {"score": 0.5} and child["events"] == [{"name": "cache_miss"}]
+
+
+def test_retries_honor_throttling_and_reuse_connections():
+    waits = []
+    with FakeOTLPCollector() as collector:
+        collector.respond_with(429, {"Retry-After": "0.25"})
+        collector.respond_with(503, times=1)
+        exporter = OTLPHttpSpanExporter(collector.endpoint, sleep=waits.append, backoff_base_s=0.01)
+        spans = _record(1)
+        exporter.export(spans)
+        for _ in range(4):
+            exporter.export(spans)
+        assert exporter.throttled == 2 and exporter.retries == 2
+        assert waits[0] == 0.25 and 0 <= waits[1] <= 0.02
+        assert len(collector.requests) == 5 and collector.connections == 1
+        exporter.shutdown()
+
+
+def test_gives_up_on_rejection_and_after_max_retries():
+    with FakeOTLPCollector() as collector:
+        collector.respond_with(400)
+        exporter = OTLPHttpSpanExporter(collector.endpoint, sleep=lambda s: None)
+        try:
+            with pytest.raises(OTLPExportError, match="HTTP 400"):
+                exporter.export(_record(1))
+        finally:
+            exporter.shutdown()
+        collector.respond_with(503, times=10)
+        exporter = OTLPHttpSpanExporter(collector.endpoint, max_retries=2, sleep=lambda s: None)
+        try:
+            with pytest.raises(OTLPExportError, match="3 attempts"):
+                exporter.export(_record(1))
+        finally:
+            exporter.shutdown()
+    unreachable = OTLPHttpSpanExporter("http://127.0.0.1:9/v1/traces", max_retries=1, sleep=lambda s: None)
+    try:
+        with pytest.raises(OTLPExportError):
+            unreachable.export(_record(1))
+    finally:
+        unreachable.shutdown()
+
+
+def test_slow_collector_never_blocks_request_thread():
+    with FakeOTLPCollector(delay_s=0.2) as collector:
+        exporter = OTLPHttpSpanExporter(collector.endpoint, encoding="json")
+        proc = BatchSpanProcessor(exporter, max_queue_size=100, max_batch_size=50, flush_interval_s=0.05)
+        rec = SpanRecorder(processors=[proc], keep_spans=False)
+        t0 = time.perf_counter()
+        for _ in range(2000):
+            with rec.start_span("request"):
+                pass
+        elapsed = time.perf_counter() - t0
+        assert elapsed < 0.5  # on_end only enqueues
+        assert proc.queue_size <= 100 and proc.dropped_spans > 0
+        proc.shutdown(timeout=5)
+        assert exporter.exported_spans == len(collector.spans) > 0
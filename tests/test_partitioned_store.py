@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from spanrecorder.span import Span
+from storage import PartitionedTraceStore
+
+H = 3600 * 10**9
+T0 = 1735689600 * 10**9  # 2025-01-01T00:00Z
+
+
+def _spans(hour, n, trace_prefix="t"):
+    out = []
+    for i in range(n):
+        start = T0 + hour * H + i * 10**9
+        out.append(Span("request", trace_id=f"{trace_prefix}{hour}-{i}", start_ns=start, end_ns=start + 5, attributes={"i": i}))
+    return out
+
+
+def _store(tmp_path, **kw):
+    kw.setdefault("clock_offset_ns", 0)
+    kw.setdefault("background", False)
+    return PartitionedTraceStore(str(tmp_path / "traces"), **kw)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zlib", "lzma", None])
+def test_partitions_rotation_and_compression(tmp_path, compression):
+    store = _store(tmp_path, compression=compression, max_segment_bytes=2000)
+    for hour in range(3):
+        store.write(_spans(hour, 30))
+    store.flush()
+
+    assert store.partitions() == ["20250101T00", "20250101T01", "20250101T02"]
+    segs = store.segments()
+    assert len(segs) > 3  # rotated within each hour
+    assert all(not s.active and s.compressed == (compression is not None) for s in segs)
+    assert len(store.read_all()) == 90
+
+    window = list(store.iter_spans(start_ns=T0 + H + 5 * 10**9, end_ns=T0 + H + 15 * 10**9))
+    assert [s.attributes["i"] for s in window] == list(range(5, 15))
+    touched = store.segments(start_ns=T0 + H + 5 * 10**9, end_ns=T0 + H + 15 * 10**9)
+    assert {s.partition for s in touched} == {"20250101T01"}
+    assert len(touched) < len([s for s in segs if s.partition == "20250101T01"]) + 1
+
+    assert [s.trace_id for s in store.get_trace("t2-7")] == ["t2-7"]
+
+
+def test_active_segments_are_readable_and_sealed_on_close(tmp_path):
+    with _store(tmp_path, background=True) as store:
+        store.write(_spans(0, 5))
+        assert [s.active for s in store.segments()] == [True]
+        assert len(store.read_all()) == 5
+    names = os.listdir(tmp_path / "traces" / "20250101T00")
+    assert len(names) == 1 and names[0].endswith(".jsonl.gz")
+
+
+def test_max_open_segments_seals_oldest_partition(tmp_path):
+    store = _store(tmp_path, max_open_segments=1)
+    store.write(_spans(0, 3))
+    store.write(_spans(1, 3))
+    assert [s.active for s in store.segments()] == [False, True]
+    store.close()
+
+
+def test_retention_and_compaction(tmp_path):
+    store = _store(tmp_path, retention_s=2 * 3600, wall_clock_ns=lambda: T0 + 5 * H + 1)
+    for hour in range(5):
+        for chunk in range(4):
+            store.write(_spans(hour, 3, trace_prefix=f"c{chunk}-"))
+            store.flush()  # four small segments per hour
+    assert len(store.segments_in("20250101T04")) == 4
+
+    assert store.apply_retention() == ["20250101T00", "20250101T01", "20250101T02"]
+    assert store.partitions() == ["20250101T03", "20250101T04"]
+
+    before = sorted(s.trace_id for s in store.read_all())
+    assert store.compact() == 6
+    assert [len(store.segments_in(p)) for p in store.partitions()] == [1, 1]
+    assert sorted(s.trace_id for s in store.read_all()) == before
+    assert store.disk_usage(start_ns=T0 + 4 * H) < store.disk_usage()
+
+
+def test_get_trace_ignores_spans_that_only_mention_the_id(tmp_path):
+    store = _store(tmp_path)
+    spans = _spans(0, 2)
+    spans[1].set_attribute("parent", {"trace_id": spans[0].trace_id})
+    store.write(spans)
+    store.flush()
+    assert [s.trace_id for s in store.get_trace(spans[0].trace_id)] == [spans[0].trace_id]
@@ -0,0 +1,130 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+
+from spanrecorder import (
+    AlwaysOffSampler,
+    ContextExecutor,
+    SharedSpanRing,
+    SpanContext,
+    SpanRecorder,
+    SpanRingCollector,
+    SpanStatus,
+    attach,
+    extract,
+    inject,
+    install_span_ring,
+    parse_traceparent,
+    submit_traced,
+    worker_recorder,
+)
+from spanrecorder.shm_ring import decode_span, encode_span
+from spanrecorder.span import Span
+
+
+def test_context_executor_keeps_parent():
+    rec = SpanRecorder()
+
+    def work(i):
+        with rec.start_span("shard", attrs={"i": i}) as s:
+            return s.parent_id
+
+    with ContextExecutor(ThreadPoolExecutor(4)) as pool:
+        with rec.start_span("retrieve") as root:
+            parents = list(pool.map(work, range(6)))
+        assert set(parents) == {root.span_id}
+
+        # Without the wrapper the task runs in the worker's own context.
+        with rec.start_span("retrieve"):
+            orphan = pool.executor.submit(work, 0).result()
+        assert orphan is None
+
+
+def test_traceparent_roundtrip_and_remote_parent():
+    rec = SpanRecorder()
+    with rec.start_span("client") as client:
+        headers = inject({})
+    assert headers["traceparent"] == f"00-{client.trace_id}-{client.span_id}-01"
+
+    ctx = extract({"TraceParent": headers["traceparent"]})
+    assert ctx == SpanContext(client.trace_id, client.span_id, True)
+
+    server = SpanRecorder()
+    with attach(ctx):
+        with server.start_span("server") as s:
+            with server.start_span("db") as child:
+                pass
+    assert (s.trace_id, s.parent_id) == (client.trace_id, client.span_id)
+    assert child.parent_id == s.span_id
+    assert server.current_span() is None
+
+    for bad in ["", "00-abc-def-01", "ff-" + "a" * 32 + "-" + "b" * 16 + "-01", "00-" + "0" * 32 + "-" + "b" * 16 + "-01"]:
+        assert parse_traceparent(bad) is None
+
+
+def test_unsampled_remote_parent_is_not_recorded():
+    client = SpanRecorder(sampler=AlwaysOffSampler())
+    with client.start_span("client"):
+        headers = inject()
+    assert headers["traceparent"].endswith("-00")
+
+    server = SpanRecorder()
+    with server.start_span("server", parent=extract(headers)) as s:
+        with server.start_span("db"):
+            pass
+    assert not s.is_recording
+    assert server.get_spans() == []
+
+
+def test_span_binary_roundtrip():
+    s = Span("llm.call", trace_id=0xABC, parent_id=7, start_ns=10)
+    s.set_attribute("model", "m")
+    s.add_event("retry", {"n": 1}, ts_ns=12)
+    s.record_exception(ValueError("boom"))
+    s.end(end_ns=20)
+    assert decode_span(encode_span(s)) == s
+
+    odd = Span("x", trace_id="t-1", span_id="s", start_ns=1, end_ns=2)
+    assert decode_span(encode_span(odd)) == odd
+
+
+def test_ring_wraps_and_drops_when_full():
+    with SharedSpanRing(4096) as ring:
+        for round_ in range(20):
+            batch = [Span(f"s{round_}.{i}", trace_id=1, start_ns=i, end_ns=i + 1) for i in range(10)]
+            assert ring.write(batch) == 10
+            assert ring.drain() == batch
+        assert ring.dropped == 0
+
+        big = [Span("s", trace_id=1, start_ns=0, end_ns=1) for _ in range(500)]
+        written = ring.write(big)
+        assert 0 < written < 500
+        assert ring.dropped == 500 - written
+        assert len(ring.drain()) == written
+
+
+def _fetch(doc_id):
+    rec = worker_recorder()
+    with rec.start_span("rerank", attrs={"doc": doc_id}):
+        with rec.start_span("score"):
+            pass
+    return doc_id
+
+
+def test_process_pool_spans_reach_parent_recorder():
+    rec = SpanRecorder()
+    ctx = multiprocessing.get_context("fork")
+    with SharedSpanRing(1 << 20) as ring, SpanRingCollector(ring, rec) as collector:
+        with ProcessPoolExecutor(2, mp_context=ctx, initializer=install_span_ring, initargs=(ring.handle,)) as pool:
+            with rec.start_span("query") as root:
+                futures = [submit_traced(pool, _fetch, i) for i in range(4)]
+                assert sorted(f.result() for f in futures) == [0, 1, 2, 3]
+                collector.drain()
+        assert ring.dropped == 0
+
+    spans = rec.get_spans()
+    reranks = [s for s in spans if s.name == "rerank"]
+    scores = [s for s in spans if s.name == "score"]
+    assert sorted(s.attributes["doc"] for s in reranks) == [0, 1, 2, 3]
+    assert all(s.trace_id == root.trace_id and s.parent_id == root.span_id for s in reranks)
+    assert {s.parent_id for s in scores} == {s.span_id for s in reranks}
+    assert all(s.status is SpanStatus.OK for s in reranks + scores)
@@ -0,0 +1,122 @@
+import contextvars
+
+import pytest
+
+from spanrecorder import (
+    AlwaysOffSampler,
+    AttributeTraceSampler,
+    KeepErrorsSampler,
+    RateLimitingSampler,
+    RatioSampler,
+    SamplingDecision,
+    SlowTraceSampler,
+    SpanRecorder,
+)
+
+
+def test_unsampled_trace_is_never_recorded():
+    r = SpanRecorder(sampler=AlwaysOffSampler())
+    with r.start_span("root") as root:
+        assert not root.is_recording
+        root.set_attribute("x", 1)
+        with r.start_span("child") as child:
+            assert child is root
+            assert r.current_span() is root
+        assert r.current_span() is root
+    assert r.current_span() is None
+    assert r.get_spans() == []
+
+
+def test_ratio_sampler_is_deterministic_per_trace_id():
+    s = RatioSampler(0.5)
+    assert s.should_sample("r", "0" * 32, None) is SamplingDecision.RECORD_AND_SAMPLE
+    assert s.should_sample("r", "f" * 32, None) is SamplingDecision.DROP
+    kept = sum(RatioSampler(0.25).should_sample("r", None, None) is SamplingDecision.RECORD_AND_SAMPLE for _ in range(4000))
+    assert 700 < kept < 1300
+
+
+def test_rate_limiting_sampler_caps_burst():
+    s = RateLimitingSampler(5)
+    decisions = [s.should_sample("r", None, None) for _ in range(20)]
+    assert decisions.count(SamplingDecision.RECORD_AND_SAMPLE) == 5
+
+
+def test_keep_errors_sampler_keeps_only_failed_traces():
+    r = SpanRecorder(sampler=KeepErrorsSampler(AlwaysOffSampler()))
+    with r.start_span("ok.root"):
+        with r.start_span("child"):
+            pass
+    with pytest.raises(RuntimeError):
+        with r.start_span("bad.root"):
+            with r.start_span("child"):
+                raise RuntimeError("boom")
+
+    names = [s.name for s in r.get_spans()]
+    assert names == ["bad.root", "child"]
+
+
+def test_tail_sampler_keeps_whole_matching_traces():
+    r = SpanRecorder(tail_sampler=AttributeTraceSampler(lambda s: s.attributes.get("flag") is True))
+    for flag in (False, True):
+        with r.start_span("root"):
+            with r.start_span("child", attrs={"flag": flag}):
+                pass
+    spans = r.get_spans()
+    assert [s.name for s in spans] == ["root", "child"]
+    assert spans[1].parent_id == spans[0].span_id
+
+    slow = SpanRecorder(tail_sampler=SlowTraceSampler(threshold_ms=10_000))
+    with slow.start_span("root"):
+        pass
+    assert slow.get_spans() == []
+
+
+class _Events:
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, span):
+        self.events.append(("start", span.name))
+
+    def on_end(self, span):
+        self.events.append(("end", span.name))
+
+    def force_flush(self, timeout=None):
+        return True
+
+    def shutdown(self):
+        pass
+
+
+def test_child_ending_after_kept_root_is_started_and_ended():
+    events = _Events()
+    r = SpanRecorder(processors=[events], tail_sampler=AttributeTraceSampler(lambda s: True))
+    with r.start_span("root") as root:
+        # The child runs in its own context (e.g. a background task).
+        late = r.start_span("late", parent=root)
+        ctx = contextvars.copy_context()
+        ctx.run(late.__enter__)
+    assert events.events == [("start", "root"), ("start", "late"), ("end", "root")]
+    ctx.run(late.__exit__, None, None, None)
+    assert events.events[-1] == ("end", "late")
+    assert [s.name for s in r.get_spans()] == ["root", "late"]
+
+
+class _NoLock:
+    def __enter__(self):
+        raise AssertionError("lock taken")
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_unrelated_traces_skip_the_lock_after_a_drop():
+    r = SpanRecorder(sampler=KeepErrorsSampler(RatioSampler(0.5)))
+    with r.start_span("dropped", trace_id="f" * 32):
+        pass
+    assert r.get_spans() == []
+    r._lock = _NoLock()
+    with r.start_span("kept", trace_id="0" * 32):
+        with r.start_span("child"):
+            pass
+    assert [s.name for s in r.get_spans()] == ["kept", "child"]
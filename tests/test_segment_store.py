@@ -0,0 +1,83 @@
+import pytest
+
+from latency.extract import extract_latency
+from spanrecorder.recorder import SpanRecorder
+import storage.segment_store as segment_store
+from storage import SegmentTraceStore
+from storage.segment_store import SegmentReader
+
+
+def _record(n):
+    rec = SpanRecorder()
+    for i in range(n):
+        with rec.start_span("request", attrs={"kind": "request", "user.query": f"q{i}"}):
+            with rec.start_span("retrieval.search", attrs={"kind": "retrieval.search", "top_k": 3}):
+                pass
+            with rec.start_span("llm.call", attrs={"kind": "llm.call", "phase": "decode"}) as sp:
+                sp.add_event("first_token", {"n": 1})
+    with pytest.raises(KeyError):
+        with rec.start_span("tool.call"):
+            raise KeyError("missing")
+    return rec.get_spans()
+
+
+def test_segment_round_trip(tmp_path):
+    spans = _record(3)
+    store = SegmentTraceStore(str(tmp_path))
+    store.write(spans)
+
+    assert store.read_all() == spans
+    [path] = store.segment_paths()
+    with SegmentReader(path) as seg:
+        assert len(seg) == len(spans)
+        starts = seg.column("start_ns")
+        assert starts.format == "q" and list(starts) == [s.start_ns for s in spans]
+        assert seg.table("labels")[seg.column("name")[1]] == "retrieval.search"
+        del starts
+
+
+def test_columnar_latency_matches_span_path(tmp_path):
+    spans = _record(4)
+    store = SegmentTraceStore(str(tmp_path))
+    # split so traces straddle segments
+    store.write(spans[:5])
+    store.write(spans[5:])
+
+    by_trace = {}
+    for s in spans:
+        by_trace.setdefault(s.trace_id, []).append(s)
+    expected = {tid: extract_latency(ss).to_dict() for tid, ss in by_trace.items()}
+
+    got = {f.trace_id: f.to_dict() for f in store.latency_features(attribution=True)}
+    assert got == expected
+
+
+def test_time_range_prunes_segments(tmp_path):
+    spans = _record(2)
+    store = SegmentTraceStore(str(tmp_path))
+    store.write(spans[:3])
+    store.write(spans[3:])
+
+    cutoff = spans[3].start_ns
+    assert [s.span_id for s in store.iter_spans(start_ns=cutoff)] == [s.span_id for s in spans[3:]]
+    assert len(list(store.iter_segments(end_ns=cutoff))) == 1
+
+
+def test_time_window_is_pruned_before_mapping(tmp_path, monkeypatch):
+    spans = _record(2)
+    store = SegmentTraceStore(str(tmp_path))
+    store.write(spans[:3])
+    store.write(spans[3:])
+
+    opened = []
+
+    class CountingReader(SegmentReader):
+        def __init__(self, path):
+            opened.append(path)
+            super().__init__(path)
+
+    monkeypatch.setattr(segment_store, "SegmentReader", CountingReader)
+    cutoff = spans[3].start_ns
+    table = store.latency_table(start_ns=cutoff)
+    assert opened == store.segment_paths()[1:]
+    assert sorted(f.trace_id for f in table) == sorted({s.trace_id for s in spans[3:]})
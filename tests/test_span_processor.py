@@ -0,0 +1,85 @@
+import json
+import threading
+
+from spanrecorder import BatchSpanProcessor, SpanRecorder, StoreExporter
+from spanrecorder.span import Span
+from storage.trace_store import JsonlTraceStore
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+        self.shut_down = False
+
+    def export(self, spans):
+        self.threads.add(threading.current_thread().name)
+        self.batches.append(list(spans))
+
+    def shutdown(self):
+        self.shut_down = True
+
+
+def test_batch_processor_exports_off_request_thread():
+    exporter = CollectingExporter()
+    proc = BatchSpanProcessor(exporter, max_batch_size=4, flush_interval_s=60)
+    rec = SpanRecorder(processors=[proc], keep_spans=False)
+
+    for _ in range(10):
+        with rec.start_span("request"):
+            with rec.start_span("llm.call"):
+                pass
+
+    assert rec.force_flush(timeout=5)
+    exported = [s for b in exporter.batches for s in b]
+    assert len(exported) == 20
+    assert all(len(b) <= 4 for b in exporter.batches)
+    assert threading.current_thread().name not in exporter.threads
+    assert rec.get_spans() == []
+
+    rec.shutdown()
+    assert exporter.shut_down
+
+
+def test_drop_policies_count_dropped_spans():
+    entered = threading.Event()
+    gate = threading.Event()
+
+    class BlockedExporter(CollectingExporter):
+        def export(self, spans):
+            entered.set()
+            gate.wait(5)
+            super().export(spans)
+
+    for policy, kept in (("drop_oldest", ["s7", "s8", "s9"]), ("drop_newest", ["s0", "s1", "s2"])):
+        entered.clear()
+        gate.clear()
+        exporter = BlockedExporter()
+        proc = BatchSpanProcessor(
+            exporter, max_queue_size=3, max_batch_size=3, flush_interval_s=60, drop_policy=policy
+        )
+        # the first batch is held inside the blocked exporter; the rest contends for the queue
+        for i in range(3):
+            proc.on_end(Span(name=f"b{i}", trace_id="t"))
+        assert entered.wait(5)
+        for i in range(10):
+            proc.on_end(Span(name=f"s{i}", trace_id="t"))
+        assert proc.queue_size == 3
+        gate.set()
+        proc.shutdown()
+
+        names = [s.name for b in exporter.batches for s in b]
+        assert names == ["b0", "b1", "b2"] + kept
+        assert proc.dropped_spans == 7
+
+
+def test_store_exporter_writes_jsonl(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    proc = BatchSpanProcessor(StoreExporter(JsonlTraceStore(str(path))), flush_interval_s=0.01)
+    rec = SpanRecorder(processors=[proc])
+    with rec.start_span("request"):
+        pass
+    rec.shutdown()
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(l)["name"] for l in lines] == ["request"]
@@ -76,3 +76,31 @@ async def test_async_context_propagation_with_contextvars():
         await asyncio.create_task(child_task())
 
     assert results["cur_name"] == "async.root"
+
+
+def test_ids_are_w3c_hex_and_unique():
+    r = SpanRecorder()
+    with r.start_span("root") as root:
+        with r.start_span("child") as child:
+            pass
+
+    assert len(root.trace_id) == 32 and int(root.trace_id, 16)
+    assert len(root.span_id) == 16 and int(root.span_id, 16)
+    assert child.trace_id == root.trace_id
+    assert child.parent_id == root.span_id
+    assert child.span_id != root.span_id
+
+
+def test_span_containers_are_lazy_and_to_dict_is_stable():
+    r = SpanRecorder()
+    with r.start_span("root") as sp:
+        pass
+
+    assert sp._attributes is None and sp._events is None
+    d = sp.to_dict()
+    assert d["attributes"] == {} and d["events"] == [] and d["status"] == "OK"
+    assert d["duration_ns"] == sp.end_ns - sp.start_ns
+    assert sp._attributes is None
+
+    sp.add_event("retry", {"n": 1})
+    assert sp.to_dict()["events"] == [{"name": "retry", "ts_ns": sp.events[0].ts_ns, "attributes": {"n": 1}}]
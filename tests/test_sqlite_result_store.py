@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from storage.result_store import JsonResultStore
+from storage.sqlite_result_store import ResultNotFound, SqliteResultStore, migrate_json_results
+
+
+def _judge(trace_id, overall, rubric="rag_answer_quality"):
+    return {"trace_id": trace_id, "rubric_name": rubric, "scores": {"correctness": overall}, "overall": overall}
+
+
+def test_write_read_and_replace(tmp_path):
+    with SqliteResultStore(str(tmp_path / "results.db")) as store:
+        store.write("t1", "judge", _judge("t1", 3))
+        store.write("t1", "judge", _judge("t1", 5))
+        assert store.read("t1", "judge")["overall"] == 5
+        assert store.count() == 1
+        with pytest.raises(FileNotFoundError):
+            store.read("t1", "latency")
+        with pytest.raises(ResultNotFound):
+            store.read("missing", "judge")
+
+
+def test_write_many_and_queries(tmp_path):
+    store = SqliteResultStore(str(tmp_path / "results.db"))
+    store.write_many(((f"t{i}", "judge", _judge(f"t{i}", i % 5)) for i in range(20)), ts_ns=100, batch_size=7)
+    store.write_many(((f"t{i}", "judge", _judge(f"t{i}", 1, rubric="other")) for i in range(20, 25)), ts_ns=200)
+    store.write_many(((f"t{i}", "latency", {"total_ms": float(i)}) for i in range(0, 25, 2)), ts_ns=200)
+
+    assert store.count("judge") == 25 and store.count("latency") == 13
+    assert store.kinds() == ["judge", "latency"]
+    assert [r.trace_id for r in store.query(rubric="other")] == [f"t{i}" for i in range(20, 25)]
+    assert {r.kind for r in store.query(start_ns=150)} == {"judge", "latency"}
+    assert len(list(store.query(kind="judge", end_ns=150))) == 20
+    assert len(list(store.query(kind="judge", limit=3))) == 3
+    assert [r.kind for r in store.query(trace_id="t4")] == ["judge", "latency"]
+    assert set(store.read_many(["t1", "t2", "nope"], "judge")) == {"t1", "t2"}
+
+    joined = dict(store.join(["judge", "latency"]))
+    assert len(joined) == 13
+    assert joined["t4"]["judge"]["overall"] == 4 and joined["t4"]["latency"]["total_ms"] == 4.0
+    assert set(dict(store.join(["judge", "latency"], rubric="other"))) == {"t20", "t22", "t24"}
+    assert len(dict(store.join(["judge", "latency"], require_all=False))) == 25
+    store.close()
+
+
+def test_scan_while_writing_from_other_threads(tmp_path):
+    store = SqliteResultStore(str(tmp_path / "results.db"))
+    store.write_many((f"t{i}", "judge", _judge(f"t{i}", 1)) for i in range(2000))
+    seen = 0
+    for _ in store.query(kind="judge"):
+        if seen % 500 == 0:
+            t = threading.Thread(target=store.write, args=(f"new{seen}", "judge", _judge("x", 2)))
+            t.start()
+            t.join()
+        seen += 1
+    assert seen >= 2000 and store.count("judge") == 2004
+
+
+def test_in_memory_store_scans_its_own_database():
+    with SqliteResultStore(":memory:") as store:
+        store.write_many((f"t{i}", "judge", _judge(f"t{i}", i)) for i in range(3))
+        store.write("t1", "latency", {"total_ms": 1.0})
+        assert [r.trace_id for r in store.query(kind="judge")] == ["t0", "t1", "t2"]
+        assert [trace_id for trace_id, _ in store.join(["judge", "latency"])] == ["t1"]
+
+
+def test_migrate_json_results(tmp_path):
+    old = JsonResultStore(str(tmp_path / "old"))
+    old.write("t1", "judge", _judge("t1", 4))
+    old.write("t1", "latency", {"total_ms": 12.5})
+    old.write("t2", "judge", _judge("t2", 2))
+
+    store = SqliteResultStore(str(tmp_path / "results.db"))
+    assert migrate_json_results(old.directory, store) == 3
+    assert migrate_json_results(old.directory, store) == 3  # idempotent
+    assert store.count() == 3
+    assert store.read("t1", "latency") == old.read("t1", "latency")
+    assert [r.trace_id for r in store.query(rubric="rag_answer_quality")] == ["t1", "t2"]
+
+    # Reopening keeps the schema and data.
+    store.close()
+    assert SqliteResultStore(str(tmp_path / "results.db")).read("t2", "judge")["overall"] == 2
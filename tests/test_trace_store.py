@@ -0,0 +1,59 @@
+import json
+
+from spanrecorder.recorder import SpanRecorder
+from spanrecorder.span import Span
+from storage.trace_store import JsonlTraceStore
+
+
+def _record_traces(n):
+    rec = SpanRecorder()
+    for i in range(n):
+        with rec.start_span("request", attrs={"i": i}):
+            with rec.start_span("llm.call", attrs={"phase": "decode"}) as sp:
+                sp.add_event("token", {"n": 1})
+    return rec.get_spans()
+
+
+def test_span_dict_round_trip():
+    span = _record_traces(1)[1]
+    assert Span.from_dict(span.to_dict()) == span
+
+
+def test_get_trace_and_iter_traces_use_the_index(tmp_path):
+    store = JsonlTraceStore(str(tmp_path / "t.jsonl"))
+    spans = _record_traces(5)
+    # interleave traces across two writes
+    store.write(spans[::2])
+    store.write(spans[1::2])
+
+    target = spans[4].trace_id
+    got = store.get_trace(target)
+    assert sorted(s.span_id for s in got) == sorted(s.span_id for s in spans if s.trace_id == target)
+
+    traces = list(store.iter_traces())
+    assert len(traces) == 5
+    assert all(len(t) == 2 and len({s.trace_id for s in t}) == 1 for t in traces)
+    assert len(store.read_all()) == 10
+
+
+def test_index_catches_up_with_foreign_appends(tmp_path):
+    path = tmp_path / "t.jsonl"
+    spans = _record_traces(3)
+    with open(path, "w") as f:
+        for s in spans[:4]:
+            f.write(json.dumps(s.to_dict()) + "\n")
+
+    store = JsonlTraceStore(str(path))
+    assert len(store.trace_ids()) == 2
+    store.write(spans[4:])
+    assert len(JsonlTraceStore(str(path)).trace_ids()) == 3
+    assert len((tmp_path / "t.jsonl.idx").read_text().splitlines()) == 6
+
+
+def test_time_range_scan_skips_blocks(tmp_path):
+    store = JsonlTraceStore(str(tmp_path / "t.jsonl"), block_bytes=1)
+    spans = [Span(name=f"s{i}", trace_id=f"t{i}", start_ns=i * 1000, end_ns=i * 1000 + 1) for i in range(10)]
+    store.write(spans)
+
+    got = [s.name for s in store.iter_spans(start_ns=3000, end_ns=6000)]
+    assert got == ["s3", "s4", "s5"]